@@ -0,0 +1,151 @@
+# blobcache.py
+# 报告 PDF 的本地磁盘缓存（尚未迁入 report_store 的报告）：
+# - 从 MySQL 分段（SUBSTRING）读取 pdf_blob，边读边写临时文件，进程内存只占一个分段
+# - 文件按内容 SHA-256 存放（objects/<sha256>），相同内容只存一份
+# - 总大小超过 BLOB_CACHE_MAX_MB 时按最近使用时间淘汰
+import hashlib
+import os
+import tempfile
+import threading
+
+import streamlit as st
+
+from db import get_connection
+from report_store import CHUNK_SIZE, read_blob_chunks
+
+BLOB_CACHE_DIR = os.getenv("BLOB_CACHE_DIR", os.path.join(tempfile.gettempdir(), "sleep_report_cache"))
+
+
+class BlobCache:
+    """
+    report id -> 内容哈希的映射存于 refs/<id>_<upload_time>，内容存于 objects/<sha256>。
+    同一 id 重新上传时 upload_time 变化，自然对应新的缓存项。
+    """
+
+    def __init__(self, root=BLOB_CACHE_DIR, max_bytes=500 * 1024 * 1024, chunk_size=CHUNK_SIZE):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.chunk_size = chunk_size
+        self._objects = os.path.join(root, "objects")
+        self._refs = os.path.join(root, "refs")
+        os.makedirs(self._objects, exist_ok=True)
+        os.makedirs(self._refs, exist_ok=True)
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "bytes_from_db": 0, "bytes_from_disk": 0, "evictions": 0}
+
+    def _ref_path(self, report_id, version):
+        safe_version = "".join(c for c in str(version) if c.isalnum())
+        return os.path.join(self._refs, f"{int(report_id)}_{safe_version}")
+
+    def _lookup(self, ref_path):
+        try:
+            with open(ref_path, encoding="ascii") as f:
+                digest = f.read().strip()
+        except FileNotFoundError:
+            return None
+        path = os.path.join(self._objects, digest)
+        try:
+            os.utime(path)              # 记录最近使用，供淘汰排序
+        except FileNotFoundError:
+            return None
+        return path
+
+    def get_path(self, report_id, version=""):
+        """返回报告 PDF 的本地文件路径；未缓存时从 MySQL 分段读取后写入缓存"""
+        ref_path = self._ref_path(report_id, version)
+        path = self._lookup(ref_path)
+        if path is not None:
+            with self._lock:
+                self._stats["hits"] += 1
+                self._stats["bytes_from_disk"] += os.path.getsize(path)
+            return path
+
+        digest, size = self._fetch(report_id)
+        path = os.path.join(self._objects, digest)
+        _write_atomic(ref_path, digest.encode("ascii"), self.root)
+        with self._lock:
+            self._stats["misses"] += 1
+            self._stats["bytes_from_db"] += size
+        self._prune(keep=path)
+        return path
+
+    def read(self, report_id, version=""):
+        """读取报告 PDF 内容；对象文件在取得路径后恰好被其他会话淘汰时，重新从 MySQL 拉取一次"""
+        for attempt in range(2):
+            path = self.get_path(report_id, version)
+            try:
+                with open(path, "rb") as f:
+                    return f.read()
+            except FileNotFoundError:
+                if attempt:
+                    raise
+
+    def _fetch(self, report_id):
+        """SUBSTRING 分段读取 pdf_blob 写入临时文件，按内容哈希改名为对象文件"""
+        hasher = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(suffix=".part", dir=self.root)
+        try:
+            with os.fdopen(fd, "wb") as out, get_connection() as conn, conn.cursor() as cur:
+                for chunk in read_blob_chunks(cur, report_id, self.chunk_size):
+                    hasher.update(chunk)
+                    out.write(chunk)
+                    size += len(chunk)
+            digest = hasher.hexdigest()
+            os.replace(tmp_path, os.path.join(self._objects, digest))
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return digest, size
+
+    def _prune(self, keep):
+        """按最近使用时间淘汰对象文件，总大小控制在 max_bytes 内（引用文件随之失效）"""
+        files = []
+        for entry in os.scandir(self._objects):
+            if entry.path == keep:
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in files) + os.path.getsize(keep)
+        evicted = 0
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                evicted += 1
+            except FileNotFoundError:
+                pass
+            total -= size
+        if evicted:
+            with self._lock:
+                self._stats["evictions"] += evicted
+
+    def stats(self):
+        with self._lock:
+            data = dict(self._stats)
+        lookups = data["hits"] + data["misses"]
+        data["hit_rate"] = round(data["hits"] / lookups, 3) if lookups else 0.0
+        sizes = [e.stat().st_size for e in os.scandir(self._objects) if e.is_file()]
+        data.update(objects=len(sizes), bytes=sum(sizes), max_bytes=self.max_bytes)
+        return data
+
+
+def _write_atomic(path, data, tmp_dir):
+    fd, tmp_path = tempfile.mkstemp(suffix=".part", dir=tmp_dir)
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+@st.cache_resource(show_spinner=False)
+def get_blob_cache():
+    """进程内唯一的报告缓存（磁盘目录可被多个进程共享）"""
+    return BlobCache(
+        BLOB_CACHE_DIR,
+        max_bytes=int(os.getenv("BLOB_CACHE_MAX_MB", 500)) * 1024 * 1024,
+    )
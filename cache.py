@@ -0,0 +1,139 @@
+# cache.py
+# 进程内有界 LRU 缓存：患者历史查询结果按患者分组，写入该患者数据时精确失效
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import streamlit as st
+
+
+class LRUCache:
+    """线程安全的有界 LRU 缓存，带命中统计；max_age 为条目最长存活秒数（None 表示不过期）"""
+
+    def __init__(self, max_entries=256, max_age=None):
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self._data = OrderedDict()          # key -> (value, 写入时间)
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None and self.max_age is not None and time.monotonic() - item[1] > self.max_age:
+                self._remove(key)
+                item = None
+            if item is None:
+                self._stats["misses"] += 1
+                return default
+            self._data.move_to_end(key)
+            self._stats["hits"] += 1
+            return item[0]
+
+    def put(self, key, value):
+        with self._lock:
+            self._put(key, value)
+
+    def _put(self, key, value):
+        self._data[key] = (value, time.monotonic())
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            old_key, _ = self._data.popitem(last=False)
+            self._on_remove(old_key)
+            self._stats["evictions"] += 1
+
+    def _remove(self, key):
+        if self._data.pop(key, None) is not None:
+            self._on_remove(key)
+
+    def _on_remove(self, key):
+        pass
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            data = dict(self._stats)
+            data.update(entries=len(self._data), max_entries=self.max_entries)
+        lookups = data["hits"] + data["misses"]
+        data["hit_rate"] = round(data["hits"] / lookups, 3) if lookups else 0.0
+        return data
+
+
+def patient_key(name):
+    """与 MySQL 默认排序规则一致：忽略首尾空格与大小写"""
+    return str(name).strip().casefold()
+
+
+class PatientCache(LRUCache):
+    """
+    key 的第一个元素为患者；invalidate(患者) 清除该患者的全部条目。
+    每位患者维护一个代数，查询开始后若发生写入，查询结果不再写回缓存，避免缓存旧数据。
+    """
+
+    def __init__(self, max_entries=256, max_age=None):
+        super().__init__(max_entries, max_age)
+        self._by_patient = {}               # 患者 -> set(key)
+        self._generation = {}               # 患者 -> 写入代数
+
+    def _on_remove(self, key):
+        keys = self._by_patient.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_patient[key[0]]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._by_patient.clear()
+
+    def get_or_load(self, patient, key, loader):
+        pkey = patient_key(patient)
+        full_key = (pkey, *key)
+        value = self.get(full_key)
+        if value is not None:
+            return value
+        with self._lock:
+            generation = self._generation.get(pkey, 0)
+        value = loader()
+        with self._lock:
+            if self._generation.get(pkey, 0) == generation:
+                self._put(full_key, value)
+                self._by_patient.setdefault(pkey, set()).add(full_key)
+        return value
+
+    def invalidate(self, patient):
+        pkey = patient_key(patient)
+        with self._lock:
+            self._generation[pkey] = self._generation.get(pkey, 0) + 1
+            for key in list(self._by_patient.get(pkey, ())):
+                self._remove(key)
+            self._stats["invalidations"] += 1
+
+
+@st.cache_resource(show_spinner=False)
+def get_patient_cache():
+    """
+    进程内唯一的患者历史缓存。写入由本进程的 spool flusher 完成并精确失效；
+    PATIENT_CACHE_MAX_AGE 兜底处理运维脚本等进程外写入。
+    """
+    return PatientCache(
+        max_entries=int(os.getenv("PATIENT_CACHE_SIZE", 256)),
+        max_age=float(os.getenv("PATIENT_CACHE_MAX_AGE", 600)),
+    )
+
+
+@st.cache_resource(show_spinner=False)
+def get_record_cache():
+    """
+    量表记录按 (表名, id) 缓存整行。页面只插入不修改，但 tools/rescore.py 会在进程外改写已存分数，
+    RECORD_CACHE_MAX_AGE 到期后重新读取。
+    """
+    return LRUCache(
+        max_entries=int(os.getenv("RECORD_CACHE_SIZE", 2048)),
+        max_age=float(os.getenv("RECORD_CACHE_MAX_AGE", 600)),
+    )
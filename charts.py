@@ -0,0 +1,63 @@
+# charts.py
+# 睡眠日记汇总图表的构建（只生成 plotly 图，不调用 streamlit），页面负责展示
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+
+from sleeptime import column_minutes
+
+NIGHT_TIMES = [("bed_time", "上床时间"), ("try_sleep_time", "闭眼准备入睡时间"),
+               ("final_wake_time", "最终醒来时间"), ("get_up_time", "起床时间")]
+NAP_TIMES = [("nap_start", "小睡开始时间"), ("nap_end", "小睡结束时间")]
+DIARY_METRICS = [("sleep_latency", "入睡所需时长（分钟）"),
+                 ("night_awake_count", "夜间觉醒次数"),
+                 ("night_awake_total", "夜间觉醒总时长（分钟）"),
+                 ("total_sleep_hours", "总睡眠时长（小时）"),
+                 ("sleep_efficiency", "睡眠效率（%）")]
+
+
+def diary_figures(df):
+    """
+    按记录日期升序的日记 DataFrame → 图表列表：
+    夜间关键时间点、日间小睡时间，以及各项指标的折线图
+    """
+    x = pd.to_datetime(df["record_date"]).dt.strftime("%m-%d")     # 日期格式化为"月-日"
+
+    # 1. 夜间关键时间
+    data1 = [go.Scatter(x=x, y=column_minutes(df, col), name=label,
+                        mode="lines+markers+text", text=df[col], textposition="top center")
+             for col, label in NIGHT_TIMES]
+    fig1 = go.Figure(data1)
+    fig1.update_layout(
+        title="夜间关键时间点",
+        yaxis=dict(
+            tickformat="%H:%M",
+            autorange=True,
+            showticklabels=False
+        ),
+        legend=dict(orientation="h", yanchor="bottom", y=1.02, x=0.5)
+    )
+
+    # 2. 日间小睡时间（白天，不做跨天处理）
+    data2 = [go.Scatter(x=x, y=column_minutes(df, col, wrap=False), name=label,
+                        mode="lines+markers+text", text=df[col], textposition="top center")
+             for col, label in NAP_TIMES]
+    fig2 = go.Figure(data2)
+    fig2.update_layout(
+        title="日间小睡时间",
+        yaxis=dict(
+            tickformat="%H:%M",
+            autorange=True,
+            showticklabels=False
+        ),
+        legend=dict(orientation="h", yanchor="bottom", y=1.02, x=1.02, xanchor="left")
+    )
+
+    # 3-7 其余指标
+    figures = [fig1, fig2]
+    plot_df = df.assign(date_fmt=x)
+    for col, title in DIARY_METRICS:
+        fig = px.line(plot_df, x="date_fmt", y=col, markers=True, title=title)
+        fig.update_layout(xaxis_title="填写日期", yaxis_title=title)
+        figures.append(fig)
+    return figures
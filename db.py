@@ -0,0 +1,344 @@
+# db.py
+# 全局共享的 MySQL 访问层：所有页面通过这里获取连接，不再各自 pymysql.connect
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+import pymysql
+import streamlit as st
+from dotenv import load_dotenv
+
+from cache import get_patient_cache, get_record_cache
+from metrics import QUERY_LOG, rows_bytes
+
+load_dotenv()
+
+# 存储引擎：mysql（直连 SQLpub，默认）或 sqlite（本地磁盘，后台与 SQLpub 同步，见 sync.py）
+STORAGE_ENGINE = os.getenv("STORAGE_ENGINE", "mysql").lower()
+
+
+class TimedCursor(pymysql.cursors.Cursor):
+    """
+    记录每条语句的耗时、行数与结果字节数（普通游标在 execute 内已读回全部结果）。
+    pd.read_sql、repository 写入函数、报告分段读取等都经由该游标，见 pages/系统监控.py。
+    """
+
+    _batch = False
+
+    def execute(self, query, args=None):
+        if self._batch:
+            return super().execute(query, args)
+        start = time.perf_counter()
+        error = None
+        try:
+            return super().execute(query, args)
+        except Exception as e:
+            error = type(e).__name__
+            raise
+        finally:
+            QUERY_LOG.record(query, (time.perf_counter() - start) * 1000,
+                             rows=max(self.rowcount, 0),
+                             nbytes=0 if error else rows_bytes(self._rows), error=error)
+
+    def executemany(self, query, args):
+        # 批量 INSERT 会被改写成多值语句再调用 execute，只按原始模板记一次
+        start = time.perf_counter()
+        error = None
+        self._batch = True
+        try:
+            return super().executemany(query, args)
+        except Exception as e:
+            error = type(e).__name__
+            raise
+        finally:
+            self._batch = False
+            QUERY_LOG.record(query, (time.perf_counter() - start) * 1000,
+                             rows=max(self.rowcount, 0), error=error)
+
+
+def connect_mysql():
+    """按 SQLPUB_* 环境变量新建一条到 SQLpub 的物理连接"""
+    return pymysql.connect(
+        host=os.getenv("SQLPUB_HOST"),
+        port=int(os.getenv("SQLPUB_PORT", 3307)),
+        user=os.getenv("SQLPUB_USER"),
+        password=os.getenv("SQLPUB_PWD"),
+        database=os.getenv("SQLPUB_DB"),
+        charset="utf8mb4",
+        connect_timeout=5,
+        cursorclass=TimedCursor,
+        autocommit=True     # 池化连接复用时避免读到旧快照；多语句事务用 transaction()
+    )
+
+
+def _connect():
+    """按 STORAGE_ENGINE 新建一条页面使用的连接"""
+    if STORAGE_ENGINE == "sqlite":
+        import sqlite_engine
+        return sqlite_engine.connect()
+    return connect_mysql()
+
+
+# ---------- 连接池 ----------
+class ConnectionPool:
+    """
+    有界连接池：
+    - 最多 max_size 条物理连接，用满后借用方最多等待 timeout 秒
+    - 空闲超过 ping_interval 秒的连接，借出前先 ping 一次，失效则重建
+    - stats() 返回池大小与等待时间统计，用于评估池容量
+    """
+
+    def __init__(self, max_size=5, timeout=10.0, ping_interval=30.0, connect=_connect):
+        self.max_size = max_size
+        self.timeout = timeout
+        self.ping_interval = ping_interval
+        self._connect = connect
+        self._idle = queue.LifoQueue()      # 元素为 (conn, 归还时间)
+        self._lock = threading.Lock()
+        self._size = 0                      # 已创建且未销毁的连接数
+        self._in_use = 0
+        self._stats = {
+            "acquired": 0,
+            "created": 0,
+            "discarded": 0,
+            "waits": 0,
+            "wait_ms_total": 0.0,
+            "wait_ms_max": 0.0,
+            "timeouts": 0,
+        }
+
+    def _reserve_slot(self):
+        with self._lock:
+            if self._size < self.max_size:
+                self._size += 1
+                return True
+            return False
+
+    def _release_slot(self):
+        with self._lock:
+            self._size -= 1
+            self._stats["discarded"] += 1
+
+    def _healthy(self, conn, idle_since):
+        if time.monotonic() - idle_since < self.ping_interval:
+            return True
+        try:
+            conn.ping(reconnect=False)
+            return True
+        except Exception:
+            return False
+
+    def acquire(self):
+        start = time.monotonic()
+        waited = False
+        while True:
+            try:
+                conn, idle_since = self._idle.get_nowait()
+            except queue.Empty:
+                if self._reserve_slot():
+                    try:
+                        conn = self._connect()
+                    except Exception:
+                        with self._lock:
+                            self._size -= 1
+                        raise
+                    with self._lock:
+                        self._stats["created"] += 1
+                    break
+                # 池已满，等待其他会话归还
+                waited = True
+                remaining = self.timeout - (time.monotonic() - start)
+                if remaining <= 0:
+                    with self._lock:
+                        self._stats["timeouts"] += 1
+                    raise TimeoutError(f"等待数据库连接超时（{self.timeout}s，池大小 {self.max_size}）")
+                try:
+                    # 分段等待，以便有连接被销毁、腾出名额时能及时新建
+                    conn, idle_since = self._idle.get(timeout=min(remaining, 0.5))
+                except queue.Empty:
+                    continue
+            if self._healthy(conn, idle_since):
+                break
+            self._close_quietly(conn)
+            self._release_slot()
+
+        wait_ms = (time.monotonic() - start) * 1000
+        with self._lock:
+            self._in_use += 1
+            self._stats["acquired"] += 1
+            if waited:
+                self._stats["waits"] += 1
+                self._stats["wait_ms_total"] += wait_ms
+                self._stats["wait_ms_max"] = max(self._stats["wait_ms_max"], wait_ms)
+        return conn
+
+    def release(self, conn, broken=False):
+        with self._lock:
+            self._in_use -= 1
+        if broken or not conn.open:
+            self._close_quietly(conn)
+            self._release_slot()
+            return
+        self._idle.put((conn, time.monotonic()))
+
+    @staticmethod
+    def _close_quietly(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def stats(self):
+        with self._lock:
+            data = dict(self._stats)
+            data.update(max_size=self.max_size, size=self._size,
+                        in_use=self._in_use, idle=self._size - self._in_use)
+        data["wait_ms_avg"] = data["wait_ms_total"] / data["waits"] if data["waits"] else 0.0
+        return data
+
+
+@st.cache_resource(show_spinner=False)
+def get_pool():
+    """进程内唯一的连接池（所有页面、所有会话共享）"""
+    if STORAGE_ENGINE == "sqlite":
+        # 本地引擎：首次取连接池时启动与 SQLpub 的同步线程
+        from sync import get_sync_worker
+        get_sync_worker()
+    return ConnectionPool(
+        max_size=int(os.getenv("SQLPUB_POOL_SIZE", 5)),
+        timeout=float(os.getenv("SQLPUB_POOL_TIMEOUT", 10)),
+        ping_interval=float(os.getenv("SQLPUB_POOL_PING_INTERVAL", 30)),
+    )
+
+
+@contextmanager
+def get_connection():
+    """
+    从连接池借出一条连接，用完自动归还。
+    连接为 autocommit 模式；发生异常时回滚未提交的事务。
+    st.stop() / st.rerun() / KeyboardInterrupt 不是 Exception 的子类，同样回滚，
+    避免带着未结束的事务（及其锁）归还连接池。
+    """
+    pool = get_pool()
+    conn = pool.acquire()
+    broken = False
+    try:
+        yield conn
+    except BaseException:
+        try:
+            conn.rollback()
+        except Exception:
+            broken = True
+        raise
+    finally:
+        pool.release(conn, broken=broken)
+
+
+@contextmanager
+def transaction():
+    """借出连接并开启事务，正常退出时提交，异常时回滚"""
+    with get_connection() as conn:
+        conn.begin()
+        yield conn
+        conn.commit()
+
+
+def run_query(sql, params=None):
+    """执行查询并返回 DataFrame"""
+    with get_connection() as conn:
+        return pd.read_sql(sql, conn, params=params)
+
+
+def iter_query(sql, params=None, chunk_size=1000):
+    """
+    用服务端游标（SSCursor）流式读取，逐块产出 DataFrame；
+    结果集不在客户端整体缓冲，内存占用与结果大小无关。适用于导出等需要全量遍历的场景。
+    """
+    with get_connection() as conn:
+        cur = conn.cursor(pymysql.cursors.SSCursor)
+        start = time.perf_counter()
+        total_rows = total_bytes = 0
+        error = None
+        try:
+            cur.execute(sql, params)
+            columns = [d[0] for d in cur.description]
+            while True:
+                rows = cur.fetchmany(chunk_size)
+                if not rows:
+                    break
+                total_rows += len(rows)
+                total_bytes += rows_bytes(rows)
+                yield pd.DataFrame(list(rows), columns=columns)
+        except Exception as e:
+            error = type(e).__name__
+            raise
+        finally:
+            # 未读完就中止时，close() 会读掉剩余结果，连接才能安全归还连接池
+            cur.close()
+            # 流式读取按整个遍历过程计时（含调用方处理各块的时间）
+            QUERY_LOG.record(sql, (time.perf_counter() - start) * 1000,
+                             rows=total_rows, nbytes=total_bytes, error=error)
+
+
+def run_patient_query(patient, sql, params=None):
+    """
+    查询某位患者的历史数据，结果进入患者缓存；
+    该患者有新数据写入（spool 提交成功）时缓存自动失效。返回副本，调用方可随意修改。
+    """
+    if isinstance(params, dict):
+        key = (sql, tuple(sorted(params.items())))
+    else:
+        key = (sql, tuple(params) if isinstance(params, (list, tuple)) else params)
+    df = get_patient_cache().get_or_load(patient, key, lambda: run_query(sql, params))
+    return df.copy()
+
+
+def fetch_records_by_id(table, ids):
+    """
+    按 id 批量取量表整行记录，返回 {id: 单行 DataFrame}。
+    已缓存且未过期的 id 不再查询，其余一次 IN (...) 取回；重算分数后的改动在缓存过期后可见。
+    """
+    cache = get_record_cache()
+    result, missing = {}, []
+    for record_id in dict.fromkeys(int(i) for i in ids):
+        row = cache.get((table, record_id))
+        if row is None:
+            missing.append(record_id)
+        else:
+            result[record_id] = row
+    if missing:
+        placeholders = ", ".join(["%s"] * len(missing))
+        df = run_query(f"SELECT * FROM {table} WHERE id IN ({placeholders})", params=missing)
+        for record_id, row in df.groupby("id", sort=False):
+            row = row.reset_index(drop=True)
+            cache.put((table, int(record_id)), row)
+            result[int(record_id)] = row
+    return result
+
+
+def patient_cache_stats():
+    return get_patient_cache().stats()
+
+
+def record_cache_stats():
+    return get_record_cache().stats()
+
+
+def clear_query_caches():
+    """清空本进程的量表记录缓存与患者历史缓存（如 tools/rescore.py 改写已存分数之后）"""
+    get_record_cache().clear()
+    get_patient_cache().clear()
+
+
+def execute(sql, params=None):
+    """执行单条写语句（自动提交），返回受影响行数"""
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            return cur.execute(sql, params)
+
+
+def pool_stats():
+    return get_pool().stats()
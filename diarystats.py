@@ -0,0 +1,138 @@
+# diarystats.py
+# 每位患者一行的滚动统计 sleep_diary_stats：保存日记时在同一事务内更新（repository.save_sleep_diary），
+# 只读写该患者这一行与该晚的投影行，不回读全部历史。
+# 近 30 晚的指标缓冲存于 recent 列（JSON），7/14/30 晚均值、连续记录天数与前后 7 晚差值由它算出。
+import json
+from datetime import date, timedelta
+
+STATS_METRICS = ["sleep_efficiency", "total_sleep_hours", "sleep_latency", "night_awake_count"]
+WINDOWS = [7, 14, 30]
+BUFFER_NIGHTS = max(WINDOWS)
+
+SUMMARY_COLUMNS = ([f"{m}_avg{n}" for m in STATS_METRICS for n in WINDOWS]
+                   + [f"{m}_delta7" for m in STATS_METRICS])
+STATS_COLUMNS = ["name", "nights", "last_record_date", "streak", "recent"] + SUMMARY_COLUMNS
+
+_metric_cols = ", ".join(STATS_METRICS)
+NIGHT_SQL = f"SELECT record_date, {_metric_cols} FROM sleep_diary_latest WHERE name = %s AND record_date = %s"
+RECENT_SQL = (f"SELECT record_date, {_metric_cols} FROM sleep_diary_latest WHERE name = %s "
+              f"ORDER BY record_date DESC LIMIT {BUFFER_NIGHTS}")
+DATES_SQL = "SELECT record_date FROM sleep_diary_latest WHERE name = %s ORDER BY record_date DESC"
+# 同一患者并发保存时串行化（SQLite 引擎的写事务本身串行，translate 去掉 FOR UPDATE）
+LOCK_STATS_SQL = f"SELECT {', '.join(STATS_COLUMNS)} FROM sleep_diary_stats WHERE name = %s FOR UPDATE"
+UPSERT_STATS_SQL = (
+    f"INSERT INTO sleep_diary_stats ({', '.join(STATS_COLUMNS)})\n"
+    f"VALUES ({', '.join(f'%({c})s' for c in STATS_COLUMNS)})\n"
+    f"ON DUPLICATE KEY UPDATE {', '.join(f'{c} = VALUES({c})' for c in STATS_COLUMNS if c != 'name')}"
+)
+
+
+def _day(d):
+    return d if isinstance(d, date) else date.fromisoformat(str(d)[:10])
+
+
+def _mean(values):
+    values = [v for v in values if v is not None]
+    return sum(values) / len(values) if values else None
+
+
+def summarize(recent):
+    """recent 为按日期升序的 [[日期, 指标...], ...]（最多 30 晚）→ 各窗口均值与最近 7 晚相对前 7 晚的差值"""
+    out = {}
+    for i, m in enumerate(STATS_METRICS, 1):
+        values = [row[i] for row in recent]
+        for n in WINDOWS:
+            out[f"{m}_avg{n}"] = _mean(values[-n:])
+        last7, prev7 = _mean(values[-7:]), _mean(values[-14:-7])
+        out[f"{m}_delta7"] = last7 - prev7 if last7 is not None and prev7 is not None else None
+    return out
+
+
+def streak_of(dates):
+    """按日期降序的日期序列 → 截至最近一晚的连续记录晚数"""
+    streak, prev = 0, None
+    for d in dates:
+        d = _day(d)
+        if prev is not None and d != prev - timedelta(days=1):
+            break
+        streak, prev = streak + 1, d
+    return streak
+
+
+def _night_row(row):
+    return [str(row[0])[:10]] + [None if v is None else float(v) for v in row[1:]]
+
+
+def rebuild_diary_stats(cursor, name):
+    """由 sleep_diary_latest 重建一位患者的统计行（首次保存、修改很早的某晚时使用）"""
+    cursor.execute(DATES_SQL, (name,))
+    dates = [r[0] for r in cursor.fetchall()]
+    if not dates:
+        cursor.execute("DELETE FROM sleep_diary_stats WHERE name = %s", (name,))
+        return None
+    cursor.execute(RECENT_SQL, (name,))
+    recent = [_night_row(r) for r in reversed(cursor.fetchall())]
+    stats = {"name": name, "nights": len(dates), "last_record_date": _day(dates[0]),
+             "streak": streak_of(dates), "recent": recent}
+    _write(cursor, stats)
+    return stats
+
+
+def _write(cursor, stats):
+    cursor.execute(UPSERT_STATS_SQL, {**stats, **summarize(stats["recent"]),
+                                      "recent": json.dumps(stats["recent"])})
+
+
+def update_diary_stats(cursor, name, record_date):
+    """
+    某晚日记写入后更新该患者的统计行；须在同一事务中、投影表刷新之后调用。
+    缓冲内含最早一晚之后的全部记录，该晚是否新增据此判断；早于缓冲的日期重建。
+    """
+    cursor.execute(LOCK_STATS_SQL, (name,))
+    row = cursor.fetchone()
+    if row is None:
+        return rebuild_diary_stats(cursor, name)
+    stats = dict(zip(STATS_COLUMNS, row))
+    recent = json.loads(stats["recent"] or "[]")
+    day, last = _day(record_date), _day(stats["last_record_date"])
+    oldest = _day(recent[0][0]) if recent else day
+
+    cursor.execute(NIGHT_SQL, (name, record_date))
+    night = cursor.fetchone()
+    if night is None:
+        return rebuild_diary_stats(cursor, name)
+    night = _night_row(night)
+
+    in_buffer = any(r[0] == night[0] for r in recent)
+    if not in_buffer and day < oldest and len(recent) >= BUFFER_NIGHTS:
+        # 缓冲之外的旧日期：连续天数与晚数无法就地更新，重建（少见）
+        return rebuild_diary_stats(cursor, name)
+    recent = sorted([r for r in recent if r[0] != night[0]] + [night])[-BUFFER_NIGHTS:]
+    if day > last:
+        streak = stats["streak"] + 1 if day == last + timedelta(days=1) else 1
+        last = day
+    elif day == last:
+        streak = stats["streak"]
+    else:
+        # 补填较早的某晚：在缓冲内重新数连续天数；连续段延伸到缓冲之外时重建
+        streak = streak_of(reversed([r[0] for r in recent]))
+        if streak >= len(recent) >= BUFFER_NIGHTS:
+            return rebuild_diary_stats(cursor, name)
+    stats.update(nights=stats["nights"] + (0 if in_buffer else 1), last_record_date=last,
+                 streak=streak, recent=recent)
+    _write(cursor, stats)
+    return stats
+
+
+def stats_prompt(stats):
+    """统计行（dict）→ 给 AI 的中文摘要"""
+    def fmt(v, digits=1):
+        return "无" if v is None or v != v else f"{float(v):.{digits}f}"     # v != v：NaN
+
+    labels = [("sleep_efficiency", "睡眠效率（%）"), ("total_sleep_hours", "总睡眠时长（小时）"),
+              ("sleep_latency", "入睡所需时长（分钟）"), ("night_awake_count", "夜间觉醒次数")]
+    lines = [f"累计记录 {stats['nights']} 晚，截至最近一晚已连续记录 {stats['streak']} 晚。"]
+    for m, label in labels:
+        avgs = "，".join(f"近{n}晚 {fmt(stats[f'{m}_avg{n}'])}" for n in WINDOWS)
+        lines.append(f"{label}：{avgs}；最近7晚较之前7晚变化 {fmt(stats[f'{m}_delta7'])}")
+    return "\n".join(lines)
@@ -0,0 +1,110 @@
+# export.py
+# 流式 Excel 导出：openpyxl write-only 模式逐行写入，文件落在临时目录而不是内存；
+# 导出文件按内容键缓存在 EXPORT_DIR，同一结果重复下载不再重新生成
+import hashlib
+import os
+import tempfile
+
+import pandas as pd
+import streamlit as st
+from openpyxl import Workbook
+
+XLSX_MIME = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+EXPORT_DIR = os.getenv("EXPORT_DIR", os.path.join(tempfile.gettempdir(), "sleep_exports"))
+EXPORT_CACHE_MAX_BYTES = int(os.getenv("EXPORT_CACHE_MAX_MB", 200)) * 1024 * 1024
+
+
+def _cell(value):
+    """pandas/numpy 标量转换为 openpyxl 可写入的值"""
+    if value is None:
+        return None
+    if not isinstance(value, (list, tuple, dict)) and pd.isna(value):
+        return None
+    if hasattr(value, "item") and not isinstance(value, (str, bytes)):
+        try:
+            return value.item()
+        except (ValueError, AttributeError):
+            pass
+    if isinstance(value, pd.Timestamp):
+        return value.to_pydatetime()
+    return value
+
+
+def write_xlsx(chunks, path=None, sheet_name="睡眠日记数据"):
+    """
+    将若干 DataFrame 块依次写入同一个工作表，返回文件路径。
+    write-only 模式下每写一行即序列化，内存占用与行数无关；表头取第一块的列名。
+    """
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    if path is None:
+        fd, path = tempfile.mkstemp(suffix=".xlsx", dir=EXPORT_DIR)
+        os.close(fd)
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(sheet_name)
+    header = None
+    for chunk in chunks:
+        if header is None:
+            header = list(chunk.columns)
+            ws.append(header)
+        for row in chunk.itertuples(index=False, name=None):
+            ws.append([_cell(v) for v in row])
+    # 先写临时文件再改名，其他会话不会读到写了一半的文件
+    fd, tmp_path = tempfile.mkstemp(suffix=".part", dir=EXPORT_DIR)
+    os.close(fd)
+    try:
+        wb.save(tmp_path)
+        os.replace(tmp_path, path)
+    except Exception:
+        os.remove(tmp_path)
+        raise
+    return path
+
+
+def export_key(*parts):
+    """由查询参数与数据版本（如 MAX(updated_at)、行数）计算导出文件的缓存键"""
+    return hashlib.sha256(repr(parts).encode("utf-8")).hexdigest()[:32]
+
+
+def _prune(keep):
+    """按最近使用时间淘汰缓存文件，总大小控制在 EXPORT_CACHE_MAX_BYTES 内"""
+    files = []
+    for entry in os.scandir(EXPORT_DIR):
+        if entry.name.endswith(".xlsx") and entry.path != keep:
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, entry.path))
+    total = sum(size for _, size, _ in files)
+    if os.path.exists(keep):
+        total += os.path.getsize(keep)
+    for _, size, path in sorted(files):
+        if total <= EXPORT_CACHE_MAX_BYTES:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+
+
+def deferred_download(cache_key, build, file_name, key, label="📥 下载Excel", sheet_name="睡眠日记数据"):
+    """
+    按需导出：点击"生成Excel"后才调用 build() 取得 DataFrame 块并写文件；
+    同一 cache_key 的文件已存在时直接显示下载按钮。
+    """
+    path = os.path.join(EXPORT_DIR, f"{cache_key}.xlsx")
+    try:
+        os.utime(path)                  # 已缓存：记录最近使用，供淘汰排序
+    except FileNotFoundError:
+        if not st.button("📄 生成Excel", key=f"{key}_build"):
+            return
+        with st.spinner("正在生成Excel…"):
+            write_xlsx(build(), path=path, sheet_name=sheet_name)
+        _prune(keep=path)
+    try:
+        with open(path, "rb") as f:
+            st.download_button(label=label, data=f, file_name=file_name, mime=XLSX_MIME, key=key)
+    except FileNotFoundError:
+        # 恰好被其他会话的淘汰清理掉
+        st.warning("导出文件已过期，请刷新后重新生成")
@@ -0,0 +1,79 @@
+# metrics.py
+# SQL 耗时采样：每条语句的耗时、行数、传输字节数写入有界环形缓冲区，
+# 由 pages/系统监控.py 按语句模板汇总 p50/p95/p99 与最慢调用
+import os
+import re
+import threading
+import time
+from collections import deque
+
+import pandas as pd
+
+_WS_RE = re.compile(r"\s+")
+_IN_LIST_RE = re.compile(r"IN \((?:%s|\?)(?:, ?(?:%s|\?))+\)", re.IGNORECASE)
+
+
+def query_template(sql):
+    """压缩空白，并把 IN (%s, %s, ...) 折叠为 IN (...)，同一语句不同参数个数归为同一模板"""
+    sql = _WS_RE.sub(" ", sql).strip()
+    return _IN_LIST_RE.sub("IN (...)", sql)
+
+
+def rows_bytes(rows):
+    """估算结果集的传输字节数：字符串/二进制按长度，其余按 8 字节"""
+    if not rows:
+        return 0
+    total = 0
+    for row in rows:
+        for v in row:
+            total += len(v) if isinstance(v, (str, bytes, bytearray)) else 8
+    return total
+
+
+class QueryLog:
+    """最近 maxlen 条 SQL 调用的环形缓冲区（线程安全）"""
+
+    def __init__(self, maxlen=5000):
+        self._calls = deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+
+    def record(self, sql, ms, rows=0, nbytes=0, error=None):
+        item = (time.time(), query_template(sql), ms, rows, nbytes, error)
+        with self._lock:
+            self._calls.append(item)
+
+    def frame(self):
+        with self._lock:
+            calls = list(self._calls)
+        return pd.DataFrame(calls, columns=["time", "template", "ms", "rows", "bytes", "error"])
+
+    def summary(self):
+        """按模板汇总：调用次数、p50/p95/p99/最大耗时、平均行数与字节数、错误数"""
+        df = self.frame()
+        if df.empty:
+            return df
+        grouped = df.groupby("template")
+        out = pd.DataFrame({
+            "calls": grouped.size(),
+            "p50_ms": grouped["ms"].quantile(0.50),
+            "p95_ms": grouped["ms"].quantile(0.95),
+            "p99_ms": grouped["ms"].quantile(0.99),
+            "max_ms": grouped["ms"].max(),
+            "total_ms": grouped["ms"].sum(),
+            "avg_rows": grouped["rows"].mean(),
+            "avg_bytes": grouped["bytes"].mean(),
+            "errors": grouped["error"].count(),
+        })
+        return out.sort_values("total_ms", ascending=False).reset_index()
+
+    def slowest(self, n=20):
+        df = self.frame()
+        return df.nlargest(n, "ms") if not df.empty else df
+
+    def clear(self):
+        with self._lock:
+            self._calls.clear()
+
+
+# 进程内唯一；游标每次执行都会写入，不经 st.cache_resource 以免额外开销
+QUERY_LOG = QueryLog(maxlen=int(os.getenv("QUERY_LOG_SIZE", 5000)))
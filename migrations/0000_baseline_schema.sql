@@ -0,0 +1,125 @@
+-- 0000 基线表结构：与线上 SQLpub 现有表一致，全部 IF NOT EXISTS，
+-- 线上执行为空操作；用于本地/基准测试库从零建表。
+-- sleep_diary 的 uq_name_record_date 不在基线中（线上原表没有）：由 tools/dedupe_sleep_diary.py
+-- 去重后在线创建，从零新建的库执行迁移后同样运行一次该工具。
+
+CREATE TABLE IF NOT EXISTS sleep_diary (
+    id                  INT AUTO_INCREMENT PRIMARY KEY,
+    name                VARCHAR(64)  NOT NULL,
+    record_date         DATE         NOT NULL,
+    entry_date          DATE         NOT NULL,
+    nap_start           VARCHAR(8),
+    nap_end             VARCHAR(8),
+    daytime_bed_minutes INT,
+    nap_duration        INT,
+    caffeine            VARCHAR(255),
+    alcohol             VARCHAR(255),
+    med_name            VARCHAR(512),
+    med_dose            VARCHAR(255),
+    med_time            VARCHAR(8),
+    daytime_mood        VARCHAR(8),
+    sleep_interference  VARCHAR(64),
+    bed_time            VARCHAR(8),
+    try_sleep_time      VARCHAR(8),
+    sleep_latency       INT,
+    night_awake_count   INT,
+    night_awake_total   INT,
+    final_wake_time     VARCHAR(8),
+    get_up_time         VARCHAR(8),
+    total_sleep_hours   DOUBLE,
+    sleep_efficiency    DOUBLE,
+    sleep_quality       VARCHAR(8),
+    morning_feeling     VARCHAR(8),
+    created_at          TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS psqi_record (
+    id                    INT AUTO_INCREMENT PRIMARY KEY,
+    name                  VARCHAR(64) NOT NULL,
+    gender                VARCHAR(8),
+    ts                    VARCHAR(32),
+    age                   INT,
+    height                INT,
+    weight                INT,
+    contact               VARCHAR(64),
+    bed_time              VARCHAR(8),
+    getup_time            VARCHAR(8),
+    sleep_latency_choice  TINYINT,
+    sleep_duration_choice TINYINT,
+    q5a TINYINT, q5b TINYINT, q5c TINYINT, q5d TINYINT, q5e TINYINT,
+    q5f TINYINT, q5g TINYINT, q5h TINYINT, q5i TINYINT, q5j TINYINT,
+    q6 TINYINT, q7 TINYINT, q8 TINYINT, q9 TINYINT,
+    A TINYINT, B TINYINT, C TINYINT, D TINYINT, E TINYINT, F TINYINT, G TINYINT,
+    total_score           INT,
+    sleep_efficiency      DOUBLE,
+    created_at            TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS isi_record (
+    id          INT AUTO_INCREMENT PRIMARY KEY,
+    name        VARCHAR(64) NOT NULL,
+    ts          VARCHAR(32),
+    q1a_opt VARCHAR(16), q1a_score TINYINT,
+    q1b_opt VARCHAR(16), q1b_score TINYINT,
+    q1c_opt VARCHAR(16), q1c_score TINYINT,
+    q2_opt  VARCHAR(16), q2_score  TINYINT,
+    q3_opt  VARCHAR(16), q3_score  TINYINT,
+    q4_opt  VARCHAR(16), q4_score  TINYINT,
+    q5_opt  VARCHAR(16), q5_score  TINYINT,
+    total_score INT,
+    created_at  TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS has_record (
+    id          INT AUTO_INCREMENT PRIMARY KEY,
+    name        VARCHAR(64) NOT NULL,
+    ts          VARCHAR(32),
+    q1 TINYINT, q2 TINYINT, q3 TINYINT, q4 TINYINT, q5 TINYINT, q6 TINYINT, q7 TINYINT,
+    q8 TINYINT, q9 TINYINT, q10 TINYINT, q11 TINYINT, q12 TINYINT, q13 TINYINT,
+    q14 TINYINT, q15 TINYINT, q16 TINYINT, q17 TINYINT, q18 TINYINT, q19 TINYINT,
+    q20 TINYINT, q21 TINYINT, q22 TINYINT, q23 TINYINT, q24 TINYINT, q25 TINYINT, q26 TINYINT,
+    total_score INT,
+    created_at  TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS fss_record (
+    id          INT AUTO_INCREMENT PRIMARY KEY,
+    name        VARCHAR(64) NOT NULL,
+    ts          VARCHAR(32),
+    q1 TINYINT, q2 TINYINT, q3 TINYINT, q4 TINYINT, q5 TINYINT,
+    q6 TINYINT, q7 TINYINT, q8 TINYINT, q9 TINYINT,
+    total_score INT,
+    created_at  TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS sas_record (
+    id          INT AUTO_INCREMENT PRIMARY KEY,
+    name        VARCHAR(64) NOT NULL,
+    ts          VARCHAR(32),
+    q1 TINYINT, q2 TINYINT, q3 TINYINT, q4 TINYINT, q5 TINYINT, q6 TINYINT, q7 TINYINT,
+    q8 TINYINT, q9 TINYINT, q10 TINYINT, q11 TINYINT, q12 TINYINT, q13 TINYINT,
+    q14 TINYINT, q15 TINYINT, q16 TINYINT, q17 TINYINT, q18 TINYINT, q19 TINYINT, q20 TINYINT,
+    raw_score   INT,
+    std_score   INT,
+    created_at  TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS sds_record (
+    id          INT AUTO_INCREMENT PRIMARY KEY,
+    name        VARCHAR(64) NOT NULL,
+    ts          VARCHAR(32),
+    q1 TINYINT, q2 TINYINT, q3 TINYINT, q4 TINYINT, q5 TINYINT, q6 TINYINT, q7 TINYINT,
+    q8 TINYINT, q9 TINYINT, q10 TINYINT, q11 TINYINT, q12 TINYINT, q13 TINYINT,
+    q14 TINYINT, q15 TINYINT, q16 TINYINT, q17 TINYINT, q18 TINYINT, q19 TINYINT, q20 TINYINT,
+    raw_score   INT,
+    std_score   INT,
+    created_at  TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS sleep_report_pdf (
+    id           INT AUTO_INCREMENT PRIMARY KEY,
+    patient_name VARCHAR(64) NOT NULL,
+    treat_date   VARCHAR(8)  NOT NULL,          -- YYYYMMDD
+    upload_time  DATETIME    NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    pdf_blob     LONGBLOB
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
@@ -0,0 +1,29 @@
+-- 0001 为页面中的热点查询建立复合/覆盖索引（在线 DDL，不阻塞读写）
+--
+-- sleep_diary
+--   患者历史（睡眠日记 plot_all_days / AI 分析 / 最近7次汇总）：
+--     派生表 WHERE name=? GROUP BY record_date 走 uq_name_record_date；
+--     外层 t1 只按 record_date + created_at 关联，原先只能全表扫描
+--   单次查询：WHERE name=? AND entry_date=? ORDER BY created_at DESC
+--   区间查询（指定患者）：WHERE name=? AND entry_date BETWEEN ? AND ?
+--   按日期 / 区间查询（所有患者）：WHERE entry_date = ? / BETWEEN ? AND ?
+--     (entry_date, name) 隐含主键 id，可直接支持 (entry_date, name, id) 键集分页
+ALTER TABLE sleep_diary
+    ADD INDEX idx_record_date_created (record_date, created_at),
+    ADD INDEX idx_name_entry_created (name, entry_date, created_at),
+    ADD INDEX idx_entry_date_name (entry_date, name),
+    ALGORITHM=INPLACE, LOCK=NONE;
+
+-- 各量表：WHERE name=? ORDER BY created_at DESC
+ALTER TABLE psqi_record ADD INDEX idx_name_created (name, created_at), ALGORITHM=INPLACE, LOCK=NONE;
+ALTER TABLE isi_record  ADD INDEX idx_name_created (name, created_at), ALGORITHM=INPLACE, LOCK=NONE;
+ALTER TABLE has_record  ADD INDEX idx_name_created (name, created_at), ALGORITHM=INPLACE, LOCK=NONE;
+ALTER TABLE fss_record  ADD INDEX idx_name_created (name, created_at), ALGORITHM=INPLACE, LOCK=NONE;
+ALTER TABLE sas_record  ADD INDEX idx_name_created (name, created_at), ALGORITHM=INPLACE, LOCK=NONE;
+ALTER TABLE sds_record  ADD INDEX idx_name_created (name, created_at), ALGORITHM=INPLACE, LOCK=NONE;
+
+-- 报告列表：SELECT id, treat_date, upload_time WHERE patient_name=? ORDER BY treat_date DESC
+-- 覆盖索引，列表查询不再读取含 pdf_blob 的聚簇行
+ALTER TABLE sleep_report_pdf
+    ADD INDEX idx_patient_treat_upload (patient_name, treat_date, upload_time),
+    ALGORITHM=INPLACE, LOCK=NONE;
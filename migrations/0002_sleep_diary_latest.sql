@@ -0,0 +1,35 @@
+-- 0002 sleep_diary_latest：每位患者每晚只保留最新一条日记的投影表
+-- 主键 (name, record_date) 即聚簇索引，患者历史读取为一次主键范围扫描，
+-- 不再需要 MAX(created_at) 聚合 + 自连接。
+-- 由 repository.save_sleep_diary 在同一事务内维护；
+-- 建表后执行 python -m tools.rebuild_diary_latest 回填历史数据。
+CREATE TABLE IF NOT EXISTS sleep_diary_latest (
+    name                VARCHAR(64)  NOT NULL,
+    record_date         DATE         NOT NULL,
+    id                  INT          NOT NULL,          -- 对应 sleep_diary.id
+    entry_date          DATE         NOT NULL,
+    nap_start           VARCHAR(8),
+    nap_end             VARCHAR(8),
+    daytime_bed_minutes INT,
+    nap_duration        INT,
+    caffeine            VARCHAR(255),
+    alcohol             VARCHAR(255),
+    med_name            VARCHAR(512),
+    med_dose            VARCHAR(255),
+    med_time            VARCHAR(8),
+    daytime_mood        VARCHAR(8),
+    sleep_interference  VARCHAR(64),
+    bed_time            VARCHAR(8),
+    try_sleep_time      VARCHAR(8),
+    sleep_latency       INT,
+    night_awake_count   INT,
+    night_awake_total   INT,
+    final_wake_time     VARCHAR(8),
+    get_up_time         VARCHAR(8),
+    total_sleep_hours   DOUBLE,
+    sleep_efficiency    DOUBLE,
+    sleep_quality       VARCHAR(8),
+    morning_feeling     VARCHAR(8),
+    created_at          TIMESTAMP    NOT NULL,
+    PRIMARY KEY (name, record_date)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
@@ -0,0 +1,10 @@
+-- 0003 sleep_diary.updated_at：行最后一次写入的时间
+-- 同一晚重复提交走 ON DUPLICATE KEY UPDATE，created_at 不变，只有 updated_at 能反映修改；
+-- 导出缓存按区间内 MAX(updated_at) 判断数据是否变化。
+-- sleep_diary_latest 随投影刷新一并复制该列。
+ALTER TABLE sleep_diary
+    ADD COLUMN updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    ADD INDEX idx_entry_date_updated (entry_date, updated_at);
+
+ALTER TABLE sleep_diary_latest
+    ADD COLUMN updated_at TIMESTAMP NULL;
@@ -0,0 +1,14 @@
+-- 0004 报告 PDF 迁出 MySQL：文件存于 report_store（按 SHA-256 内容寻址），表中只留元数据与哈希
+-- pdf_blob 改为可空，迁移工具 tools/migrate_report_blobs.py 校验文件后将其置空；
+-- 迁完后执行 OPTIMIZE TABLE sleep_report_pdf 回收空间。
+-- 报告列表查询多取 pdf_sha256，覆盖索引随之加上该列。
+ALTER TABLE sleep_report_pdf
+    ADD COLUMN pdf_sha256 CHAR(64) NULL,
+    ADD COLUMN pdf_size   BIGINT   NULL,
+    MODIFY pdf_blob LONGBLOB NULL,
+    ALGORITHM=INPLACE, LOCK=NONE;
+
+ALTER TABLE sleep_report_pdf
+    ADD INDEX idx_patient_treat_upload_sha (patient_name, treat_date, upload_time, pdf_sha256),
+    DROP INDEX idx_patient_treat_upload,
+    ALGORITHM=INPLACE, LOCK=NONE;
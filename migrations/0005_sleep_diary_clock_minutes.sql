@@ -0,0 +1,23 @@
+-- 0005 sleep_diary 时间列的整数分钟：每个 "HH:MM" 列加一个同名 _min 列，
+-- 值为自中午 12 点起的分钟数（0~1439，"无"/空为 NULL），跨午夜的上床、入睡时间可直接比较、求平均。
+-- 新提交由 repository.save_sleep_diary 写入；先执行本迁移再上线新代码，
+-- 历史行随后用 tools/backfill_clock_minutes.py 分块回填。
+ALTER TABLE sleep_diary
+    ADD COLUMN nap_start_min       SMALLINT NULL,
+    ADD COLUMN nap_end_min         SMALLINT NULL,
+    ADD COLUMN med_time_min        SMALLINT NULL,
+    ADD COLUMN bed_time_min        SMALLINT NULL,
+    ADD COLUMN try_sleep_time_min  SMALLINT NULL,
+    ADD COLUMN final_wake_time_min SMALLINT NULL,
+    ADD COLUMN get_up_time_min     SMALLINT NULL,
+    ALGORITHM=INPLACE, LOCK=NONE;
+
+ALTER TABLE sleep_diary_latest
+    ADD COLUMN nap_start_min       SMALLINT NULL,
+    ADD COLUMN nap_end_min         SMALLINT NULL,
+    ADD COLUMN med_time_min        SMALLINT NULL,
+    ADD COLUMN bed_time_min        SMALLINT NULL,
+    ADD COLUMN try_sleep_time_min  SMALLINT NULL,
+    ADD COLUMN final_wake_time_min SMALLINT NULL,
+    ADD COLUMN get_up_time_min     SMALLINT NULL,
+    ALGORITHM=INPLACE, LOCK=NONE;
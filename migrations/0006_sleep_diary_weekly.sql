@@ -0,0 +1,38 @@
+-- 0006 睡眠日记按患者、按 ISO 周的汇总表（rollup.py）
+-- 每项指标存 n / sum / sumsq，均值与方差由读取方换算；时间用 *_min 列（迁移 0005）。
+-- 由 tools/rollup_weekly.py 按 sleep_diary 的 (updated_at, id) 水位增量维护，水位存于 rollup_state；
+-- 建表后执行 python -m tools.rollup_weekly 补齐历史（从水位 0 开始即为全量）。
+CREATE TABLE IF NOT EXISTS sleep_diary_weekly (
+    name                        VARCHAR(64) NOT NULL,
+    yw                          INT         NOT NULL,          -- YEARWEEK(record_date, 3)
+    week_start                  DATE        NOT NULL,          -- 该周周一
+    nights                      INT         NOT NULL,
+    sleep_latency_n             INT NOT NULL DEFAULT 0,
+    sleep_latency_sum           DOUBLE,
+    sleep_latency_sumsq         DOUBLE,
+    night_awake_count_n         INT NOT NULL DEFAULT 0,
+    night_awake_count_sum       DOUBLE,
+    night_awake_count_sumsq     DOUBLE,
+    night_awake_total_n         INT NOT NULL DEFAULT 0,
+    night_awake_total_sum       DOUBLE,
+    night_awake_total_sumsq     DOUBLE,
+    total_sleep_hours_n         INT NOT NULL DEFAULT 0,
+    total_sleep_hours_sum       DOUBLE,
+    total_sleep_hours_sumsq     DOUBLE,
+    sleep_efficiency_n          INT NOT NULL DEFAULT 0,
+    sleep_efficiency_sum        DOUBLE,
+    sleep_efficiency_sumsq      DOUBLE,
+    bed_time_min_n              INT NOT NULL DEFAULT 0,
+    bed_time_min_sum            DOUBLE,
+    bed_time_min_sumsq          DOUBLE,
+    final_wake_time_min_n       INT NOT NULL DEFAULT 0,
+    final_wake_time_min_sum     DOUBLE,
+    final_wake_time_min_sumsq   DOUBLE,
+    refreshed_at                TIMESTAMP   NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (name, yw)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS rollup_state (
+    job  VARCHAR(64) NOT NULL PRIMARY KEY,
+    mark VARCHAR(64) NOT NULL                             -- "updated_at|id"
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
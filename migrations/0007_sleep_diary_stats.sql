@@ -0,0 +1,28 @@
+-- 0007 每位患者一行的滚动统计（diarystats.py）
+-- repository.save_sleep_diary 在保存事务内更新：只读写该患者这一行与该晚的投影行，不回读全部历史。
+-- recent 为近 30 晚指标的 JSON 缓冲；其余列为 7/14/30 晚均值与最近 7 晚相对前 7 晚的差值。
+-- 无需回填：患者下次保存时由 sleep_diary_latest 自动建立；tools/rebuild_diary_latest 重建投影时一并重建。
+CREATE TABLE IF NOT EXISTS sleep_diary_stats (
+    name                        VARCHAR(64) NOT NULL PRIMARY KEY,
+    nights                      INT         NOT NULL,
+    last_record_date            DATE        NOT NULL,
+    streak                      INT         NOT NULL,           -- 截至 last_record_date 的连续记录晚数
+    recent                      TEXT        NOT NULL,
+    sleep_efficiency_avg7       DOUBLE,
+    sleep_efficiency_avg14      DOUBLE,
+    sleep_efficiency_avg30      DOUBLE,
+    total_sleep_hours_avg7      DOUBLE,
+    total_sleep_hours_avg14     DOUBLE,
+    total_sleep_hours_avg30     DOUBLE,
+    sleep_latency_avg7          DOUBLE,
+    sleep_latency_avg14         DOUBLE,
+    sleep_latency_avg30         DOUBLE,
+    night_awake_count_avg7      DOUBLE,
+    night_awake_count_avg14     DOUBLE,
+    night_awake_count_avg30     DOUBLE,
+    sleep_efficiency_delta7     DOUBLE,
+    total_sleep_hours_delta7    DOUBLE,
+    sleep_latency_delta7        DOUBLE,
+    night_awake_count_delta7    DOUBLE,
+    updated_at                  TIMESTAMP   NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
@@ -0,0 +1,13 @@
+-- 0008 睡眠日记增量读取与同步：
+-- - idx_updated_id：同步（sync.py）与周汇总（rollup.py）按 (updated_at, id) 水位增量读取
+-- - edited_at：该晚日记在来源端保存的时刻，由 repository.save_sleep_diary 写入，同步时原样携带；
+--   本地与 SQLpub 的冲突按它判断新旧，不比较两端各自时钟生成的 updated_at。历史行为 NULL，视为最旧。
+-- sleep_diary_latest 随投影刷新一并复制 edited_at。
+ALTER TABLE sleep_diary
+    ADD COLUMN edited_at DATETIME(6) NULL,
+    ADD INDEX idx_updated_id (updated_at, id),
+    ALGORITHM=INPLACE, LOCK=NONE;
+
+ALTER TABLE sleep_diary_latest
+    ADD COLUMN edited_at DATETIME(6) NULL,
+    ALGORITHM=INPLACE, LOCK=NONE;
@@ -0,0 +1,11 @@
+-- 0009 门诊统计页面（pages/门诊统计.py）的全院区间聚合：
+--   睡眠日记：sleep_diary_latest WHERE record_date BETWEEN ? AND ?（主键 (name, record_date) 用不上）
+--   各量表：WHERE created_at >= ? AND created_at < ? 按分数分组，(created_at, 分数列) 为覆盖索引，不回表
+ALTER TABLE sleep_diary_latest ADD INDEX idx_record_date (record_date), ALGORITHM=INPLACE, LOCK=NONE;
+
+ALTER TABLE psqi_record ADD INDEX idx_created_score (created_at, total_score), ALGORITHM=INPLACE, LOCK=NONE;
+ALTER TABLE isi_record  ADD INDEX idx_created_score (created_at, total_score), ALGORITHM=INPLACE, LOCK=NONE;
+ALTER TABLE has_record  ADD INDEX idx_created_score (created_at, total_score), ALGORITHM=INPLACE, LOCK=NONE;
+ALTER TABLE fss_record  ADD INDEX idx_created_score (created_at, total_score), ALGORITHM=INPLACE, LOCK=NONE;
+ALTER TABLE sas_record  ADD INDEX idx_created_score (created_at, std_score), ALGORITHM=INPLACE, LOCK=NONE;
+ALTER TABLE sds_record  ADD INDEX idx_created_score (created_at, std_score), ALGORITHM=INPLACE, LOCK=NONE;
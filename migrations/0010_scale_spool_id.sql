@@ -0,0 +1,10 @@
+-- 0010 量表表的 spool_id：spool 日志条目的 UUID，唯一键。
+-- spool 写入为"至少一次"：MySQL 已提交、删除本地日志前进程退出时整批重放，
+-- INSERT ... ON DUPLICATE KEY UPDATE 按 spool_id 去重，同一份问卷只保留一行。
+-- 历史行与升级前入队的记录为 NULL（唯一键允许多个 NULL）。
+ALTER TABLE psqi_record ADD COLUMN spool_id CHAR(32) NULL, ADD UNIQUE INDEX uq_spool_id (spool_id), ALGORITHM=INPLACE, LOCK=NONE;
+ALTER TABLE isi_record  ADD COLUMN spool_id CHAR(32) NULL, ADD UNIQUE INDEX uq_spool_id (spool_id), ALGORITHM=INPLACE, LOCK=NONE;
+ALTER TABLE has_record  ADD COLUMN spool_id CHAR(32) NULL, ADD UNIQUE INDEX uq_spool_id (spool_id), ALGORITHM=INPLACE, LOCK=NONE;
+ALTER TABLE fss_record  ADD COLUMN spool_id CHAR(32) NULL, ADD UNIQUE INDEX uq_spool_id (spool_id), ALGORITHM=INPLACE, LOCK=NONE;
+ALTER TABLE sas_record  ADD COLUMN spool_id CHAR(32) NULL, ADD UNIQUE INDEX uq_spool_id (spool_id), ALGORITHM=INPLACE, LOCK=NONE;
+ALTER TABLE sds_record  ADD COLUMN spool_id CHAR(32) NULL, ADD UNIQUE INDEX uq_spool_id (spool_id), ALGORITHM=INPLACE, LOCK=NONE;
@@ -0,0 +1,284 @@
+-- 本地 SQLite 存储引擎（STORAGE_ENGINE=sqlite）的表结构，对应 MySQL migrations 0000–0010 之后的状态。
+-- 修改 MySQL 表结构时同步修改此文件。全部 IF NOT EXISTS，每次启动执行。
+--
+-- 与 MySQL 的差异：
+-- - updated_at 没有 ON UPDATE，由触发器维护；同步拉取不写入远端的 updated_at，本地 updated_at 只来自本地时钟
+-- - 量表表多一列 remote_id：本地写入的记录推送到 SQLpub 后记下远端 id，拉取时据此去重
+-- - 量表表 spool_id 的唯一索引在补列之后由 sqlite_engine.ADDED_INDEXES 创建（已有库文件先补列）
+-- - sleep_report_pdf 只保存元数据，id 与 SQLpub 一致，PDF 文件在 report_store 中
+-- - sync_state 保存同步水位
+
+CREATE TABLE IF NOT EXISTS sleep_diary (
+    id                  INTEGER PRIMARY KEY AUTOINCREMENT,
+    name                VARCHAR(64)  NOT NULL,
+    record_date         DATE         NOT NULL,
+    entry_date          DATE         NOT NULL,
+    nap_start           VARCHAR(8),
+    nap_end             VARCHAR(8),
+    daytime_bed_minutes INT,
+    nap_duration        INT,
+    caffeine            VARCHAR(255),
+    alcohol             VARCHAR(255),
+    med_name            VARCHAR(512),
+    med_dose            VARCHAR(255),
+    med_time            VARCHAR(8),
+    daytime_mood        VARCHAR(8),
+    sleep_interference  VARCHAR(64),
+    bed_time            VARCHAR(8),
+    try_sleep_time      VARCHAR(8),
+    sleep_latency       INT,
+    night_awake_count   INT,
+    night_awake_total   INT,
+    final_wake_time     VARCHAR(8),
+    get_up_time         VARCHAR(8),
+    total_sleep_hours   DOUBLE,
+    sleep_efficiency    DOUBLE,
+    sleep_quality       VARCHAR(8),
+    morning_feeling     VARCHAR(8),
+    nap_start_min       SMALLINT,
+    nap_end_min         SMALLINT,
+    med_time_min        SMALLINT,
+    bed_time_min        SMALLINT,
+    try_sleep_time_min  SMALLINT,
+    final_wake_time_min SMALLINT,
+    get_up_time_min     SMALLINT,
+    edited_at           DATETIME,
+    created_at          TIMESTAMP NOT NULL DEFAULT (datetime('now', 'localtime')),
+    updated_at          TIMESTAMP NOT NULL DEFAULT (datetime('now', 'localtime')),
+    UNIQUE (name, record_date)
+);
+CREATE INDEX IF NOT EXISTS idx_name_entry_created ON sleep_diary (name, entry_date, created_at);
+CREATE INDEX IF NOT EXISTS idx_entry_date_name ON sleep_diary (entry_date, name);
+CREATE INDEX IF NOT EXISTS idx_entry_date_updated ON sleep_diary (entry_date, updated_at);
+CREATE INDEX IF NOT EXISTS idx_updated_id ON sleep_diary (updated_at, id);
+
+CREATE TRIGGER IF NOT EXISTS sleep_diary_touch
+AFTER UPDATE ON sleep_diary FOR EACH ROW WHEN NEW.updated_at = OLD.updated_at
+BEGIN
+    UPDATE sleep_diary SET updated_at = datetime('now', 'localtime') WHERE id = NEW.id;
+END;
+
+CREATE TABLE IF NOT EXISTS sleep_diary_latest (
+    name                VARCHAR(64)  NOT NULL,
+    record_date         DATE         NOT NULL,
+    id                  INT          NOT NULL,
+    entry_date          DATE         NOT NULL,
+    nap_start           VARCHAR(8),
+    nap_end             VARCHAR(8),
+    daytime_bed_minutes INT,
+    nap_duration        INT,
+    caffeine            VARCHAR(255),
+    alcohol             VARCHAR(255),
+    med_name            VARCHAR(512),
+    med_dose            VARCHAR(255),
+    med_time            VARCHAR(8),
+    daytime_mood        VARCHAR(8),
+    sleep_interference  VARCHAR(64),
+    bed_time            VARCHAR(8),
+    try_sleep_time      VARCHAR(8),
+    sleep_latency       INT,
+    night_awake_count   INT,
+    night_awake_total   INT,
+    final_wake_time     VARCHAR(8),
+    get_up_time         VARCHAR(8),
+    total_sleep_hours   DOUBLE,
+    sleep_efficiency    DOUBLE,
+    sleep_quality       VARCHAR(8),
+    morning_feeling     VARCHAR(8),
+    nap_start_min       SMALLINT,
+    nap_end_min         SMALLINT,
+    med_time_min        SMALLINT,
+    bed_time_min        SMALLINT,
+    try_sleep_time_min  SMALLINT,
+    final_wake_time_min SMALLINT,
+    get_up_time_min     SMALLINT,
+    edited_at           DATETIME,
+    created_at          TIMESTAMP    NOT NULL,
+    updated_at          TIMESTAMP,
+    PRIMARY KEY (name, record_date)
+);
+CREATE INDEX IF NOT EXISTS idx_latest_record_date ON sleep_diary_latest (record_date);
+
+CREATE TABLE IF NOT EXISTS sleep_diary_weekly (
+    name                        VARCHAR(64) NOT NULL,
+    yw                          INT         NOT NULL,
+    week_start                  DATE        NOT NULL,
+    nights                      INT         NOT NULL,
+    sleep_latency_n             INT NOT NULL DEFAULT 0,
+    sleep_latency_sum           DOUBLE,
+    sleep_latency_sumsq         DOUBLE,
+    night_awake_count_n         INT NOT NULL DEFAULT 0,
+    night_awake_count_sum       DOUBLE,
+    night_awake_count_sumsq     DOUBLE,
+    night_awake_total_n         INT NOT NULL DEFAULT 0,
+    night_awake_total_sum       DOUBLE,
+    night_awake_total_sumsq     DOUBLE,
+    total_sleep_hours_n         INT NOT NULL DEFAULT 0,
+    total_sleep_hours_sum       DOUBLE,
+    total_sleep_hours_sumsq     DOUBLE,
+    sleep_efficiency_n          INT NOT NULL DEFAULT 0,
+    sleep_efficiency_sum        DOUBLE,
+    sleep_efficiency_sumsq      DOUBLE,
+    bed_time_min_n              INT NOT NULL DEFAULT 0,
+    bed_time_min_sum            DOUBLE,
+    bed_time_min_sumsq          DOUBLE,
+    final_wake_time_min_n       INT NOT NULL DEFAULT 0,
+    final_wake_time_min_sum     DOUBLE,
+    final_wake_time_min_sumsq   DOUBLE,
+    refreshed_at                TIMESTAMP   NOT NULL DEFAULT (datetime('now', 'localtime')),
+    PRIMARY KEY (name, yw)
+);
+
+CREATE TABLE IF NOT EXISTS rollup_state (
+    job  TEXT PRIMARY KEY,
+    mark TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS sleep_diary_stats (
+    name                        VARCHAR(64) NOT NULL PRIMARY KEY,
+    nights                      INT         NOT NULL,
+    last_record_date            DATE        NOT NULL,
+    streak                      INT         NOT NULL,
+    recent                      TEXT        NOT NULL,
+    sleep_efficiency_avg7       DOUBLE,
+    sleep_efficiency_avg14      DOUBLE,
+    sleep_efficiency_avg30      DOUBLE,
+    total_sleep_hours_avg7      DOUBLE,
+    total_sleep_hours_avg14     DOUBLE,
+    total_sleep_hours_avg30     DOUBLE,
+    sleep_latency_avg7          DOUBLE,
+    sleep_latency_avg14         DOUBLE,
+    sleep_latency_avg30         DOUBLE,
+    night_awake_count_avg7      DOUBLE,
+    night_awake_count_avg14     DOUBLE,
+    night_awake_count_avg30     DOUBLE,
+    sleep_efficiency_delta7     DOUBLE,
+    total_sleep_hours_delta7    DOUBLE,
+    sleep_latency_delta7        DOUBLE,
+    night_awake_count_delta7    DOUBLE,
+    updated_at                  TIMESTAMP   NOT NULL DEFAULT (datetime('now', 'localtime'))
+);
+
+CREATE TABLE IF NOT EXISTS psqi_record (
+    id                    INTEGER PRIMARY KEY AUTOINCREMENT,
+    remote_id             INT UNIQUE,
+    spool_id              CHAR(32),
+    name                  VARCHAR(64) NOT NULL,
+    gender                VARCHAR(8),
+    ts                    VARCHAR(32),
+    age                   INT,
+    height                INT,
+    weight                INT,
+    contact               VARCHAR(64),
+    bed_time              VARCHAR(8),
+    getup_time            VARCHAR(8),
+    sleep_latency_choice  TINYINT,
+    sleep_duration_choice TINYINT,
+    q5a TINYINT, q5b TINYINT, q5c TINYINT, q5d TINYINT, q5e TINYINT,
+    q5f TINYINT, q5g TINYINT, q5h TINYINT, q5i TINYINT, q5j TINYINT,
+    q6 TINYINT, q7 TINYINT, q8 TINYINT, q9 TINYINT,
+    A TINYINT, B TINYINT, C TINYINT, D TINYINT, E TINYINT, F TINYINT, G TINYINT,
+    total_score           INT,
+    sleep_efficiency      DOUBLE,
+    created_at            TIMESTAMP NOT NULL DEFAULT (datetime('now', 'localtime'))
+);
+
+CREATE TABLE IF NOT EXISTS isi_record (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    remote_id   INT UNIQUE,
+    spool_id    CHAR(32),
+    name        VARCHAR(64) NOT NULL,
+    ts          VARCHAR(32),
+    q1a_opt VARCHAR(16), q1a_score TINYINT,
+    q1b_opt VARCHAR(16), q1b_score TINYINT,
+    q1c_opt VARCHAR(16), q1c_score TINYINT,
+    q2_opt  VARCHAR(16), q2_score  TINYINT,
+    q3_opt  VARCHAR(16), q3_score  TINYINT,
+    q4_opt  VARCHAR(16), q4_score  TINYINT,
+    q5_opt  VARCHAR(16), q5_score  TINYINT,
+    total_score INT,
+    created_at  TIMESTAMP NOT NULL DEFAULT (datetime('now', 'localtime'))
+);
+
+CREATE TABLE IF NOT EXISTS has_record (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    remote_id   INT UNIQUE,
+    spool_id    CHAR(32),
+    name        VARCHAR(64) NOT NULL,
+    ts          VARCHAR(32),
+    q1 TINYINT, q2 TINYINT, q3 TINYINT, q4 TINYINT, q5 TINYINT, q6 TINYINT, q7 TINYINT,
+    q8 TINYINT, q9 TINYINT, q10 TINYINT, q11 TINYINT, q12 TINYINT, q13 TINYINT,
+    q14 TINYINT, q15 TINYINT, q16 TINYINT, q17 TINYINT, q18 TINYINT, q19 TINYINT,
+    q20 TINYINT, q21 TINYINT, q22 TINYINT, q23 TINYINT, q24 TINYINT, q25 TINYINT, q26 TINYINT,
+    total_score INT,
+    created_at  TIMESTAMP NOT NULL DEFAULT (datetime('now', 'localtime'))
+);
+
+CREATE TABLE IF NOT EXISTS fss_record (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    remote_id   INT UNIQUE,
+    spool_id    CHAR(32),
+    name        VARCHAR(64) NOT NULL,
+    ts          VARCHAR(32),
+    q1 TINYINT, q2 TINYINT, q3 TINYINT, q4 TINYINT, q5 TINYINT,
+    q6 TINYINT, q7 TINYINT, q8 TINYINT, q9 TINYINT,
+    total_score INT,
+    created_at  TIMESTAMP NOT NULL DEFAULT (datetime('now', 'localtime'))
+);
+
+CREATE TABLE IF NOT EXISTS sas_record (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    remote_id   INT UNIQUE,
+    spool_id    CHAR(32),
+    name        VARCHAR(64) NOT NULL,
+    ts          VARCHAR(32),
+    q1 TINYINT, q2 TINYINT, q3 TINYINT, q4 TINYINT, q5 TINYINT, q6 TINYINT, q7 TINYINT,
+    q8 TINYINT, q9 TINYINT, q10 TINYINT, q11 TINYINT, q12 TINYINT, q13 TINYINT,
+    q14 TINYINT, q15 TINYINT, q16 TINYINT, q17 TINYINT, q18 TINYINT, q19 TINYINT, q20 TINYINT,
+    raw_score   INT,
+    std_score   INT,
+    created_at  TIMESTAMP NOT NULL DEFAULT (datetime('now', 'localtime'))
+);
+
+CREATE TABLE IF NOT EXISTS sds_record (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    remote_id   INT UNIQUE,
+    spool_id    CHAR(32),
+    name        VARCHAR(64) NOT NULL,
+    ts          VARCHAR(32),
+    q1 TINYINT, q2 TINYINT, q3 TINYINT, q4 TINYINT, q5 TINYINT, q6 TINYINT, q7 TINYINT,
+    q8 TINYINT, q9 TINYINT, q10 TINYINT, q11 TINYINT, q12 TINYINT, q13 TINYINT,
+    q14 TINYINT, q15 TINYINT, q16 TINYINT, q17 TINYINT, q18 TINYINT, q19 TINYINT, q20 TINYINT,
+    raw_score   INT,
+    std_score   INT,
+    created_at  TIMESTAMP NOT NULL DEFAULT (datetime('now', 'localtime'))
+);
+
+CREATE INDEX IF NOT EXISTS idx_psqi_name_created ON psqi_record (name, created_at);
+CREATE INDEX IF NOT EXISTS idx_isi_name_created ON isi_record (name, created_at);
+CREATE INDEX IF NOT EXISTS idx_has_name_created ON has_record (name, created_at);
+CREATE INDEX IF NOT EXISTS idx_fss_name_created ON fss_record (name, created_at);
+CREATE INDEX IF NOT EXISTS idx_sas_name_created ON sas_record (name, created_at);
+CREATE INDEX IF NOT EXISTS idx_sds_name_created ON sds_record (name, created_at);
+CREATE INDEX IF NOT EXISTS idx_psqi_created_score ON psqi_record (created_at, total_score);
+CREATE INDEX IF NOT EXISTS idx_isi_created_score ON isi_record (created_at, total_score);
+CREATE INDEX IF NOT EXISTS idx_has_created_score ON has_record (created_at, total_score);
+CREATE INDEX IF NOT EXISTS idx_fss_created_score ON fss_record (created_at, total_score);
+CREATE INDEX IF NOT EXISTS idx_sas_created_score ON sas_record (created_at, std_score);
+CREATE INDEX IF NOT EXISTS idx_sds_created_score ON sds_record (created_at, std_score);
+
+CREATE TABLE IF NOT EXISTS sleep_report_pdf (
+    id           INTEGER PRIMARY KEY,
+    patient_name VARCHAR(64) NOT NULL,
+    treat_date   VARCHAR(8)  NOT NULL,
+    upload_time  DATETIME    NOT NULL,
+    pdf_blob     BLOB,
+    pdf_sha256   CHAR(64),
+    pdf_size     BIGINT
+);
+CREATE INDEX IF NOT EXISTS idx_patient_treat_upload_sha ON sleep_report_pdf (patient_name, treat_date, upload_time, pdf_sha256);
+
+CREATE TABLE IF NOT EXISTS sync_state (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
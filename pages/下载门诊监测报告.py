@@ -1,10 +1,11 @@
 # pages/下载门诊监测报告.py
 import streamlit as st
-import pymysql
-import os
-from dotenv import load_dotenv
+from db import get_connection
+from blobcache import get_blob_cache
+from report_store import get_report_store
+from profiler import start_run
 
-load_dotenv()
+run = start_run("下载门诊监测报告")
 
 st.set_page_config(page_title="下载门诊监测报告", layout="wide")
 st.title("📄 下载门诊监测报告")
@@ -13,51 +14,40 @@ st.markdown("---")
 name = st.text_input("请输入您的姓名：").strip()
 
 # ---------- 全局缓存 ----------
+def load_report_pdf(report_id, upload_time, sha256):
+    """已迁入文件存储的报告直接读文件；仍在 pdf_blob 中的报告经本地磁盘缓存读取（被淘汰时重新拉取）"""
+    store = get_report_store()
+    if sha256 and store.exists(sha256):
+        try:
+            with open(store.path_for(sha256), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            pass
+    return get_blob_cache().read(report_id, upload_time)
+
+
 @st.cache_data(show_spinner=False, ttl=60)          # 同一人 60 s 复用
 def list_report_meta(patient_name: str):
-    conn = pymysql.connect(
-        host=os.getenv('SQLPUB_HOST'),
-        port=int(os.getenv('SQLPUB_PORT', 3307)),
-        user=os.getenv('SQLPUB_USER'),
-        password=os.getenv('SQLPUB_PWD'),
-        db=os.getenv('SQLPUB_DB'),
-        charset='utf8mb4'
-    )
-    with conn.cursor() as cur:
+    with get_connection() as conn, conn.cursor() as cur:
         cur.execute("""
-            SELECT id, treat_date, upload_time
+            SELECT id, treat_date, upload_time, pdf_sha256
             FROM sleep_report_pdf
             WHERE patient_name = %s
             ORDER BY treat_date DESC
         """, (patient_name,))
         rows = cur.fetchall()
-    conn.close()
     return rows
 
 
-@st.cache_data(show_spinner=False, ttl=300)         # 同一份报告 5 min 复用
-def get_blob_by_id(report_id: int) -> bytes:
-    conn = pymysql.connect(
-        host=os.getenv('SQLPUB_HOST'),
-        port=int(os.getenv('SQLPUB_PORT', 3307)),
-        user=os.getenv('SQLPUB_USER'),
-        password=os.getenv('SQLPUB_PWD'),
-        db=os.getenv('SQLPUB_DB'),
-        charset='utf8mb4'
-    )
-    with conn.cursor() as cur:
-        cur.execute("SELECT pdf_blob FROM sleep_report_pdf WHERE id = %s", (report_id,))
-        (blob,) = cur.fetchone()
-    conn.close()
-    return blob
-
-
 # ---------- session 初始化 ----------
 if "meta_list" not in st.session_state:
     st.session_state.meta_list = []
 
+run.mark("form")
+
 # ---------- 1. 查列表 ----------
 if st.button("点击查看已有报告"):
+    run.trigger = "submit"
     if not name:
         st.warning("姓名不能为空")
         st.stop()
@@ -73,7 +63,7 @@ if st.session_state.meta_list:
 
     report_options = []
     for idx, row in enumerate(st.session_state.meta_list):
-        _, treat_date_str, _ = row
+        _, treat_date_str, _, _ = row
         # 将 YYYYMMDD 格式转换为 YYYY年MM月DD日 格式
         try:
             year = treat_date_str[:4]
@@ -88,7 +78,7 @@ if st.session_state.meta_list:
 
     selected_option = st.selectbox("请选择您要下载的报告：", report_options)
     selected_idx = report_options.index(selected_option)
-    selected_id, selected_treat_date_str, selected_upload = st.session_state.meta_list[selected_idx]
+    selected_id, selected_treat_date_str, selected_upload, selected_sha256 = st.session_state.meta_list[selected_idx]
 
     # 将选定的治疗日期也转换为 YYYY年MM月DD日 格式用于下载按钮
     try:
@@ -99,13 +89,23 @@ if st.session_state.meta_list:
     except (IndexError, TypeError):
         selected_formatted_date = selected_treat_date_str
 
-    # 只保留下载按钮
-    blob = get_blob_by_id(selected_id)
+    # 仍在 pdf_blob 中的报告先分段读取到本地磁盘缓存
+    if not (selected_sha256 and get_report_store().exists(selected_sha256)):
+        try:
+            get_blob_cache().get_path(selected_id, selected_upload)
+        except FileNotFoundError:
+            st.error("报告文件缺失，请联系工作人员。")
+            st.stop()
+
+    # 只保留下载按钮；PDF 在点击下载时才读取（st.download_button 的 data 为函数），
+    # 页面每次重跑不把整份 PDF 读进内存
     st.download_button(
         label=f"⬇️ 下载报告 (治疗日期: {selected_formatted_date})",
-        data=blob,
+        data=lambda: load_report_pdf(selected_id, selected_upload, selected_sha256),
         file_name=f"{name}_门诊监测报告_治疗日期_{selected_treat_date_str}.pdf",
         mime="application/pdf"
     )
 else:
     st.info("请先输入姓名并点击 '点击查看已有报告'。")
+
+run.finish()
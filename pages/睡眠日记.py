@@ -1,14 +1,20 @@
 import streamlit as st
-import pymysql
 import os
 from datetime import datetime, timedelta # 修改：导入 datetime
 import pytz # 新增：导入 pytz 库用于时区处理
 import time
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
 import dashscope
 from dashscope import Generation
+from db import run_query, run_patient_query
+from spool import submit, get_spool
+from sleeptime import time_to_min
+from charts import diary_figures
+from diarystats import WINDOWS, stats_prompt
+from profiler import start_run
+
+# 本次重跑的耗时分段：header / form / save / stats / charts / ai（见系统监控页）
+run = start_run("睡眠日记")
 
 # 自定义CSS样式（保持不变）
 st.markdown("""
@@ -56,36 +62,7 @@ st.markdown("""
 </div>
 """, unsafe_allow_html=True)
 st.title("🛏️ 睡眠日记")
-
-# 数据库连接函数
-def run_query(sql, params=None):
-    conn = pymysql.connect(
-        host=os.getenv("SQLPUB_HOST"),
-        port=int(os.getenv("SQLPUB_PORT", 3307)),
-        user=os.getenv("SQLPUB_USER"),
-        password=os.getenv("SQLPUB_PWD"),
-        database=os.getenv("SQLPUB_DB"),
-        charset="utf8mb4"
-    )
-    df = pd.read_sql(sql, conn, params=params)
-    conn.close()
-    return df
-
-# 时间 → 分钟（跨天） - 修复：添加安全检查
-def time_to_min(t):
-    try:
-        if pd.isna(t) or t == "无":
-            return None
-        h, m = map(int, t.split(":"))
-        return (h if h >= 12 else h + 24) * 60 + m
-    except (ValueError, AttributeError):
-        return None
-
-# 分钟 → 时间字符串
-def min_to_time(m):
-    h, mi = divmod(int(m), 60)
-    h = h - 24 if h >= 24 else h
-    return f"{h:02d}:{mi:02d}"
+run.mark("header")
 
 # 生成时间选项
 def generate_time_slots(start_hour, end_hour):
@@ -120,81 +97,21 @@ def generate_time_slots_10min_morning():
 
 # 绘图函数 - 所有次汇总图表
 def plot_all_days(patient_name):
-    df = run_query(
-        """
-        SELECT t1.* 
-        FROM sleep_diary t1
-        INNER JOIN (
-            SELECT record_date, MAX(created_at) AS max_created_at
-            FROM sleep_diary
-            WHERE name = %s
-            GROUP BY record_date
-        ) t2 
-        ON t1.record_date = t2.record_date AND t1.created_at = t2.max_created_at
-        ORDER BY t1.record_date ASC
-        """,
+    df = run_patient_query(
+        patient_name,
+        "SELECT * FROM sleep_diary_latest WHERE name = %s ORDER BY record_date ASC",
         params=(patient_name,)
     )
     if df.empty:
         st.warning("暂无记录")
         return
 
-    # 将日期格式化为"月-日"
-    df["date_fmt"] = pd.to_datetime(df["record_date"]).dt.strftime("%m-%d")
-
-    # 1. 夜间关键时间
-    night_cols = ["bed_time", "try_sleep_time", "final_wake_time", "get_up_time"]
-    night_labels = ["上床时间", "闭眼准备入睡时间", "最终醒来时间", "起床时间"]
-    data1 = []
-    for col, label in zip(night_cols, night_labels):
-        mins = df[col].apply(time_to_min)
-        data1.append(go.Scatter(x=df["date_fmt"], y=mins, name=label,
-                                mode="lines+markers+text", text=df[col],
-                                textposition="top center"))
-    fig1 = go.Figure(data1)
-    fig1.update_layout(
-        title="夜间关键时间点",
-        yaxis=dict(
-            tickformat="%H:%M", 
-            autorange=True,
-            showticklabels=False
-        ),
-        legend=dict(orientation="h", yanchor="bottom", y=1.02, x=0.5)
-    )
-    st.plotly_chart(fig1, use_container_width=True)
-
-    # 2. 日间小睡时间
-    nap_cols = ["nap_start", "nap_end"]
-    nap_labels = ["小睡开始时间", "小睡结束时间"]
-    data2 = []
-    for col, label in zip(nap_cols, nap_labels):
-        mins = df[col].apply(lambda t: int(t.split(":")[0]) * 60 + int(t.split(":")[1]) if pd.notna(t) and t != "无" and t != "" else None)
-        data2.append(go.Scatter(x=df["date_fmt"], y=mins, name=label,
-                                mode="lines+markers+text", text=df[col],
-                                textposition="top center"))
-    fig2 = go.Figure(data2)
-    fig2.update_layout(
-        title="日间小睡时间",
-        yaxis=dict(
-            tickformat="%H:%M", 
-            autorange=True,
-            showticklabels=False
-        ),
-        legend=dict(orientation="h", yanchor="bottom", y=1.02, x=1.02, xanchor="left")
-    )
-    st.plotly_chart(fig2, use_container_width=True)
-
-    # 3-7 其余指标
-    metrics = [("sleep_latency", "入睡所需时长（分钟）"),
-               ("night_awake_count", "夜间觉醒次数"),
-               ("night_awake_total", "夜间觉醒总时长（分钟）"),
-               ("total_sleep_hours", "总睡眠时长（小时）"),
-               ("sleep_efficiency", "睡眠效率（%）")]
-    for col, title in metrics:
-        fig = px.line(df, x="date_fmt", y=col, markers=True, title=title)
-        fig.update_layout(xaxis_title="填写日期", yaxis_title=title)
+    for fig in diary_figures(df):
         st.plotly_chart(fig, use_container_width=True)
 
+    # 将日期格式化为"月-日"（明细表中的"日期"列）
+    df["date_fmt"] = pd.to_datetime(df["record_date"]).dt.strftime("%m-%d")
+
     # 显示数据框（使用中文列名）
     df_display = df.copy()
     
@@ -273,8 +190,35 @@ def plot_all_days(patient_name):
     
     st.dataframe(df_display.reset_index(drop=True))
 
+# 滚动统计（保存时在同一事务内更新，见 diarystats.py），只读该患者一行
+def load_diary_stats(patient_name):
+    df = run_query("SELECT * FROM sleep_diary_stats WHERE name = %s", params=(patient_name,))
+    return None if df.empty else df.iloc[0].to_dict()
+
+
+def show_stats_cards(stats):
+    def fmt(v, digits=1):
+        return "-" if pd.isna(v) else f"{v:.{digits}f}"
+
+    def delta(v, digits=1):
+        return None if pd.isna(v) else f"{v:+.{digits}f}"
+
+    c1, c2, c3, c4 = st.columns(4)
+    c1.metric("连续记录", f"{int(stats['streak'])} 晚", help=f"累计记录 {int(stats['nights'])} 晚")
+    c2.metric("近7晚睡眠效率（%）", fmt(stats["sleep_efficiency_avg7"]),
+              delta(stats["sleep_efficiency_delta7"]), help="变化为与之前7晚相比")
+    c3.metric("近7晚总睡眠（小时）", fmt(stats["total_sleep_hours_avg7"], 2),
+              delta(stats["total_sleep_hours_delta7"], 2), help="变化为与之前7晚相比")
+    c4.metric("近7晚入睡时长（分钟）", fmt(stats["sleep_latency_avg7"]),
+              delta(stats["sleep_latency_delta7"]), delta_color="inverse", help="变化为与之前7晚相比")
+    st.caption("；".join(
+        f"近{n}晚：睡眠效率 {fmt(stats[f'sleep_efficiency_avg{n}'])}%，总睡眠 {fmt(stats[f'total_sleep_hours_avg{n}'], 2)} 小时"
+        for n in WINDOWS[1:]
+    ))
+
+
 # AI分析函数 - 修改为提供所有数据但保护隐私
-def analyze_sleep_data_with_ai(patient_name):
+def analyze_sleep_data_with_ai(patient_name, stats=None):
     """
     使用通义千问API分析患者的所有睡眠数据并给出建议（保护隐私）
     """
@@ -286,19 +230,9 @@ def analyze_sleep_data_with_ai(patient_name):
             return "API密钥未配置，无法提供AI分析建议。"
         
         # 获取患者的所有睡眠数据
-        all_data = run_query(
-            """
-            SELECT t1.* 
-            FROM sleep_diary t1
-            INNER JOIN (
-                SELECT record_date, MAX(created_at) AS max_created_at
-                FROM sleep_diary
-                WHERE name = %s
-                GROUP BY record_date
-            ) t2 
-            ON t1.record_date = t2.record_date AND t1.created_at = t2.max_created_at
-            ORDER BY t1.record_date ASC
-            """,
+        all_data = run_patient_query(
+            patient_name,
+            "SELECT * FROM sleep_diary_latest WHERE name = %s ORDER BY record_date ASC",
             params=(patient_name,)
         )
         
@@ -317,8 +251,11 @@ def analyze_sleep_data_with_ai(patient_name):
         # 格式化record_date为更友好的显示格式
         privacy_safe_data['record_date'] = pd.to_datetime(privacy_safe_data['record_date']).dt.strftime('%Y-%m-%d')
         
-        # 准备数据摘要
-        data_summary = f"患者所有睡眠记录数据（已保护隐私）：\n"
+        # 准备数据摘要：先给出滚动统计，再附全部记录
+        data_summary = ""
+        if stats:
+            data_summary += f"近期统计（系统自动计算）：\n{stats_prompt(stats)}\n\n"
+        data_summary += f"患者所有睡眠记录数据（已保护隐私）：\n"
         data_summary += f"记录总数：{len(privacy_safe_data)}条\n\n"
         
         # 添加所有记录的详细数据
@@ -604,9 +541,11 @@ with st.form("sleep_diary"):
     
     # 提交按钮
     submitted = st.form_submit_button("保存日记")
+run.mark("form")
 
 # 数据库连接和保存逻辑
 if submitted:
+    run.trigger = "submit"
     # 检查自检错误
     bed_min = time_to_min(bed_time)
     try_sleep_min = time_to_min(try_sleep_time)
@@ -696,82 +635,19 @@ if submitted:
                 </div>
             """, unsafe_allow_html=True)
             
-            # 连接数据库
-            conn = pymysql.connect(
-                host=os.getenv("SQLPUB_HOST"),
-                port=int(os.getenv("SQLPUB_PORT", 3307)),
-                user=os.getenv("SQLPUB_USER"),
-                password=os.getenv("SQLPUB_PWD"),
-                database=os.getenv("SQLPUB_DB"),
-                charset="utf8mb4"
-            )
+            # 先写入本地 spool（立即返回），由后台线程写入数据库
+            entry_id = submit("sleep_diary", record)
             
-            with conn.cursor() as cursor:
-                # 检查是否已存在该用户同一天的记录
-                check_sql = """
-                SELECT COUNT(*) FROM sleep_diary 
-                WHERE name = %(name)s AND record_date = %(record_date)s
-                """
-                cursor.execute(check_sql, {"name": name, "record_date": record_date.isoformat()})
-                exists = cursor.fetchone()[0] > 0
-                
-                if exists:
-                    # 更新现有记录
-                    update_sql = """
-                    UPDATE sleep_diary
-                    SET entry_date = %(entry_date)s,
-                        nap_start = %(nap_start)s,
-                        nap_end = %(nap_end)s,
-                        daytime_bed_minutes = %(daytime_bed_minutes)s,
-                        nap_duration = %(nap_duration)s,
-                        caffeine = %(caffeine)s,
-                        alcohol = %(alcohol)s,
-                        med_name = %(med_name)s,
-                        med_dose = %(med_dose)s,
-                        med_time = %(med_time)s,
-                        daytime_mood = %(daytime_mood)s,
-                        sleep_interference = %(sleep_interference)s,
-                        bed_time = %(bed_time)s,
-                        try_sleep_time = %(try_sleep_time)s,
-                        sleep_latency = %(sleep_latency)s,
-                        night_awake_count = %(night_awake_count)s,
-                        night_awake_total = %(night_awake_total)s,
-                        final_wake_time = %(final_wake_time)s,
-                        get_up_time = %(get_up_time)s,
-                        total_sleep_hours = %(total_sleep_hours)s,
-                        sleep_efficiency = %(sleep_efficiency)s,
-                        sleep_quality = %(sleep_quality)s,
-                        morning_feeling = %(morning_feeling)s
-                    WHERE name = %(name)s AND record_date = %(record_date)s
-                    """
-                    cursor.execute(update_sql, record)
-                    action = "更新"
-                else:
-                    # 插入新记录
-                    insert_sql = """
-                    INSERT INTO sleep_diary
-                    (name, record_date, entry_date, nap_start, nap_end, daytime_bed_minutes, nap_duration, caffeine, alcohol, 
-                     med_name, med_dose, med_time, daytime_mood, sleep_interference, 
-                     bed_time, try_sleep_time, sleep_latency, night_awake_count, 
-                     night_awake_total, final_wake_time, get_up_time, total_sleep_hours,
-                     sleep_efficiency, sleep_quality, morning_feeling)
-                    VALUES
-                    (%(name)s, %(record_date)s, %(entry_date)s, %(nap_start)s, %(nap_end)s, 
-                     %(daytime_bed_minutes)s, %(nap_duration)s, %(caffeine)s, %(alcohol)s, %(med_name)s, %(med_dose)s, %(med_time)s, 
-                     %(daytime_mood)s, %(sleep_interference)s, %(bed_time)s, %(try_sleep_time)s, 
-                     %(sleep_latency)s, %(night_awake_count)s, %(night_awake_total)s, 
-                     %(final_wake_time)s, %(get_up_time)s, %(total_sleep_hours)s, 
-                     %(sleep_efficiency)s, %(sleep_quality)s, %(morning_feeling)s)
-                    """
-                    cursor.execute(insert_sql, record)
-                    action = "保存"
-            
-            conn.commit()
-            conn.close()
+            # 稍等片刻让本次记录写入数据库，据写入结果提示"保存"或"更新"；超时则先提示已暂存
+            flushed = get_spool().wait_flushed(entry_id, timeout=5)
+            action = get_spool().result(entry_id) if flushed else None
             
             # 清除加载提示并显示成功消息
             loading_placeholder.empty()
-            st.success("✅ 日记保存完成！向下滑动可查看近期睡眠情况及AI分析！")
+            if action:
+                st.success(f"✅ 日记{action}完成！向下滑动可查看近期睡眠情况及AI分析！")
+            else:
+                st.success("✅ 日记已提交！向下滑动可查看近期睡眠情况及AI分析！")
             
             # 保存成功后，清空 session_state 中的表单数据
             st.session_state.form_data = {
@@ -802,9 +678,18 @@ if submitted:
                 "morning_feeling": "中"
             }
             
-            # 展示所有次汇总图表
+            # 展示所有次汇总图表（本次记录未及写入时先展示已有记录）
+            if not flushed:
+                st.info("数据库响应较慢，本次日记已安全暂存，将自动同步；下方图表可能暂未包含本次记录。")
+            run.mark("save")
+            stats = load_diary_stats(name)
+            if stats:
+                st.subheader("📌 近期概览")
+                show_stats_cards(stats)
+            run.mark("stats")
             st.subheader("📊 您所有次的睡眠情况")
             plot_all_days(name)
+            run.mark("charts")
             
             # AI分析和建议
             st.subheader("🤖 AI睡眠分析与建议")
@@ -814,7 +699,7 @@ if submitted:
             ai_analysis_placeholder.info("正在为您生成个性化的睡眠分析和建议...")
             
             try:
-                ai_analysis_result = analyze_sleep_data_with_ai(name)
+                ai_analysis_result = analyze_sleep_data_with_ai(name, stats)
                 ai_analysis_placeholder.empty()  # 清除加载提示
                 st.markdown(f"""
                     <div style="
@@ -830,6 +715,7 @@ if submitted:
                 """, unsafe_allow_html=True)
             except Exception as e:
                 ai_analysis_placeholder.error(f"AI分析失败：{str(e)}")
+            run.mark("ai")
                 
         except Exception as e:
             st.error(f"操作失败: {str(e)}")
@@ -862,3 +748,5 @@ else: # 如果没有提交表单，保存当前表单内容到 session_state
         "sleep_quality": sleep_quality,
         "morning_feeling": morning_feeling
     })
+
+run.finish()
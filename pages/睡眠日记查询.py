@@ -1,11 +1,15 @@
 import streamlit as st
 import pandas as pd
-import pymysql
-import os
 import plotly.express as px
 import plotly.graph_objects as go
 from datetime import date
-import io
+from db import run_query, run_patient_query, iter_query
+from export import export_key, deferred_download
+from sleeptime import column_minutes, min_to_time
+from rollup import weekly_stats
+from profiler import start_run
+
+run = start_run("睡眠日记查询")
 
 st.set_page_config(page_title="睡眠日记查询", layout="wide")
 st.title("📊 睡眠日记查询")
@@ -14,34 +18,9 @@ pwd = st.text_input("查询密码", type="password")
 if pwd.strip() != "10338":
     st.stop()
 
-tab1, tab2, tab3, tab4 = st.tabs(["🔍 单次查询", "📈 最近7次汇总", "📅 按日期查询", "🗓️ 日期区间查询"])
-
-def run_query(sql, params=None):
-    conn = pymysql.connect(
-        host=os.getenv("SQLPUB_HOST"),
-        port=int(os.getenv("SQLPUB_PORT", 3307)),
-        user=os.getenv("SQLPUB_USER"),
-        password=os.getenv("SQLPUB_PWD"),
-        database=os.getenv("SQLPUB_DB"),
-        charset="utf8mb4"
-    )
-    df = pd.read_sql(sql, conn, params=params)
-    conn.close()
-    return df
+# 连接池、缓存、同步等运行状态见「系统监控」页
 
-# 时间 → 分钟（跨天）
-def time_to_min(t):
-    try:
-        h, m = map(int, t.split(":"))
-        return (h if h >= 12 else h + 24) * 60 + m
-    except:
-        return None
-
-# 分钟 → 时间字符串
-def min_to_time(m):
-    h, mi = divmod(int(m), 60)
-    h = h - 24 if h >= 24 else h
-    return f"{h:02d}:{mi:02d}"
+tab1, tab2, tab3, tab4 = st.tabs(["🔍 单次查询", "📈 最近7次汇总", "📅 按日期查询", "🗓️ 日期区间查询"])
 
 # 中英文字段映射字典 - 更新了 try_sleep_time 的中文名
 field_mapping = {
@@ -70,16 +49,48 @@ field_mapping = {
     "sleep_efficiency": "睡眠效率（%）",
     "sleep_quality": "睡眠质量自我评价",
     "morning_feeling": "晨起后精神状态",
-    "created_at": "创建时间"
+    "created_at": "创建时间",
+    "updated_at": "更新时间"
 }
 
-def convert_df_to_excel(df):
-    """将DataFrame转换为Excel格式的字节流"""
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name='睡眠日记数据')
-    processed_data = output.getvalue()
-    return processed_data
+# 明细表的列顺序：重要的信息放在前面
+display_order = [
+    "姓名", "记录日期", "填写日期", "上床时间", "闭眼准备入睡时间",
+    "入睡所需时间（分钟）", "夜间觉醒次数", "夜间觉醒总时长（分钟）",
+    "早晨最终醒来时间", "起床时间", "总睡眠时长（小时）", "睡眠效率（%）",
+    "睡眠质量自我评价", "晨起后精神状态", "日间小睡开始时间", "日间小睡结束时间",
+    "日间卧床时间（分钟）", "昨日白天小睡总时长（分钟）", "日间情绪状态", "睡眠干扰因素",
+    "咖啡因摄入", "酒精摄入", "药物名称", "药物剂量", "服药时间", "创建时间", "更新时间"
+]
+
+def to_display(df):
+    """列名替换为中文并按 display_order 排列"""
+    df_display = df.rename(columns=field_mapping)
+    existing_cols = [col for col in display_order if col in df_display.columns]
+    other_cols = [col for col in df_display.columns if col not in existing_cols]
+    return df_display[existing_cols + other_cols]
+
+def data_version(df):
+    """导出缓存键中的数据版本：行数 + 最后写入时间（同一晚重复提交会刷新 updated_at）"""
+    return len(df), str(df["updated_at"].max())
+
+# 日期区间（全部患者）按 (entry_date, name, id) 键集分页，走索引 idx_entry_date_name，
+# 翻到第 N 页也只读一页数据
+RANGE_PAGE_SIZE = 200
+RANGE_SQL = "SELECT * FROM sleep_diary WHERE entry_date BETWEEN %s AND %s"
+# 行值比较，MySQL 可直接作为 (entry_date, name, id) 上的索引范围（二级索引隐含主键 id）
+RANGE_AFTER = " AND (entry_date, name, id) > (%s, %s, %s)"
+RANGE_ORDER = " ORDER BY entry_date, name, id"
+
+def fetch_range_page(start, end, after=None):
+    """取 after=(entry_date, name, id) 之后的一页"""
+    sql, params = RANGE_SQL, [start, end]
+    if after is not None:
+        sql += RANGE_AFTER
+        params += list(after)
+    sql += RANGE_ORDER + " LIMIT %s"
+    params.append(RANGE_PAGE_SIZE)
+    return run_query(sql, params=params)
 
 # 拆分药物信息的辅助函数
 def split_med_info(med_str):
@@ -91,14 +102,21 @@ def split_med_info(med_str):
     # 过滤掉空字符串
     return [part for part in parts if part]
 
+run.mark("header")
+
 # ---------- 单次查询 ----------
 with tab1:
     patient = st.text_input("患者姓名").strip()
     entry_date = st.date_input("填写日期", date.today())
     if st.button("查询单次") and patient:
-        df = run_query(
+        # 查询条件保存在 session state，点击"生成Excel"等按钮重跑时结果仍然显示
+        st.session_state.single_query = (patient, entry_date.isoformat())
+    if st.session_state.get("single_query"):
+        patient, entry_date = st.session_state.single_query
+        df = run_patient_query(
+            patient,
             "SELECT * FROM sleep_diary WHERE name=%s AND entry_date=%s ORDER BY created_at DESC",
-            params=(patient, entry_date.isoformat())
+            params=(patient, entry_date)
         )
         
         if df.empty:
@@ -150,12 +168,11 @@ with tab1:
             st.dataframe(df_display, use_container_width=True)
             
             # 提供Excel下载
-            excel_data = convert_df_to_excel(df_display)
-            st.download_button(
-                label="📥 下载Excel",
-                data=excel_data,
-                file_name=f"单次查询_{patient}_{entry_date}.xlsx",
-                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+            deferred_download(
+                export_key("single", patient, entry_date, data_version(df)),
+                lambda: [df_display],
+                f"单次查询_{patient}_{entry_date}.xlsx",
+                key="single_export"
             )
             
             # 为每条记录创建详细查看
@@ -205,155 +222,189 @@ with tab1:
 
                         st.write(f"**睡眠干扰因素:** {row['sleep_interference']}")
 
+run.mark("single")
+
 # ---------- 最近7次汇总 ----------
 with tab2:
     patient = st.text_input("患者姓名（汇总）").strip()
     if st.button("查询最近7次") and patient:
-        df = run_query(
+        st.session_state.recent_query = patient
+    if st.session_state.get("recent_query"):
+        patient = st.session_state.recent_query
+        df = run_patient_query(
+            patient,
             """
-            SELECT t1.* 
-            FROM sleep_diary t1
-            INNER JOIN (
-                SELECT record_date, MAX(created_at) AS max_created_at
-                FROM sleep_diary
+            SELECT * FROM (
+                SELECT * FROM sleep_diary_latest
                 WHERE name = %s
-                GROUP BY record_date
                 ORDER BY record_date DESC
                 LIMIT 7
-            ) t2 
-            ON t1.record_date = t2.record_date AND t1.created_at = t2.max_created_at
-            ORDER BY t1.record_date ASC
+            ) t
+            ORDER BY record_date ASC
             """,
             params=(patient,)
         )
         if df.empty:
+            # 只提示，不 st.stop()：查询条件保存在 session state 中，停在这里会让后面的标签页每次重跑都不再渲染
             st.warning("暂无记录")
-            st.stop()
-
-        df["date_fmt"] = pd.to_datetime(df["record_date"]).dt.strftime("%m-%d")
+        else:
+            df["date_fmt"] = pd.to_datetime(df["record_date"]).dt.strftime("%m-%d")
 
-        # 1. 夜间关键时间 - 更新了标签
-        night_cols = ["bed_time", "try_sleep_time", "final_wake_time", "get_up_time"]
-        night_labels = ["上床时间", "闭眼准备入睡时间", "最终醒来时间", "起床时间"] # 更新了标签
-        data1 = []
-        for col, label in zip(night_cols, night_labels):
-            mins = df[col].apply(time_to_min)  # 使用已有的 time_to_min 函数
-            data1.append(go.Scatter(x=df["date_fmt"], y=mins, name=label,
-                                    mode="lines+markers+text", text=df[col],
-                                    textposition="top center"))
-        fig1 = go.Figure(data1)
-        fig1.update_layout(
-            title="夜间关键时间点",
-            yaxis=dict(
-                tickformat="%H:%M", 
-                autorange=True,
-                showticklabels=False  # 隐藏y轴数字
-            ),
-            legend=dict(
-                orientation="h",        # 水平排列
-                yanchor="bottom",
-                y=1.02,
-                xanchor="center",
-                x=0.5
+            # 1. 夜间关键时间 - 更新了标签
+            night_cols = ["bed_time", "try_sleep_time", "final_wake_time", "get_up_time"]
+            night_labels = ["上床时间", "闭眼准备入睡时间", "最终醒来时间", "起床时间"] # 更新了标签
+            data1 = []
+            for col, label in zip(night_cols, night_labels):
+                mins = column_minutes(df, col)
+                data1.append(go.Scatter(x=df["date_fmt"], y=mins, name=label,
+                                        mode="lines+markers+text", text=df[col],
+                                        textposition="top center"))
+            fig1 = go.Figure(data1)
+            fig1.update_layout(
+                title="夜间关键时间点",
+                yaxis=dict(
+                    tickformat="%H:%M", 
+                    autorange=True,
+                    showticklabels=False  # 隐藏y轴数字
+                ),
+                legend=dict(
+                    orientation="h",        # 水平排列
+                    yanchor="bottom",
+                    y=1.02,
+                    xanchor="center",
+                    x=0.5
+                )
             )
-        )
-        st.plotly_chart(fig1, use_container_width=True)
+            st.plotly_chart(fig1, use_container_width=True)
 
-        # 2. 日间小睡时间 - 修改处理逻辑
-        nap_cols = ["nap_start", "nap_end"]
-        nap_labels = ["小睡开始时间", "小睡结束时间"]
-        data2 = []
-        for col, label in zip(nap_cols, nap_labels):
-            # 只处理非"无"的时间字符串
-            mins = df[col].apply(lambda t: time_to_min(t) if pd.notna(t) and t != "无" and t != "" else None)
-            data2.append(go.Scatter(x=df["date_fmt"], y=mins, name=label,
-                                    mode="lines+markers+text", text=df[col],
-                                    textposition="top center"))
-        fig2 = go.Figure(data2)
-        fig2.update_layout(
-            title="日间小睡时间",
-            yaxis=dict(
-                tickformat="%H:%M", 
-                autorange=True,
-                showticklabels=False  # 隐藏y轴数字
-            ),
-            legend=dict(
-                orientation="h",        # 水平排列
-                yanchor="bottom",
-                y=1.02,
-                xanchor="center",
-                x=0.5
+            # 2. 日间小睡时间 - 修改处理逻辑
+            nap_cols = ["nap_start", "nap_end"]
+            nap_labels = ["小睡开始时间", "小睡结束时间"]
+            data2 = []
+            for col, label in zip(nap_cols, nap_labels):
+                # "无"、空值为 NaN，图中留空
+                mins = column_minutes(df, col)
+                data2.append(go.Scatter(x=df["date_fmt"], y=mins, name=label,
+                                        mode="lines+markers+text", text=df[col],
+                                        textposition="top center"))
+            fig2 = go.Figure(data2)
+            fig2.update_layout(
+                title="日间小睡时间",
+                yaxis=dict(
+                    tickformat="%H:%M", 
+                    autorange=True,
+                    showticklabels=False  # 隐藏y轴数字
+                ),
+                legend=dict(
+                    orientation="h",        # 水平排列
+                    yanchor="bottom",
+                    y=1.02,
+                    xanchor="center",
+                    x=0.5
+                )
             )
-        )
-        st.plotly_chart(fig2, use_container_width=True)
+            st.plotly_chart(fig2, use_container_width=True)
 
-        # 3-7 其余指标
-        metrics = [("sleep_latency", "入睡所需时长（分钟）"),
-                   ("night_awake_count", "夜间觉醒次数"),
-                   ("night_awake_total", "夜间觉醒总时长（分钟）"),
-                   ("total_sleep_hours", "总睡眠时长（小时）"),
-                   ("sleep_efficiency", "睡眠效率（%）")]  # 添加睡眠效率
-        for col, title in metrics:
-            fig = px.line(df, x="date_fmt", y=col, markers=True, title=title)
-            st.plotly_chart(fig, use_container_width=True)
+            # 3-7 其余指标
+            metrics = [("sleep_latency", "入睡所需时长（分钟）"),
+                       ("night_awake_count", "夜间觉醒次数"),
+                       ("night_awake_total", "夜间觉醒总时长（分钟）"),
+                       ("total_sleep_hours", "总睡眠时长（小时）"),
+                       ("sleep_efficiency", "睡眠效率（%）")]  # 添加睡眠效率
+            for col, title in metrics:
+                fig = px.line(df, x="date_fmt", y=col, markers=True, title=title)
+                st.plotly_chart(fig, use_container_width=True)
+
+            # 按周趋势：读周汇总表（tools/rollup_weekly.py 定时维护），不回读原始日记
+            weekly = run_query(
+                "SELECT * FROM sleep_diary_weekly WHERE name = %s ORDER BY yw DESC LIMIT 26",
+                params=(patient,)
+            )
+            with st.expander(f"📆 按周趋势（近 {len(weekly)} 周，均值 ± 标准差）", expanded=False):
+                if weekly.empty:
+                    st.info("暂无周汇总数据")
+                else:
+                    weekly = weekly_stats(weekly.sort_values("yw"))
+                    for col, title in [("sleep_efficiency", "睡眠效率（%）"),
+                                       ("total_sleep_hours", "总睡眠时长（小时）"),
+                                       ("sleep_latency", "入睡所需时长（分钟）"),
+                                       ("night_awake_count", "夜间觉醒次数")]:
+                        fig = px.line(weekly, x="week_start", y=f"{col}_mean", error_y=f"{col}_sd",
+                                      markers=True, title=title, hover_data=["nights"])
+                        fig.update_layout(xaxis_title="周（周一）", yaxis_title=title)
+                        st.plotly_chart(fig, use_container_width=True)
+                    # 上床 / 醒来：*_min 为自中午 12 点起的分钟数，图中 y 轴不显示数字，悬停与标注显示时间
+                    fig = go.Figure([
+                        go.Scatter(x=weekly["week_start"], y=weekly[f"{col}_mean"], name=label,
+                                   mode="lines+markers+text", textposition="top center",
+                                   text=weekly[f"{col}_mean"].map(lambda m: min_to_time(m + 720) if pd.notna(m) else ""))
+                        for col, label in [("bed_time_min", "平均上床时间"), ("final_wake_time_min", "平均最终醒来时间")]
+                    ])
+                    fig.update_layout(title="平均上床 / 醒来时间", yaxis=dict(showticklabels=False),
+                                      legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="center", x=0.5))
+                    st.plotly_chart(fig, use_container_width=True)
 
-        # 显示汇总数据框（使用中文列名）
-        df_display = df.copy()
-        df_display.columns = [field_mapping.get(col, col) for col in df_display.columns]
+            # 显示汇总数据框（使用中文列名）
+            df_display = df.copy()
+            df_display.columns = [field_mapping.get(col, col) for col in df_display.columns]
         
-        important_cols = [
-            "姓名",
-            "记录日期",
-            "填写日期",
-            "上床时间",
-            "闭眼准备入睡时间", # 更新了列名
-            "入睡所需时间（分钟）",
-            "夜间觉醒次数",
-            "夜间觉醒总时长（分钟）",
-            "早晨最终醒来时间",
-            "起床时间",
-            "总睡眠时长（小时）",
-            "睡眠效率（%）",
-            "睡眠质量自我评价",
-            "晨起后精神状态",
-            "日间小睡开始时间",
-            "日间小睡结束时间",
-            "日间卧床时间（分钟）",
-            "昨日白天小睡总时长（分钟）",
-            "日间情绪状态",
-            "睡眠干扰因素",
-            "咖啡因摄入",
-            "酒精摄入",
-            "药物名称",
-            "药物剂量",
-            "服药时间",
-            "创建时间"
-        ]
+            important_cols = [
+                "姓名",
+                "记录日期",
+                "填写日期",
+                "上床时间",
+                "闭眼准备入睡时间", # 更新了列名
+                "入睡所需时间（分钟）",
+                "夜间觉醒次数",
+                "夜间觉醒总时长（分钟）",
+                "早晨最终醒来时间",
+                "起床时间",
+                "总睡眠时长（小时）",
+                "睡眠效率（%）",
+                "睡眠质量自我评价",
+                "晨起后精神状态",
+                "日间小睡开始时间",
+                "日间小睡结束时间",
+                "日间卧床时间（分钟）",
+                "昨日白天小睡总时长（分钟）",
+                "日间情绪状态",
+                "睡眠干扰因素",
+                "咖啡因摄入",
+                "酒精摄入",
+                "药物名称",
+                "药物剂量",
+                "服药时间",
+                "创建时间"
+            ]
         
-        existing_cols = [col for col in important_cols if col in df_display.columns]
-        other_cols = [col for col in df_display.columns if col not in existing_cols]
-        final_cols = existing_cols + other_cols
+            existing_cols = [col for col in important_cols if col in df_display.columns]
+            other_cols = [col for col in df_display.columns if col not in existing_cols]
+            final_cols = existing_cols + other_cols
         
-        df_display = df_display[final_cols]
+            df_display = df_display[final_cols]
         
-        st.dataframe(df_display.reset_index(drop=True))
+            st.dataframe(df_display.reset_index(drop=True))
         
-        # 提供Excel下载
-        excel_data = convert_df_to_excel(df_display)
-        st.download_button(
-            label="📥 下载Excel",
-            data=excel_data,
-            file_name=f"最近7次汇总_{patient}_{date.today()}.xlsx",
-            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-        )
+            # 提供Excel下载
+            deferred_download(
+                export_key("recent7", patient, data_version(df)),
+                lambda: [df_display],
+                f"最近7次汇总_{patient}_{date.today()}.xlsx",
+                key="recent_export"
+            )
+
+run.mark("recent")
 
 # ---------- 按日期查询 ----------
 with tab3:
     query_date = st.date_input("选择查询日期", date.today())
     if st.button("查询该日期所有记录"):
+        st.session_state.date_query = query_date.isoformat()
+    if st.session_state.get("date_query"):
+        query_date = st.session_state.date_query
         df_all = run_query(
             "SELECT * FROM sleep_diary WHERE entry_date=%s ORDER BY name, created_at DESC",
-            params=(query_date.isoformat())
+            params=(query_date,)
         )
         if df_all.empty:
             st.warning(f"{query_date} 没有发现记录")
@@ -403,14 +454,15 @@ with tab3:
             st.dataframe(df_display, use_container_width=True)
             
             # 提供Excel下载
-            excel_data = convert_df_to_excel(df_display)
-            st.download_button(
-                label="📥 下载Excel",
-                data=excel_data,
-                file_name=f"按日期查询_{query_date}.xlsx",
-                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+            deferred_download(
+                export_key("date", query_date, data_version(df_all)),
+                lambda: [df_display],
+                f"按日期查询_{query_date}.xlsx",
+                key="date_export"
             )
 
+run.mark("by_date")
+
 # ---------- 日期区间查询 ----------
 with tab4:
     col1, col2 = st.columns(2)
@@ -424,77 +476,78 @@ with tab4:
     if st.button("查询日期区间"):
         if start_date > end_date:
             st.error("开始日期不能晚于结束日期！")
+            st.session_state.range_query = None
         else:
-            if patient_name:
-                # 查询特定患者的日期区间数据
-                df_interval = run_query(
-                    "SELECT * FROM sleep_diary WHERE name=%s AND entry_date BETWEEN %s AND %s ORDER BY entry_date, created_at DESC",
-                    params=(patient_name, start_date.isoformat(), end_date.isoformat())
-                )
-            else:
-                # 查询所有患者的日期区间数据
-                df_interval = run_query(
-                    "SELECT * FROM sleep_diary WHERE entry_date BETWEEN %s AND %s ORDER BY name, entry_date, created_at DESC",
-                    params=(start_date.isoformat(), end_date.isoformat())
-                )
+            # 查询条件与翻页位置保存在 session state，翻页时页面重跑仍能显示结果
+            st.session_state.range_query = (start_date.isoformat(), end_date.isoformat(), patient_name)
+            st.session_state.range_pages = [None]    # 每页起点的键集游标
+    
+    range_query = st.session_state.get("range_query")
+    if range_query:
+        q_start, q_end, q_patient = range_query
+        file_name = f"日期区间查询_{q_start}_to_{q_end}"
+        if q_patient:
+            file_name += f"_{q_patient}"
+        file_name += ".xlsx"
+        
+        if q_patient:
+            # 查询特定患者的日期区间数据（单人数据量小，整体读取）
+            df_interval = run_patient_query(
+                q_patient,
+                "SELECT * FROM sleep_diary WHERE name=%s AND entry_date BETWEEN %s AND %s ORDER BY entry_date, created_at DESC",
+                params=(q_patient, q_start, q_end)
+            )
             
             if df_interval.empty:
-                st.warning(f"在 {start_date} 到 {end_date} 期间没有发现记录")
+                st.warning(f"在 {q_start} 到 {q_end} 期间没有发现记录")
             else:
                 st.success(f"共 {len(df_interval)} 条记录")
-                
-                # 将列名替换为中文
-                df_display = df_interval.copy()
-                df_display.columns = [field_mapping.get(col, col) for col in df_display.columns]
-                
-                # 重新排列列的顺序
-                important_cols = [
-                    "姓名",
-                    "记录日期",
-                    "填写日期",
-                    "上床时间",
-                    "闭眼准备入睡时间", # 更新了列名
-                    "入睡所需时间（分钟）",
-                    "夜间觉醒次数",
-                    "夜间觉醒总时长（分钟）",
-                    "早晨最终醒来时间",
-                    "起床时间",
-                    "总睡眠时长（小时）",
-                    "睡眠效率（%）",
-                    "睡眠质量自我评价",
-                    "晨起后精神状态",
-                    "日间小睡开始时间",
-                    "日间小睡结束时间",
-                    "日间卧床时间（分钟）",
-                    "昨日白天小睡总时长（分钟）",
-                    "日间情绪状态",
-                    "睡眠干扰因素",
-                    "咖啡因摄入",
-                    "酒精摄入",
-                    "药物名称",
-                    "药物剂量",
-                    "服药时间",
-                    "创建时间"
-                ]
-                
-                existing_cols = [col for col in important_cols if col in df_display.columns]
-                other_cols = [col for col in df_display.columns if col not in existing_cols]
-                final_cols = existing_cols + other_cols
-                
-                df_display = df_display[final_cols]
-                
+                df_display = to_display(df_interval)
                 st.dataframe(df_display, use_container_width=True)
                 
                 # 提供Excel下载
-                excel_data = convert_df_to_excel(df_display)
-                file_name = f"日期区间查询_{start_date}_to_{end_date}"
-                if patient_name:
-                    file_name += f"_{patient_name}"
-                file_name += ".xlsx"
+                deferred_download(
+                    export_key("range", q_start, q_end, q_patient, data_version(df_interval)),
+                    lambda: [df_display],
+                    file_name,
+                    key="range_export"
+                )
+        else:
+            # 查询所有患者的日期区间数据：键集分页，每次只读一页
+            # 总数与最后写入时间一起取，走覆盖索引 idx_entry_date_updated
+            summary = run_query(
+                "SELECT COUNT(*) AS n, MAX(updated_at) AS updated FROM sleep_diary WHERE entry_date BETWEEN %s AND %s",
+                params=(q_start, q_end)
+            ).iloc[0]
+            total = int(summary["n"])
+            
+            if total == 0:
+                st.warning(f"在 {q_start} 到 {q_end} 期间没有发现记录")
+            else:
+                pages = st.session_state.range_pages
+                df_page = fetch_range_page(q_start, q_end, pages[-1])
+                page_count = (total + RANGE_PAGE_SIZE - 1) // RANGE_PAGE_SIZE
+                st.success(f"共 {total} 条记录（第 {len(pages)} / {page_count} 页）")
+                st.dataframe(to_display(df_page), use_container_width=True)
                 
-                st.download_button(
-                    label="📥 下载Excel",
-                    data=excel_data,
-                    file_name=file_name,
-                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+                prev_col, next_col = st.columns(2)
+                with prev_col:
+                    if st.button("⬅️ 上一页", disabled=len(pages) == 1):
+                        pages.pop()
+                        st.rerun()
+                with next_col:
+                    if st.button("下一页 ➡️", disabled=len(df_page) < RANGE_PAGE_SIZE):
+                        last = df_page.iloc[-1]
+                        pages.append((str(last["entry_date"]), last["name"], int(last["id"])))
+                        st.rerun()
+                
+                # 完整区间的Excel按需生成，服务端游标逐块读取、边读边写
+                deferred_download(
+                    export_key("range", q_start, q_end, "", (total, str(summary["updated"]))),
+                    lambda: (to_display(chunk) for chunk in iter_query(RANGE_SQL + RANGE_ORDER, params=(q_start, q_end))),
+                    file_name,
+                    key="range_export"
                 )
+
+run.mark("range")
+run.finish()
@@ -0,0 +1,117 @@
+import streamlit as st
+import pandas as pd
+from datetime import datetime
+from db import STORAGE_ENGINE, pool_stats, patient_cache_stats, record_cache_stats, clear_query_caches
+from metrics import QUERY_LOG
+from profiler import RUN_LOG
+from blobcache import get_blob_cache
+from spool import get_spool
+
+st.set_page_config(page_title="系统监控", layout="wide")
+st.title("🩺 系统监控")
+
+pwd = st.text_input("管理员密码", type="password")
+if pwd.strip() != "10338":
+    st.stop()
+
+# ---------- SQL 耗时 ----------
+st.subheader("⏱️ SQL 耗时（按语句模板）")
+calls = QUERY_LOG.frame()
+if calls.empty:
+    st.info("暂无采样：本进程启动以来尚未执行过 SQL")
+else:
+    span = (calls["time"].max() - calls["time"].min()) / 60
+    c1, c2, c3, c4 = st.columns(4)
+    c1.metric("采样调用数", len(calls))
+    c2.metric("覆盖时长（分钟）", f"{span:.1f}")
+    c3.metric("全局 p95（ms）", f"{calls['ms'].quantile(0.95):.1f}")
+    c4.metric("错误数", int(calls["error"].notna().sum()))
+
+    summary = QUERY_LOG.summary()
+    keyword = st.text_input("按语句筛选（如表名）")
+    if keyword:
+        summary = summary[summary["template"].str.contains(keyword, case=False, regex=False)]
+    st.dataframe(
+        summary.rename(columns={
+            "template": "语句模板", "calls": "次数", "total_ms": "累计耗时(ms)",
+            "max_ms": "最大(ms)", "avg_rows": "平均行数", "avg_bytes": "平均字节", "errors": "错误",
+        }).round(1),
+        use_container_width=True, hide_index=True,
+    )
+
+    st.subheader("🐢 最慢的调用")
+    n = st.slider("显示条数", 10, 100, 20, step=10)
+    slowest = QUERY_LOG.slowest(n).copy()
+    slowest["time"] = slowest["time"].map(lambda t: datetime.fromtimestamp(t).strftime("%m-%d %H:%M:%S"))
+    st.dataframe(
+        slowest.rename(columns={
+            "time": "时间", "template": "语句模板", "ms": "耗时(ms)",
+            "rows": "行数", "bytes": "字节", "error": "错误",
+        }).round(1),
+        use_container_width=True, hide_index=True,
+    )
+
+    if st.button("🧹 清空采样"):
+        QUERY_LOG.clear()
+        st.rerun()
+
+# ---------- 页面重跑耗时 ----------
+st.subheader("🖥️ 页面运行耗时（按页面与触发方式）")
+st.caption("load：本会话首次打开；interaction：控件交互引起的重跑；submit：提交表单。未完成的运行（st.stop 等）耗时截至最后一个分段。")
+runs = RUN_LOG.summary()
+if runs.empty:
+    st.info("暂无页面运行记录")
+else:
+    st.dataframe(
+        runs.rename(columns={"page": "页面", "trigger": "触发方式", "runs": "次数", "max_ms": "最大(ms)"}).round(1),
+        use_container_width=True, hide_index=True,
+    )
+    page = st.selectbox("查看分段耗时", RUN_LOG.pages())
+    sections = RUN_LOG.section_summary(page)
+    if sections.empty:
+        st.info("该页面没有分段标记")
+    else:
+        st.dataframe(
+            sections.rename(columns={"trigger": "触发方式", "section": "分段", "runs": "次数", "max_ms": "最大(ms)"}).round(1),
+            use_container_width=True, hide_index=True,
+        )
+    if st.button("🧹 清空页面记录"):
+        RUN_LOG.clear()
+        st.rerun()
+
+# ---------- 各组件状态 ----------
+st.subheader("📦 组件状态")
+col_a, col_b = st.columns(2)
+with col_a:
+    # 连接池等待时间偏高时考虑调大 SQLPUB_POOL_SIZE
+    with st.expander("🔌 数据库连接池", expanded=True):
+        st.json(pool_stats())
+    with st.expander("📝 写入缓冲（spool）"):
+        st.json(get_spool().stats())
+    # 非连接类错误重试 SPOOL_MAX_ATTEMPTS 次仍失败的记录，不再自动重试
+    failed = get_spool().failed_entries()
+    if failed:
+        st.warning(f"写入缓冲中有 {len(failed)} 条记录已放弃重试")
+        st.dataframe(
+            pd.DataFrame(failed, columns=["日志id", "类型", "内容", "提交时间", "尝试次数", "最后错误"]).assign(
+                提交时间=lambda d: d["提交时间"].map(lambda t: datetime.fromtimestamp(t).strftime("%m-%d %H:%M:%S"))),
+            use_container_width=True, hide_index=True,
+        )
+        if st.button("🔁 重新排队"):
+            get_spool().retry_failed()
+            st.rerun()
+with col_b:
+    with st.expander("🗂️ 患者历史缓存", expanded=True):
+        st.json(patient_cache_stats())
+    with st.expander("📋 量表记录缓存"):
+        st.json(record_cache_stats())
+    # 重算量表分数（tools/rescore.py）后立即生效，不必等缓存过期
+    if st.button("🧹 清空查询缓存"):
+        clear_query_caches()
+        st.rerun()
+    with st.expander("📄 报告PDF缓存"):
+        st.json(get_blob_cache().stats())
+    if STORAGE_ENGINE == "sqlite":
+        from sync import get_sync_worker
+        with st.expander("🔄 SQLpub 同步"):
+            st.json(get_sync_worker().stats())
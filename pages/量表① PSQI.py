@@ -1,9 +1,14 @@
 import streamlit as st
 import pandas as pd
 from datetime import datetime
-import os, csv, pymysql
+import os, csv
+from spool import submit
+from profiler import start_run
+from scoring import PSQI_RESULTS, score_one
 import altair as alt
 
+run = start_run("量表① PSQI")
+
 # ---------- 1. 工具函数 ----------
 def save_csv_psqi(name, record):
     save_dir = r"F:\网页量表结果"
@@ -17,74 +22,13 @@ def save_csv_psqi(name, record):
     return path
 
 def save_sqlpub_psqi(record: dict):
+    """提交即写入本地 spool，由后台线程写入 SQLpub"""
     try:
-        conn = pymysql.connect(
-            host=os.getenv("SQLPUB_HOST"),
-            port=int(os.getenv("SQLPUB_PORT", 3307)),
-            user=os.getenv("SQLPUB_USER"),
-            password=os.getenv("SQLPUB_PWD"),
-            database=os.getenv("SQLPUB_DB"),
-            charset="utf8mb4",
-            connect_timeout=5
-        )
-        sql = """
-        INSERT INTO psqi_record
-        (name, gender, ts, age, height, weight, contact,
-         bed_time, getup_time, sleep_latency_choice, sleep_duration_choice,
-         q5a, q5b, q5c, q5d, q5e, q5f, q5g, q5h, q5i, q5j,
-         q6, q7, q8, q9,
-         A, B, C, D, E, F, G, total_score, sleep_efficiency)
-        VALUES
-        (%(name)s, %(gender)s, %(ts)s, %(age)s, %(height)s, %(weight)s, %(contact)s,
-         %(bed_time)s, %(getup_time)s, %(sleep_latency_choice)s, %(sleep_duration_choice)s,
-         %(q5a)s, %(q5b)s, %(q5c)s, %(q5d)s, %(q5e)s, %(q5f)s, %(q5g)s, %(q5h)s, %(q5i)s, %(q5j)s,
-         %(q6)s, %(q7)s, %(q8)s, %(q9)s,
-         %(A)s, %(B)s, %(C)s, %(D)s, %(E)s, %(F)s, %(G)s, %(total)s, %(sleep_efficiency)s)
-        """
-        cur = conn.cursor()
-        cur.execute(sql, record)
-        conn.commit()
+        submit("psqi_record", record)
     except Exception as e:
-        st.error("SQLpub 写入失败：" + str(e))
-    finally:
-        if 'conn' in locals():
-            conn.close()
+        st.error("数据暂存失败：" + str(e))
 
-# ---------- 2. 计算函数 ----------
-def calculate_sleep_efficiency(bed, getup, choice):
-    try:
-        bed_t  = datetime.strptime(bed,  "%H:%M").time()
-        get_t  = datetime.strptime(getup, "%H:%M").time()
-        bed_dt = datetime(2000, 1, 1, bed_t.hour, bed_t.minute)
-        get_dt = datetime(2000, 1, 2 if get_t < bed_t else 1, get_t.hour, get_t.minute)
-        bed_d  = (get_dt - bed_dt).total_seconds() / 3600
-        dur_map = {1: 7.5, 2: 6.5, 3: 5.5, 4: 4.5}
-        actual  = dur_map.get(choice, 0)
-        return (actual / bed_d * 100) if bed_d else 0
-    except:
-        return 0
-
-def get_component_score(eff):
-    return 0 if eff > 85 else 1 if 75 <= eff <= 84 else 2 if 65 <= eff <= 74 else 3
-
-def calculate_psqi(data):
-    A = data['q6'] - 1
-    lat = data['sleep_latency_choice'] - 1
-    q5a = data['q5a'] - 1
-    B = 0 if lat+q5a==0 else (1 if lat+q5a<=2 else 2 if lat+q5a<=4 else 3)
-    C = data['sleep_duration_choice'] - 1
-    eff = calculate_sleep_efficiency(data['bed_time'], data['getup_time'], data['sleep_duration_choice'])
-    D = get_component_score(eff)
-    E_items = ['q5a','q5b','q5c','q5d','q5e','q5f','q5g','q5h','q5i','q5j']
-    E_score = sum(data[k]-1 for k in E_items)
-    E = 0 if E_score==0 else 1 if E_score<=9 else 2 if E_score<=18 else 3
-    F = data['q7'] - 1
-    G_total = (data['q8']-1)+(data['q9']-1)
-    G = 0 if G_total==0 else 1 if G_total<=2 else 2 if G_total<=4 else 3
-    total = A+B+C+D+E+F+G
-    return {'A':A,'B':B,'C':C,'D':D,'E':E,'F':F,'G':G,'total':total,'sleep_efficiency':eff}
-
-# ---------- 3. Streamlit 页面 ----------
+# ---------- 2. Streamlit 页面 ----------
 st.set_page_config(page_title="匹兹堡睡眠质量指数(PSQI)", layout="centered")
 st.image("jsszyylogo.png", width=500)
 st.markdown("""
@@ -151,7 +95,9 @@ with st.form("psqi_form"):
 
     submitted = st.form_submit_button("提交问卷")
 
+run.mark("form")
 if submitted:
+    run.trigger = "submit"
     if not name.strip():
         st.warning("请输入姓名")
         st.stop()
@@ -167,7 +113,7 @@ if submitted:
         "q6":["很好","较好","较差","很差"].index(q6)+1,
         "q7":opts.index(q7)+1,"q8":opts.index(q8)+1,"q9":opts.index(q9)+1
     }
-    res = calculate_psqi(data)
+    res = score_one("PSQI", data)
 
     # 构造记录（键名务必与 SQL 占位符一致）
     record = {
@@ -180,7 +126,7 @@ if submitted:
         "sleep_duration_choice": data["sleep_duration_choice"],
         **{f"q5{k}": data[f"q5{k}"] for k in "abcdefghij"},
         "q6": data["q6"], "q7": data["q7"], "q8": data["q8"], "q9": data["q9"],
-        **res
+        **{k: res[k] for k in PSQI_RESULTS}
     }
     
     # 提示保存中
@@ -217,3 +163,5 @@ if submitted:
     st.info(f"综合评定：睡眠质量 **{level}**")
 
     st.success("PSQI 提交成功！")
+
+run.finish()
@@ -1,7 +1,12 @@
 import streamlit as st
 import pandas as pd
 from datetime import datetime
-import os, csv, pymysql     # 如用 PostgreSQL 可换成 psycopg2
+import os, csv
+from spool import submit
+from profiler import start_run
+from scoring import score_one
+
+run = start_run("量表② ISI")
 
 # ---------- 1. 先写所有函数 ----------
 def save_csv_isi(name, record):
@@ -16,67 +21,30 @@ def save_csv_isi(name, record):
     return path
 
 # ---------- 2. 数据库写入 ----------
-# 如果 SQLpub 给的是 MySQL，就用 PyMySQL；PostgreSQL 用 psycopg2
-# 下面给出 MySQL 版本（端口 3307）
 def save_sqlpub(record: dict):
+    """提交即写入本地 spool，由后台线程写入 SQLpub"""
     try:
-        conn = pymysql.connect(
-            host=os.getenv("SQLPUB_HOST"),
-            port=int(os.getenv("SQLPUB_PORT", 3307)),
-            user=os.getenv("SQLPUB_USER"),
-            password=os.getenv("SQLPUB_PWD"),
-            database=os.getenv("SQLPUB_DB"),
-            charset="utf8mb4",
-            connect_timeout=5
-        )
-        sql = """
-        INSERT INTO isi_record
-        (name, ts,
-         q1a_opt, q1a_score,
-         q1b_opt, q1b_score,
-         q1c_opt, q1c_score,
-         q2_opt,  q2_score,
-         q3_opt,  q3_score,
-         q4_opt,  q4_score,
-         q5_opt,  q5_score,
-         total_score)
-        VALUES
-        (%(name)s, %(ts)s,
-         %(1a_opt)s, %(1a_score)s,
-         %(1b_opt)s, %(1b_score)s,
-         %(1c_opt)s, %(1c_score)s,
-         %(2_opt)s,  %(2_score)s,
-         %(3_opt)s,  %(3_score)s,
-         %(4_opt)s,  %(4_score)s,
-         %(5_opt)s,  %(5_score)s,
-         %(total)s)
-        """
-        with conn.cursor() as cur:
-            cur.execute(sql, {
-                "name": record["姓名"],
-                "ts":   record["时间戳"],
-                "1a_opt": record["1a. 入睡困难(选项)"],
-                "1a_score": record["1a. 入睡困难(分值)"],
-                "1b_opt": record["1b. 睡眠维持困难(选项)"],
-                "1b_score": record["1b. 睡眠维持困难(分值)"],
-                "1c_opt": record["1c. 早醒(选项)"],
-                "1c_score": record["1c. 早醒(分值)"],
-                "2_opt": record["2. 睡眠满意度(选项)"],
-                "2_score": record["2. 睡眠满意度(分值)"],
-                "3_opt": record["3. 日常功能影响(选项)"],
-                "3_score": record["3. 日常功能影响(分值)"],
-                "4_opt": record["4. 生活质量影响(选项)"],
-                "4_score": record["4. 生活质量影响(分值)"],
-                "5_opt": record["5. 担心程度(选项)"],
-                "5_score": record["5. 担心程度(分值)"],
-                "total": record["总分"]
-            })
-        conn.commit()
+        submit("isi_record", {
+            "name": record["姓名"],
+            "ts":   record["时间戳"],
+            "1a_opt": record["1a. 入睡困难(选项)"],
+            "1a_score": record["1a. 入睡困难(分值)"],
+            "1b_opt": record["1b. 睡眠维持困难(选项)"],
+            "1b_score": record["1b. 睡眠维持困难(分值)"],
+            "1c_opt": record["1c. 早醒(选项)"],
+            "1c_score": record["1c. 早醒(分值)"],
+            "2_opt": record["2. 睡眠满意度(选项)"],
+            "2_score": record["2. 睡眠满意度(分值)"],
+            "3_opt": record["3. 日常功能影响(选项)"],
+            "3_score": record["3. 日常功能影响(分值)"],
+            "4_opt": record["4. 生活质量影响(选项)"],
+            "4_score": record["4. 生活质量影响(分值)"],
+            "5_opt": record["5. 担心程度(选项)"],
+            "5_score": record["5. 担心程度(分值)"],
+            "total": record["总分"]
+        })
     except Exception as e:
-        st.error("SQLpub 写入失败：" + str(e))
-    finally:
-        if 'conn' in locals():
-            conn.close()
+        st.error("数据暂存失败：" + str(e))
 
 # ---------- 3. Streamlit 页面 ----------
 st.set_page_config(page_title="失眠严重指数量表（ISI）", layout="centered")
@@ -112,7 +80,9 @@ choices = {}
 for txt, opts in questions:
     choices[txt] = st.radio(txt, opts, horizontal=True)
 
+run.mark("form")
 if st.button("提交 ISI"):
+    run.trigger = "submit"
     if not name:
         st.warning("请输入姓名")
         st.stop()
@@ -121,13 +91,12 @@ if st.button("提交 ISI"):
     "姓名": name,
     "时间戳": datetime.now().strftime("%Y%m%d%H%M").zfill(12)   # 12 位，无引号
 }
-    total = 0
     for txt, opts in questions:
         opt = choices[txt]
-        val = score_map[opt]
         record[f"{txt}(选项)"] = opt
-        record[f"{txt}(分值)"] = val
-        total += val
+        record[f"{txt}(分值)"] = score_map[opt]
+    # 题号 "1a. 入睡困难" → 列名 q1a_score
+    total = score_one("ISI", {f"q{txt.split('.')[0]}_score": score_map[opt] for txt, opt in choices.items()})["total"]
     record["总分"] = total
 
     path = save_csv_isi(name, record)
@@ -139,3 +108,5 @@ if st.button("提交 ISI"):
         st.write(f"- {k}：{v}（{score_map[v]} 分）")
 
     st.success("问卷提交成功！")
+
+run.finish()
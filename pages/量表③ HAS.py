@@ -1,7 +1,12 @@
 import streamlit as st
 import pandas as pd
 from datetime import datetime
-import os, csv, pymysql
+import os, csv
+from spool import submit
+from profiler import start_run
+from scoring import score_one
+
+run = start_run("量表③ HAS")
 
 # ---------- 1. 工具函数 ----------
 def save_csv_has(name, record):
@@ -16,38 +21,11 @@ def save_csv_has(name, record):
     return path
 
 def save_sqlpub_has(record: dict):
+    """提交即写入本地 spool，由后台线程写入 SQLpub"""
     try:
-        conn = pymysql.connect(
-            host=os.getenv("SQLPUB_HOST"),
-            port=int(os.getenv("SQLPUB_PORT", 3307)),
-            user=os.getenv("SQLPUB_USER"),
-            password=os.getenv("SQLPUB_PWD"),
-            database=os.getenv("SQLPUB_DB"),
-            charset="utf8mb4",
-            connect_timeout=5
-        )
-        sql = """
-        INSERT INTO has_record
-        (name, ts,
-         q1, q2, q3, q4, q5, q6, q7, q8, q9, q10,
-         q11, q12, q13, q14, q15, q16, q17, q18, q19, q20,
-         q21, q22, q23, q24, q25, q26,
-         total_score)
-        VALUES
-        (%(name)s, %(ts)s,
-         %(q1)s, %(q2)s, %(q3)s, %(q4)s, %(q5)s, %(q6)s, %(q7)s, %(q8)s, %(q9)s, %(q10)s,
-         %(q11)s, %(q12)s, %(q13)s, %(q14)s, %(q15)s, %(q16)s, %(q17)s, %(q18)s, %(q19)s, %(q20)s,
-         %(q21)s, %(q22)s, %(q23)s, %(q24)s, %(q25)s, %(q26)s,
-         %(total)s)
-        """
-        cur = conn.cursor()
-        cur.execute(sql, record)
-        conn.commit()
+        submit("has_record", record)
     except Exception as e:
-        st.error("SQLpub 写入失败：" + str(e))
-    finally:
-        if 'conn' in locals():
-            conn.close()
+        st.error("数据暂存失败：" + str(e))
 
 # ---------- 2. Streamlit 页面 ----------
 st.set_page_config(page_title="过度觉醒量表（HAS）", layout="centered")
@@ -100,13 +78,15 @@ for i, q in enumerate(questions, 1):
     # 使用循环索引作为题目序号
     choices[f"q{i}"] = st.radio(f"{i}. {q}", opts, horizontal=True, key=f"has_q{i}")
 
+run.mark("form")
 if st.button("提交 HAS"):
+    run.trigger = "submit"
     if not name.strip():
         st.warning("请输入姓名")
         st.stop()
 
     answers = [score_map[choices[f"q{i}"]] for i in range(1, 27)]
-    total = sum(answers)
+    total = score_one("HAS", {f"q{i}": v for i, v in enumerate(answers, 1)})["total"]
 
     # 构造与 SQL 占位符完全一致的记录
     record = {
@@ -125,3 +105,5 @@ if st.button("提交 HAS"):
     st.info(f"结论：{level}")
 
     st.success("HAS 提交成功！")
+
+run.finish()
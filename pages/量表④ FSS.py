@@ -1,7 +1,12 @@
 import streamlit as st
 import pandas as pd
 from datetime import datetime
-import os, csv, pymysql
+import os, csv
+from spool import submit
+from profiler import start_run
+from scoring import score_one
+
+run = start_run("量表④ FSS")
 
 # ---------- 1. 工具函数 ----------
 def save_csv_fss(name, record):
@@ -16,28 +21,9 @@ def save_csv_fss(name, record):
     return path
 
 def save_sqlpub(record: dict):
+    """提交即写入本地 spool，由后台线程写入 SQLpub"""
     try:
-        conn = pymysql.connect(
-            host=os.getenv("SQLPUB_HOST"),
-            port=int(os.getenv("SQLPUB_PORT", 3307)),
-            user=os.getenv("SQLPUB_USER"),
-            password=os.getenv("SQLPUB_PWD"),
-            database=os.getenv("SQLPUB_DB"),
-            charset="utf8mb4",
-            connect_timeout=5
-        )
-        sql = """
-        INSERT INTO fss_record
-        (name, ts,
-         q1, q2, q3, q4, q5, q6, q7, q8, q9,
-         total_score)
-        VALUES
-        (%(name)s, %(ts)s,
-         %(q1)s, %(q2)s, %(q3)s, %(q4)s, %(q5)s,
-         %(q6)s, %(q7)s, %(q8)s, %(q9)s, %(total)s)
-        """
-        cur = conn.cursor()
-        cur.execute(sql, {
+        submit("fss_record", {
             "name": record["姓名"],
             "ts":   record["时间戳"],
             "q1": record["1.当我感到疲劳时，我就什么事都不想做了(分值)"],
@@ -51,12 +37,8 @@ def save_sqlpub(record: dict):
             "q9": record["9.疲劳影响了我的工作、家庭、社会活动(分值)"],
             "total": record["总分"]
         })
-        conn.commit()
     except Exception as e:
-        st.error("SQLpub 写入失败：" + str(e))
-    finally:
-        if 'conn' in locals():
-            conn.close()
+        st.error("数据暂存失败：" + str(e))
 
 # ---------- 2. 页面 ----------
 st.set_page_config(page_title="疲劳严重程度量表（FSS）", layout="centered")
@@ -95,16 +77,17 @@ for i, q in enumerate(questions, 1):
         key=f"fss_q{i}"
     )
 
+run.mark("form")
 if st.button("提交 FSS"):
+    run.trigger = "submit"
     if not name:
         st.warning("请输入姓名")
         st.stop()
 
     record = {"姓名": name, "时间戳": datetime.now().strftime("%Y%m%d%H%M").zfill(12)}
-    total = 0
     for q, score in choices.items():
         record[f"{q}(分值)"] = score
-        total += score
+    total = score_one("FSS", {f"q{i}": score for i, score in enumerate(choices.values(), 1)})["total"]
     record["总分"] = total
 
     path = save_csv_fss(name, record)
@@ -116,3 +99,5 @@ if st.button("提交 FSS"):
     st.info(f"结论：{level}")
 
     st.success("FSS 提交成功！")
+
+run.finish()
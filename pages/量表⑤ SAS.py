@@ -1,7 +1,12 @@
 import streamlit as st
 import pandas as pd
 from datetime import datetime
-import os, csv, pymysql
+import os, csv
+from spool import submit
+from profiler import start_run
+from scoring import score_one
+
+run = start_run("量表⑤ SAS")
 
 # ---------- 1. 工具函数 ----------
 def save_csv_sas(name, record):
@@ -16,46 +21,13 @@ def save_csv_sas(name, record):
     return path
 
 def save_sqlpub_sas(record: dict):
+    """提交即写入本地 spool，由后台线程写入 SQLpub"""
     try:
-        conn = pymysql.connect(
-            host=os.getenv("SQLPUB_HOST"),
-            port=int(os.getenv("SQLPUB_PORT", 3307)),
-            user=os.getenv("SQLPUB_USER"),
-            password=os.getenv("SQLPUB_PWD"),
-            database=os.getenv("SQLPUB_DB"),
-            charset="utf8mb4",
-            connect_timeout=5
-        )
-        sql = """
-        INSERT INTO sas_record
-        (name, ts, q1, q2, q3, q4, q5, q6, q7, q8, q9, q10,
-         q11, q12, q13, q14, q15, q16, q17, q18, q19, q20,
-         raw_score, std_score)
-        VALUES
-        (%(name)s, %(ts)s,
-         %(q1)s, %(q2)s, %(q3)s, %(q4)s, %(q5)s,
-         %(q6)s, %(q7)s, %(q8)s, %(q9)s, %(q10)s,
-         %(q11)s, %(q12)s, %(q13)s, %(q14)s, %(q15)s,
-         %(q16)s, %(q17)s, %(q18)s, %(q19)s, %(q20)s,
-         %(raw)s, %(std)s)
-        """
-        cur = conn.cursor()
-        cur.execute(sql, record)
-        conn.commit()
+        submit("sas_record", record)
     except Exception as e:
-        st.error("SQLpub 写入失败：" + str(e))
-    finally:
-        if 'conn' in locals():
-            conn.close()
-
-# ---------- 2. 计算函数 ----------
-def calculate_sas(answers):
-    # answers: 20 个原始分
-    raw = sum(answers)
-    std = int(raw * 1.25 + 0.5)
-    return raw, std
+        st.error("数据暂存失败：" + str(e))
 
-# ---------- 3. Streamlit 页面 ----------
+# ---------- 2. Streamlit 页面 ----------
 st.set_page_config(page_title="焦虑自评量表（SAS）", layout="centered")
 st.image("jsszyylogo.png", width=500)
 st.markdown("""
@@ -93,7 +65,6 @@ questions = [
 
 opts = ["从无或偶尔","有时","经常","总是如此"]
 score_map = {"从无或偶尔":1,"有时":2,"经常":3,"总是如此":4}
-reverse_idx = {4,9,13,17,19}  # 1 开始
 
 choices = {}
 for i, q in enumerate(questions, 1):
@@ -104,23 +75,22 @@ for i, q in enumerate(questions, 1):
         key=f"sas_q{i}"
     )
 
+run.mark("form")
 if st.button("提交 SAS"):
+    run.trigger = "submit"
     if not name.strip():
         st.warning("请输入姓名")
         st.stop()
 
-    answers = []
-    for i in range(1, 21):
-        val = score_map[choices[f"q{i}"]]
-        answers.append(5 - val if i in reverse_idx else val)
-
-    raw, std = calculate_sas(answers)
+    # 反向题的换算由计分引擎完成（scoring.SCALE_RULES）
+    res = score_one("SAS", {f"q{i}": score_map[choices[f"q{i}"]] for i in range(1, 21)})
+    raw, std = res["raw"], res["std"]
 
     # 构造与 SQL 占位符完全一致的记录
     record = {
         "name": name,
         "ts": datetime.now().strftime("%Y/%-m/%-d %H:%M:%S"),
-        **{f"q{i}": v for i, v in enumerate(answers, 1)},
+        **{f"q{i}": res[f"q{i}"] for i in range(1, 21)},
         "raw": raw,
         "std": std
     }
@@ -134,3 +104,5 @@ if st.button("提交 SAS"):
     st.info(f"结论：{level}")
 
     st.success("SAS 提交成功！")
+
+run.finish()
@@ -1,7 +1,11 @@
 import streamlit as st
 import pandas as pd
-import pymysql, os, io
-from datetime import datetime
+import io
+from db import run_patient_query, fetch_records_by_id
+from scoring import SCORE_COLUMNS, grade_scores
+from profiler import start_run
+
+run = start_run("量表汇总查询")
 
 st.set_page_config(page_title="量表汇总结果查询", layout="wide")
 st.title("📋 汇总结果查询")
@@ -21,53 +25,28 @@ with st.form("query_form"):
     submitted = st.form_submit_button("确认查询")
 
 # 处理查询
+run.mark("form")
 if submitted and patient and password:
+    run.trigger = "submit"
     if password.strip() != "10338":
         st.error("密码错误")
         st.stop()
 
     # ---------- 数据库查询 ----------
     try:
-        conn = pymysql.connect(
-            host=os.getenv("SQLPUB_HOST"),
-            port=int(os.getenv("SQLPUB_PORT", 3307)),
-            user=os.getenv("SQLPUB_USER"),
-            password=os.getenv("SQLPUB_PWD"),
-            database=os.getenv("SQLPUB_DB"),
-            charset="utf8mb4"
+        # 六张量表一次 UNION ALL 取回，统一为 (量表, id, name, ts, created_at, score)
+        union_sql = "\nUNION ALL\n".join(
+            f"SELECT '{scale}' AS `量表`, id, name, ts, created_at, {col} AS score "
+            f"FROM {tbl} WHERE name=%(name)s"
+            for scale, (tbl, col) in SCORE_COLUMNS.items()
         )
-        
-        tables = ["isi_record", "fss_record", "psqi_record", "sas_record", "sds_record", "has_record"]
-        dfs = []
-        for tbl in tables:
-            try:
-                # 明确指定需要的列，避免列名冲突
-                columns_to_select = "id, name, ts, created_at"
-                if tbl == "isi_record":
-                    columns_to_select += ", total_score"
-                elif tbl == "fss_record":
-                    columns_to_select += ", total_score"
-                elif tbl == "psqi_record":
-                    columns_to_select += ", total_score"
-                elif tbl == "sas_record":
-                    columns_to_select += ", std_score"
-                elif tbl == "sds_record":
-                    columns_to_select += ", std_score"
-                elif tbl == "has_record":
-                    columns_to_select += ", total_score"
-                
-                df = pd.read_sql(
-                    f"SELECT {columns_to_select} FROM {tbl} WHERE name=%(name)s ORDER BY created_at DESC",
-                    conn,
-                    params={"name": patient}
-                )
-                df["量表"] = tbl.replace("_record", "").upper()
-                dfs.append(df)
-            except Exception as e:
-                st.warning(f"查询表 {tbl} 时出错: {str(e)}")
-        conn.close()
-        
-        df_all = pd.concat(dfs, ignore_index=True) if dfs else pd.DataFrame()
+        df_all = run_patient_query(
+            patient,
+            union_sql + "\nORDER BY created_at DESC",
+            params={"name": patient}
+        )
+        # 整列一次分级
+        df_all["等级"] = grade_scores(df_all["量表"], df_all["score"])
 
         if df_all.empty:
             st.warning("该患者暂无记录")
@@ -89,34 +68,10 @@ if st.session_state.query_submitted and not st.session_state.df_all.empty:
     df_all = st.session_state.df_all
     patient = st.session_state.patient_name
     
-    # 分数+等级映射
-    score_map = {
-        "ISI": "total_score",
-        "FSS": "total_score",
-        "PSQI": "total_score",
-        "SAS": "std_score",
-        "SDS": "std_score",
-        "HAS": "total_score"
-    }
-    
-    # 确保所有量表都有对应的列名
-    for scale, col in score_map.items():
-        if col not in df_all.columns:
-            df_all[col] = None  # 添加缺失的列
-
-    grade_map = {
-        "ISI": lambda x: "无失眠" if x < 8 else "轻度" if x < 15 else "中度" if x < 22 else "重度" if x is not None else "无数据",
-        "FSS": lambda x: "正常" if x < 36 else "疲劳" if x is not None else "无数据",
-        "PSQI": lambda x: "很好" if x <= 5 else "尚可" if x <= 10 else "一般" if x <= 15 else "很差" if x is not None else "无数据",
-        "SAS": lambda x: "无焦虑" if x < 50 else "轻度" if x < 60 else "中度" if x < 70 else "重度" if x is not None else "无数据",
-        "SDS": lambda x: "无抑郁" if x < 53 else "轻度" if x < 63 else "中度" if x < 73 else "重度" if x is not None else "无数据",
-        "HAS": lambda x: "正常" if x <= 32 else "过度觉醒" if x is not None else "无数据"
-    }
-
     st.subheader("📊 总分 & 等级")
     
     # 按量表分组显示分数和等级
-    for scale in ["ISI", "FSS", "PSQI", "SAS", "SDS", "HAS"]:
+    for scale in SCORE_COLUMNS:
         df_scale = df_all[df_all["量表"] == scale]
         if not df_scale.empty:
             st.markdown(f"#### {scale} 量表")
@@ -130,9 +85,6 @@ if st.session_state.query_submitted and not st.session_state.df_all.empty:
             for i, (_, row) in enumerate(df_scale.head(5).iterrows()):  # 只显示最近5次
                 if i < len(cols):
                     with cols[i]:
-                        col_score = score_map[scale]
-                        score_val = row[col_score] if col_score in row and pd.notnull(row[col_score]) else "无数据"
-                        
                         # 格式化时间显示
                         if pd.notnull(row["ts"]):
                             display_time = row["ts"]
@@ -140,14 +92,8 @@ if st.session_state.query_submitted and not st.session_state.df_all.empty:
                             display_time = row["created_at"].strftime("%m-%d") if pd.notnull(row["created_at"]) else "无日期"
                         
                         # 显示分数和等级（不保留小数）
-                        if score_val != "无数据" and isinstance(score_val, (int, float)):
-                            score_display = str(int(score_val))  # 转换为整数并转为字符串
-                            grade = grade_map[scale](score_val)
-                        else:
-                            score_display = "无数据"
-                            grade = "无数据"
-                            
-                        st.metric(f"{display_time}", score_display, delta=grade)
+                        score_display = str(int(row["score"])) if pd.notnull(row["score"]) else "无数据"
+                        st.metric(f"{display_time}", score_display, delta=row["等级"])
             
             st.markdown("---")  # 分隔线
 
@@ -155,7 +101,7 @@ if st.session_state.query_submitted and not st.session_state.df_all.empty:
     st.subheader("📈 详细历史记录下载")
     
     # 按量表分组
-    for scale in ["ISI", "FSS", "PSQI", "SAS", "SDS", "HAS"]:
+    for scale in SCORE_COLUMNS:
         df_scale = df_all[df_all["量表"] == scale]
         if not df_scale.empty:
             st.markdown(f"### {scale} 量表记录")
@@ -163,11 +109,17 @@ if st.session_state.query_submitted and not st.session_state.df_all.empty:
             # 按时间排序（最新的在上面）
             df_scale = df_scale.sort_values("created_at", ascending=False)
             
+            # 该量表所有记录的完整数据一次批量取回（按 (表, id) 缓存，重复渲染不再查库）
+            table_name = SCORE_COLUMNS[scale][0]
+            try:
+                details = fetch_records_by_id(table_name, df_scale["id"].tolist())
+            except Exception as e:
+                # 如果查询失败，回退到原来的单行数据
+                st.warning(f"获取详细记录失败: {str(e)}")
+                details = {}
+            
             # 显示该量表的所有记录
             for _, row in df_scale.iterrows():
-                col_score = score_map[scale]
-                score_val = row[col_score] if col_score in row and pd.notnull(row[col_score]) else "无数据"
-                
                 # 格式化时间显示
                 if pd.notnull(row["ts"]):
                     display_time = row["ts"]
@@ -175,12 +127,8 @@ if st.session_state.query_submitted and not st.session_state.df_all.empty:
                     display_time = row["created_at"].strftime("%Y-%m-%d %H:%M:%S") if pd.notnull(row["created_at"]) else "无时间"
                 
                 # 显示记录信息（不保留小数）
-                if score_val != "无数据" and isinstance(score_val, (int, float)):
-                    score_display = str(int(score_val))  # 转换为整数并转为字符串
-                    grade = grade_map[scale](score_val)
-                else:
-                    score_display = "无数据"
-                    grade = "无数据"
+                score_display = str(int(row["score"])) if pd.notnull(row["score"]) else "无数据"
+                grade = row["等级"]
                 
                 col1, col2, col3 = st.columns([2, 1, 1])
                 with col1:
@@ -195,45 +143,15 @@ if st.session_state.query_submitted and not st.session_state.df_all.empty:
                 ts_str = str(row["ts"]).replace("/", "").replace(":", "").replace(" ", "").replace("-", "") if pd.notnull(row["ts"]) else "无时间戳"
                 csv_name = f"{ts_str}_{patient}_{row['量表']}.csv"
                 
-                try:
-                    # 连接数据库查询完整记录（SELECT * 获取所有字段）
-                    conn = pymysql.connect(
-                        host=os.getenv("SQLPUB_HOST"),
-                        port=int(os.getenv("SQLPUB_PORT", 3307)),
-                        user=os.getenv("SQLPUB_USER"),
-                        password=os.getenv("SQLPUB_PWD"),
-                        database=os.getenv("SQLPUB_DB"),
-                        charset="utf8mb4"
-                    )
-                    
-                    # 根据量表名确定表名
-                    table_name = f"{row['量表'].lower()}_record"
-                    
-                    # 查询该记录的完整数据
-                    detail_df = pd.read_sql(
-                        f"SELECT * FROM {table_name} WHERE id=%(id)s",
-                        conn,
-                        params={"id": row['id']}
-                    )
-                    conn.close()
-                    
-                    # 如果查询到数据，则使用完整数据生成CSV
-                    if not detail_df.empty:
-                        buf = io.BytesIO()
-                        detail_df.to_csv(buf, index=False, encoding="utf-8-sig")
-                        buf.seek(0)
-                    else:
-                        # 如果没有找到详细记录，回退到原来的单行数据
-                        buf = io.BytesIO()
-                        pd.DataFrame([row]).to_csv(buf, index=False, encoding="utf-8-sig")
-                        buf.seek(0)
-                        
-                except Exception as e:
-                    # 如果查询失败，回退到原来的单行数据
-                    st.warning(f"获取详细记录失败: {str(e)}")
-                    buf = io.BytesIO()
+                detail_df = details.get(int(row["id"]))
+                buf = io.BytesIO()
+                if detail_df is not None:
+                    # 使用完整数据生成CSV
+                    detail_df.to_csv(buf, index=False, encoding="utf-8-sig")
+                else:
+                    # 如果没有找到详细记录，回退到原来的单行数据
                     pd.DataFrame([row]).to_csv(buf, index=False, encoding="utf-8-sig")
-                    buf.seek(0)
+                buf.seek(0)
                 
                 st.download_button(
                     label=f"📥 下载此记录",
@@ -249,3 +167,5 @@ if st.session_state.query_submitted and not st.session_state.df_all.empty:
 
 elif not st.session_state.query_submitted:
     st.info("请先输入患者姓名和管理员密码，再点击「确认查询」")
+
+run.finish()
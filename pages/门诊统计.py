@@ -0,0 +1,147 @@
+import streamlit as st
+import pandas as pd
+import plotly.express as px
+from datetime import date, timedelta
+from db import run_query
+from scoring import SCORE_COLUMNS, GRADE_RULES, grade_scores
+from sleeptime import min_to_time
+from profiler import start_run
+
+run = start_run("门诊统计")
+
+st.set_page_config(page_title="门诊统计", layout="wide")
+st.title("📈 门诊统计")
+st.caption("全院患者的按周趋势与量表分布；聚合在数据库中完成，只取回统计结果。")
+
+pwd = st.text_input("管理员密码", type="password")
+if pwd.strip() != "10338":
+    st.stop()
+
+c1, c2 = st.columns(2)
+start = c1.date_input("开始日期", date.today() - timedelta(weeks=26))
+end = c2.date_input("结束日期", date.today())
+if start > end:
+    st.error("开始日期不能晚于结束日期")
+    st.stop()
+
+# 每晚最新一条（sleep_diary_latest）按 ISO 周聚合；时间列用 *_min 整数列求平均
+WEEKLY_DIARY_SQL = """
+    SELECT YEARWEEK(record_date, 3) AS yw,
+           COUNT(*)                 AS nights,
+           COUNT(DISTINCT name)     AS patients,
+           AVG(sleep_efficiency)    AS sleep_efficiency,
+           AVG(total_sleep_hours)   AS total_sleep_hours,
+           AVG(sleep_latency)       AS sleep_latency,
+           AVG(night_awake_count)   AS night_awake_count,
+           AVG(bed_time_min)        AS bed_time_min,
+           AVG(final_wake_time_min) AS final_wake_time_min
+    FROM sleep_diary_latest
+    WHERE record_date BETWEEN %(start)s AND %(end)s
+    GROUP BY yw
+    ORDER BY yw
+"""
+
+DIARY_TOTALS_SQL = """
+    SELECT COUNT(*) AS nights, COUNT(DISTINCT name) AS patients,
+           AVG(sleep_efficiency) AS sleep_efficiency, AVG(total_sleep_hours) AS total_sleep_hours
+    FROM sleep_diary_latest
+    WHERE record_date BETWEEN %(start)s AND %(end)s
+"""
+
+# 六张量表：分数 → 份数；按周 → 份数、平均分
+SCORE_DIST_SQL = "\nUNION ALL\n".join(
+    f"SELECT '{scale}' AS scale, {col} AS score, COUNT(*) AS n FROM {tbl} "
+    f"WHERE created_at >= %(start)s AND created_at < %(end_next)s AND {col} IS NOT NULL GROUP BY {col}"
+    for scale, (tbl, col) in SCORE_COLUMNS.items()
+)
+WEEKLY_SCORE_SQL = "\nUNION ALL\n".join(
+    f"SELECT '{scale}' AS scale, YEARWEEK(created_at, 3) AS yw, COUNT(*) AS n, AVG({col}) AS mean_score "
+    f"FROM {tbl} WHERE created_at >= %(start)s AND created_at < %(end_next)s AND {col} IS NOT NULL GROUP BY yw"
+    for scale, (tbl, col) in SCORE_COLUMNS.items()
+)
+
+
+@st.cache_data(show_spinner=False, ttl=300)          # 统计结果 5 分钟内复用
+def load(sql, start, end):
+    df = run_query(sql, params={"start": start, "end": end, "end_next": end + timedelta(days=1)})
+    # MySQL 的 AVG 返回 Decimal，转为数值便于作图与格式化
+    for col in df.columns.drop("scale", errors="ignore"):
+        df[col] = pd.to_numeric(df[col])
+    return df
+
+
+def week_start(yw):
+    """YEARWEEK(..., 3) → 该 ISO 周的周一"""
+    return date.fromisocalendar(int(yw) // 100, int(yw) % 100, 1)
+
+
+run.mark("form")
+with st.spinner("统计中…"):
+    totals = load(DIARY_TOTALS_SQL, start, end).iloc[0]
+    weekly = load(WEEKLY_DIARY_SQL, start, end)
+    dist = load(SCORE_DIST_SQL, start, end)
+    weekly_scores = load(WEEKLY_SCORE_SQL, start, end)
+run.mark("query")
+
+# ---------- 睡眠日记 ----------
+st.subheader("🛌 睡眠日记（每晚最新一条）")
+m1, m2, m3, m4 = st.columns(4)
+m1.metric("患者数", int(totals["patients"] or 0))
+m2.metric("记录晚数", int(totals["nights"] or 0))
+m3.metric("平均睡眠效率（%）", f"{totals['sleep_efficiency']:.1f}" if pd.notna(totals["sleep_efficiency"]) else "-")
+m4.metric("平均总睡眠时长（小时）", f"{totals['total_sleep_hours']:.2f}" if pd.notna(totals["total_sleep_hours"]) else "-")
+
+if weekly.empty:
+    st.info("该区间暂无睡眠日记")
+else:
+    weekly["week"] = weekly["yw"].map(week_start)
+    for col, title in [("sleep_efficiency", "平均睡眠效率（%）"),
+                       ("total_sleep_hours", "平均总睡眠时长（小时）"),
+                       ("sleep_latency", "平均入睡所需时长（分钟）")]:
+        fig = px.line(weekly, x="week", y=col, markers=True, title=title, hover_data=["patients", "nights"])
+        fig.update_layout(xaxis_title="周（周一）", yaxis_title=title)
+        st.plotly_chart(fig, use_container_width=True)
+
+    table = weekly.copy()
+    # *_min 为自中午 12 点起的分钟数
+    for col in ["bed_time_min", "final_wake_time_min"]:
+        table[col] = table[col].map(lambda m: min_to_time(m + 720) if pd.notna(m) else "-")
+    st.dataframe(
+        table[["week", "patients", "nights", "sleep_efficiency", "total_sleep_hours", "sleep_latency",
+               "night_awake_count", "bed_time_min", "final_wake_time_min"]].rename(columns={
+            "week": "周（周一）", "patients": "患者数", "nights": "晚数", "sleep_efficiency": "睡眠效率(%)",
+            "total_sleep_hours": "总睡眠(小时)", "sleep_latency": "入睡时长(分钟)",
+            "night_awake_count": "夜醒次数", "bed_time_min": "平均上床", "final_wake_time_min": "平均醒来",
+        }).round(2),
+        use_container_width=True, hide_index=True,
+    )
+run.mark("diary")
+
+# ---------- 量表 ----------
+st.subheader("📋 量表分布")
+if dist.empty:
+    st.info("该区间暂无量表记录")
+else:
+    scale = st.selectbox("量表", [s for s in SCORE_COLUMNS if s in set(dist["scale"])])
+    d = dist[dist["scale"] == scale].sort_values("score")
+    d = d.assign(grade=grade_scores(d["scale"], d["score"]))
+    c1, c2 = st.columns([2, 1])
+    fig = px.bar(d, x="score", y="n", color="grade", title=f"{scale} 分数分布",
+                 category_orders={"grade": GRADE_RULES[scale][2]})
+    fig.update_layout(xaxis_title="分数", yaxis_title="份数")
+    c1.plotly_chart(fig, use_container_width=True)
+    grades = d.groupby("grade", sort=False)["n"].sum().reindex(GRADE_RULES[scale][2], fill_value=0)
+    c2.dataframe(
+        pd.DataFrame({"等级": grades.index, "份数": grades.values,
+                      "占比(%)": (grades.values / grades.sum() * 100).round(1)}),
+        use_container_width=True, hide_index=True,
+    )
+
+    w = weekly_scores[weekly_scores["scale"] == scale].sort_values("yw")
+    w = w.assign(week=w["yw"].map(week_start))
+    fig = px.line(w, x="week", y="mean_score", markers=True, title=f"{scale} 每周平均分", hover_data=["n"])
+    fig.update_layout(xaxis_title="周（周一）", yaxis_title="平均分")
+    st.plotly_chart(fig, use_container_width=True)
+run.mark("scales")
+
+run.finish()
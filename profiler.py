@@ -0,0 +1,128 @@
+# profiler.py
+# 页面运行耗时：Streamlit 每次交互都会整页重跑脚本，这里记录每次重跑的总耗时，
+# 按页面、触发方式（首次加载 / 控件交互 / 提交）及页面内分段（表头、表单、保存、图表、AI）汇总，
+# 在 pages/系统监控.py 展示。
+#
+#     run = start_run("睡眠日记")
+#     ...                      # 表头
+#     run.mark("header")       # 自上一个标记（或开始）以来的耗时计入 header
+#     ...                      # 表单
+#     run.mark("form")
+#     run.trigger = "submit"
+#     run.finish()
+#
+# 用标记而不是 with 块，页面代码无需整体缩进。记录在 start_run 时即进入环形缓冲区，
+# 每次标记都会更新总耗时；被 st.stop() / st.rerun() 中途打断的运行也会保留
+# （finished=False，耗时截至最后一个标记）。
+import os
+import threading
+import time
+from collections import deque
+
+import pandas as pd
+import streamlit as st
+
+
+class PageRun:
+
+    def __init__(self, log, page, trigger):
+        self._log = log
+        self._start = self._last = time.perf_counter()
+        self.page = page
+        self.trigger = trigger
+        self.started_at = time.time()
+        self.total_ms = 0.0
+        self.sections = {}
+        self.finished = False
+
+    def mark(self, name):
+        """上一个标记（或运行开始）到现在的耗时计入分段 name；同名分段累加"""
+        now = time.perf_counter()
+        with self._log.lock:
+            self.sections[name] = self.sections.get(name, 0.0) + (now - self._last) * 1000
+            self.total_ms = (now - self._start) * 1000
+        self._last = now
+
+    def finish(self):
+        with self._log.lock:
+            self.total_ms = (time.perf_counter() - self._start) * 1000
+            self.finished = True
+
+
+class RunLog:
+    """最近 maxlen 次页面运行（所有会话共享，线程安全）"""
+
+    def __init__(self, maxlen=2000):
+        self._runs = deque(maxlen=maxlen)
+        self.lock = threading.Lock()
+
+    def start(self, page, trigger):
+        run = PageRun(self, page, trigger)
+        with self.lock:
+            self._runs.append(run)
+        return run
+
+    def frame(self):
+        """每次运行一行；各分段耗时展开为 section:<名称> 列"""
+        with self.lock:
+            rows = [
+                dict(time=r.started_at, page=r.page, trigger=r.trigger, total_ms=r.total_ms,
+                     finished=r.finished, **{f"section:{k}": v for k, v in r.sections.items()})
+                for r in self._runs
+            ]
+        return pd.DataFrame(rows)
+
+    def summary(self):
+        """按 (页面, 触发方式) 汇总运行次数与 p50/p95/p99/最大耗时"""
+        df = self.frame()
+        if df.empty:
+            return df
+        grouped = df.groupby(["page", "trigger"])["total_ms"]
+        return pd.DataFrame({
+            "runs": grouped.size(),
+            "p50_ms": grouped.quantile(0.50),
+            "p95_ms": grouped.quantile(0.95),
+            "p99_ms": grouped.quantile(0.99),
+            "max_ms": grouped.max(),
+        }).reset_index()
+
+    def section_summary(self, page):
+        """某页面各分段的运行次数与 p50/p95 耗时（只统计经过该分段的运行）"""
+        df = self.frame()
+        if df.empty:
+            return df
+        df = df[df["page"] == page]
+        cols = [c for c in df.columns if c.startswith("section:")]
+        long = df.melt(id_vars=["trigger"], value_vars=cols, var_name="section", value_name="ms").dropna()
+        if long.empty:
+            return long
+        long["section"] = long["section"].str.removeprefix("section:")
+        grouped = long.groupby(["trigger", "section"])["ms"]
+        return pd.DataFrame({
+            "runs": grouped.size(),
+            "p50_ms": grouped.quantile(0.50),
+            "p95_ms": grouped.quantile(0.95),
+            "max_ms": grouped.max(),
+        }).reset_index()
+
+    def pages(self):
+        with self.lock:
+            return sorted({r.page for r in self._runs})
+
+    def clear(self):
+        with self.lock:
+            self._runs.clear()
+
+
+RUN_LOG = RunLog(maxlen=int(os.getenv("RUN_LOG_SIZE", 2000)))
+
+
+def start_run(page):
+    """
+    页面脚本开头调用。本会话首次打开该页面记为 load，之后的重跑记为 interaction；
+    页面可在确认是提交表单时改为 run.trigger = "submit"。
+    """
+    seen = st.session_state.setdefault("_profiler_seen_pages", set())
+    trigger = "interaction" if page in seen else "load"
+    seen.add(page)
+    return RUN_LOG.start(page, trigger)
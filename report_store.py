@@ -0,0 +1,85 @@
+# report_store.py
+# 报告 PDF 的内容寻址文件存储：文件按 SHA-256 存放，MySQL 的 sleep_report_pdf 只保存元数据与哈希。
+# 存量数据由 tools/migrate_report_blobs.py 从 pdf_blob 迁出。
+import hashlib
+import os
+import tempfile
+
+import streamlit as st
+
+REPORT_STORE_DIR = os.getenv("REPORT_STORE_DIR", "report_store")
+CHUNK_SIZE = 1024 * 1024
+
+
+def read_blob_chunks(cur, report_id, chunk_size=CHUNK_SIZE):
+    """按 SUBSTRING 分段读取 sleep_report_pdf.pdf_blob，逐段产出 bytes；报告不存在或无 BLOB 时抛出 FileNotFoundError"""
+    cur.execute("SELECT LENGTH(pdf_blob) FROM sleep_report_pdf WHERE id = %s", (report_id,))
+    row = cur.fetchone()
+    if row is None or row[0] is None:
+        raise FileNotFoundError(f"报告不存在：{report_id}")
+    # SUBSTRING 的位置从 1 开始
+    for offset in range(1, row[0] + 1, chunk_size):
+        cur.execute(
+            "SELECT SUBSTRING(pdf_blob, %s, %s) FROM sleep_report_pdf WHERE id = %s",
+            (offset, chunk_size, report_id)
+        )
+        yield cur.fetchone()[0]
+
+
+class ReportStore:
+    """
+    目录结构 <root>/ab/cd/<sha256>。写入先落临时文件再改名，
+    相同内容只存一份，重复写入是幂等的。
+    """
+
+    def __init__(self, root=REPORT_STORE_DIR):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def path_for(self, digest):
+        return os.path.join(self.root, digest[:2], digest[2:4], digest)
+
+    def exists(self, digest):
+        return os.path.exists(self.path_for(digest))
+
+    def put_chunks(self, chunks):
+        """写入一段段 bytes，返回 (sha256, 字节数)"""
+        hasher = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(suffix=".part", dir=self.root)
+        try:
+            with os.fdopen(fd, "wb") as out:
+                for chunk in chunks:
+                    hasher.update(chunk)
+                    out.write(chunk)
+                    size += len(chunk)
+                out.flush()
+                os.fsync(out.fileno())
+            digest = hasher.hexdigest()
+            path = self.path_for(digest)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return digest, size
+
+    def put_bytes(self, data):
+        return self.put_chunks([data])
+
+    def verify(self, digest):
+        """重新计算文件哈希，确认内容完整"""
+        hasher = hashlib.sha256()
+        try:
+            with open(self.path_for(digest), "rb") as f:
+                for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                    hasher.update(chunk)
+        except FileNotFoundError:
+            return False
+        return hasher.hexdigest() == digest
+
+
+@st.cache_resource(show_spinner=False)
+def get_report_store():
+    return ReportStore(REPORT_STORE_DIR)
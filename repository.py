@@ -0,0 +1,207 @@
+# repository.py
+# 所有写库语句集中在这里，页面与后台 flusher（spool.py）共用同一套 SQL
+from datetime import datetime, timedelta
+
+from diarystats import update_diary_stats
+from sleeptime import minutes_since_noon
+
+
+# ---------- 量表 INSERT ----------
+SCALE_INSERT_SQL = {
+    "psqi_record": """
+        INSERT INTO psqi_record
+        (spool_id, name, gender, ts, age, height, weight, contact,
+         bed_time, getup_time, sleep_latency_choice, sleep_duration_choice,
+         q5a, q5b, q5c, q5d, q5e, q5f, q5g, q5h, q5i, q5j,
+         q6, q7, q8, q9,
+         A, B, C, D, E, F, G, total_score, sleep_efficiency)
+        VALUES
+        (%(spool_id)s, %(name)s, %(gender)s, %(ts)s, %(age)s, %(height)s, %(weight)s, %(contact)s,
+         %(bed_time)s, %(getup_time)s, %(sleep_latency_choice)s, %(sleep_duration_choice)s,
+         %(q5a)s, %(q5b)s, %(q5c)s, %(q5d)s, %(q5e)s, %(q5f)s, %(q5g)s, %(q5h)s, %(q5i)s, %(q5j)s,
+         %(q6)s, %(q7)s, %(q8)s, %(q9)s,
+         %(A)s, %(B)s, %(C)s, %(D)s, %(E)s, %(F)s, %(G)s, %(total)s, %(sleep_efficiency)s)
+        ON DUPLICATE KEY UPDATE spool_id = spool_id
+    """,
+    "isi_record": """
+        INSERT INTO isi_record
+        (spool_id, name, ts,
+         q1a_opt, q1a_score,
+         q1b_opt, q1b_score,
+         q1c_opt, q1c_score,
+         q2_opt,  q2_score,
+         q3_opt,  q3_score,
+         q4_opt,  q4_score,
+         q5_opt,  q5_score,
+         total_score)
+        VALUES
+        (%(spool_id)s, %(name)s, %(ts)s,
+         %(1a_opt)s, %(1a_score)s,
+         %(1b_opt)s, %(1b_score)s,
+         %(1c_opt)s, %(1c_score)s,
+         %(2_opt)s,  %(2_score)s,
+         %(3_opt)s,  %(3_score)s,
+         %(4_opt)s,  %(4_score)s,
+         %(5_opt)s,  %(5_score)s,
+         %(total)s)
+        ON DUPLICATE KEY UPDATE spool_id = spool_id
+    """,
+    "has_record": """
+        INSERT INTO has_record
+        (spool_id, name, ts,
+         q1, q2, q3, q4, q5, q6, q7, q8, q9, q10,
+         q11, q12, q13, q14, q15, q16, q17, q18, q19, q20,
+         q21, q22, q23, q24, q25, q26,
+         total_score)
+        VALUES
+        (%(spool_id)s, %(name)s, %(ts)s,
+         %(q1)s, %(q2)s, %(q3)s, %(q4)s, %(q5)s, %(q6)s, %(q7)s, %(q8)s, %(q9)s, %(q10)s,
+         %(q11)s, %(q12)s, %(q13)s, %(q14)s, %(q15)s, %(q16)s, %(q17)s, %(q18)s, %(q19)s, %(q20)s,
+         %(q21)s, %(q22)s, %(q23)s, %(q24)s, %(q25)s, %(q26)s,
+         %(total)s)
+        ON DUPLICATE KEY UPDATE spool_id = spool_id
+    """,
+    "fss_record": """
+        INSERT INTO fss_record
+        (spool_id, name, ts,
+         q1, q2, q3, q4, q5, q6, q7, q8, q9,
+         total_score)
+        VALUES
+        (%(spool_id)s, %(name)s, %(ts)s,
+         %(q1)s, %(q2)s, %(q3)s, %(q4)s, %(q5)s,
+         %(q6)s, %(q7)s, %(q8)s, %(q9)s, %(total)s)
+        ON DUPLICATE KEY UPDATE spool_id = spool_id
+    """,
+    "sas_record": """
+        INSERT INTO sas_record
+        (spool_id, name, ts, q1, q2, q3, q4, q5, q6, q7, q8, q9, q10,
+         q11, q12, q13, q14, q15, q16, q17, q18, q19, q20,
+         raw_score, std_score)
+        VALUES
+        (%(spool_id)s, %(name)s, %(ts)s,
+         %(q1)s, %(q2)s, %(q3)s, %(q4)s, %(q5)s,
+         %(q6)s, %(q7)s, %(q8)s, %(q9)s, %(q10)s,
+         %(q11)s, %(q12)s, %(q13)s, %(q14)s, %(q15)s,
+         %(q16)s, %(q17)s, %(q18)s, %(q19)s, %(q20)s,
+         %(raw)s, %(std)s)
+        ON DUPLICATE KEY UPDATE spool_id = spool_id
+    """,
+    "sds_record": """
+        INSERT INTO sds_record
+        (spool_id, name, ts,
+         q1, q2, q3, q4, q5, q6, q7, q8, q9, q10,
+         q11, q12, q13, q14, q15, q16, q17, q18, q19, q20,
+         raw_score, std_score)
+        VALUES
+        (%(spool_id)s, %(name)s, %(ts)s,
+         %(q1)s, %(q2)s, %(q3)s, %(q4)s, %(q5)s,
+         %(q6)s, %(q7)s, %(q8)s, %(q9)s, %(q10)s,
+         %(q11)s, %(q12)s, %(q13)s, %(q14)s, %(q15)s,
+         %(q16)s, %(q17)s, %(q18)s, %(q19)s, %(q20)s,
+         %(raw)s, %(std)s)
+        ON DUPLICATE KEY UPDATE spool_id = spool_id
+    """,
+}
+
+
+def insert_scale(cursor, table, record):
+    # spool_id 为 spool 日志条目的 UUID（唯一键）：提交后、删除日志前进程退出导致重放时，
+    # 同一份问卷只保留一行（升级前入队的条目没有 spool_id，按 NULL 插入）
+    cursor.execute(SCALE_INSERT_SQL[table], {**record, "spool_id": record.get("spool_id")})
+
+
+# ---------- 睡眠日记 ----------
+# sleep_diary 中由表单写入的列；(name, record_date) 上有唯一键 uq_name_record_date，
+# 由 tools/dedupe_sleep_diary.py 去重后创建
+DIARY_KEY_COLUMNS = ["name", "record_date"]
+DIARY_COLUMNS = DIARY_KEY_COLUMNS + [
+    "entry_date", "nap_start", "nap_end", "daytime_bed_minutes", "nap_duration",
+    "caffeine", "alcohol", "med_name", "med_dose", "med_time",
+    "daytime_mood", "sleep_interference", "bed_time", "try_sleep_time",
+    "sleep_latency", "night_awake_count", "night_awake_total",
+    "final_wake_time", "get_up_time", "total_sleep_hours",
+    "sleep_efficiency", "sleep_quality", "morning_feeling",
+]
+# "HH:MM" 时间列各有一个同名 _min 列（SMALLINT，自中午 12 点起的分钟数），保存时由字符串算出，
+# 图表与统计直接读整数；历史数据由 tools/backfill_clock_minutes.py 回填
+CLOCK_COLUMNS = ["nap_start", "nap_end", "med_time", "bed_time", "try_sleep_time",
+                 "final_wake_time", "get_up_time"]
+CLOCK_MINUTE_COLUMNS = [f"{c}_min" for c in CLOCK_COLUMNS]
+DIARY_COLUMNS += CLOCK_MINUTE_COLUMNS
+# 来源端保存该晚日记的时刻：保存时写入，同步时原样携带，本地与 SQLpub 的冲突据此判断新旧
+DIARY_COLUMNS += ["edited_at"]
+
+
+def clock_minutes(record):
+    """记录中各时间列 → {"<列>_min": 分钟数}，"无"、空值为 None"""
+    return {f"{c}_min": minutes_since_noon(record.get(c)) for c in CLOCK_COLUMNS}
+
+
+def _upsert_sql(table, columns, key_columns):
+    updates = [c for c in columns if c not in key_columns]
+    return (
+        f"INSERT INTO {table} ({', '.join(columns)})\n"
+        f"VALUES ({', '.join(f'%({c})s' for c in columns)})\n"
+        f"ON DUPLICATE KEY UPDATE {', '.join(f'{c} = VALUES({c})' for c in updates)}"
+    )
+
+
+UPSERT_DIARY_SQL = _upsert_sql("sleep_diary", DIARY_COLUMNS, DIARY_KEY_COLUMNS)
+
+# sleep_diary_latest 与 sleep_diary 同步的列
+LATEST_COLUMNS = ["id"] + DIARY_COLUMNS + ["created_at", "updated_at"]
+_latest_cols = ", ".join(LATEST_COLUMNS)
+_latest_updates = ", ".join(f"{c} = VALUES({c})" for c in LATEST_COLUMNS if c not in DIARY_KEY_COLUMNS)
+
+# 用 sleep_diary 中该晚最新的一行刷新投影
+REFRESH_LATEST_SQL = f"""
+    INSERT INTO sleep_diary_latest ({_latest_cols})
+    SELECT {_latest_cols} FROM sleep_diary
+    WHERE name = %(name)s AND record_date = %(record_date)s
+    ORDER BY created_at DESC, id DESC
+    LIMIT 1
+    ON DUPLICATE KEY UPDATE {_latest_updates}
+"""
+
+
+def save_sleep_diary(cursor, record):
+    """
+    一条语句完成"有则更新、无则插入"，并发重复提交也只会留下一行；
+    须在事务中调用，以便 sleep_diary_latest 与 sleep_diary 同时提交。
+    返回 "更新" 或 "保存"。
+    """
+    record = {**record, **clock_minutes(record), "edited_at": record.get("edited_at") or datetime.now()}
+    # 据投影表判断该晚是否已有记录（影响行数在 MySQL 与 SQLite 的 upsert 下含义不同）
+    cursor.execute("SELECT 1 FROM sleep_diary_latest WHERE name = %(name)s AND record_date = %(record_date)s",
+                   {"name": record["name"], "record_date": record["record_date"]})
+    exists = cursor.fetchone() is not None
+    cursor.execute(UPSERT_DIARY_SQL, record)
+    # 同一事务内刷新"每晚最新一条"投影表，再据此更新该患者的滚动统计
+    cursor.execute(REFRESH_LATEST_SQL, {"name": record["name"], "record_date": record["record_date"]})
+    update_diary_stats(cursor, record["name"], record["record_date"])
+    return "更新" if exists else "保存"
+
+
+# ---------- spool 写入分发 ----------
+# kind -> writer(cursor, record)，spool 中每条待写记录按 kind 找到对应写入函数
+WRITERS = {
+    "sleep_diary": save_sleep_diary,
+    **{table: (lambda cursor, record, table=table: insert_scale(cursor, table, record))
+       for table in SCALE_INSERT_SQL},
+}
+
+
+# ---------- 增量水位 ----------
+# 按 (updated_at, id) 水位增量读取时只读到数据库当前时间之前 WATERMARK_LAG：
+# updated_at 只精确到秒，且取语句执行时刻而非提交时刻，同一秒内 id 较小或稍晚提交的行
+# 若已被水位越过就永远读不到；留出余量，读到的那一段必然都已提交
+WATERMARK_LAG = timedelta(seconds=10)
+
+
+def watermark_cutoff(cursor):
+    """数据库时钟的当前时间减去 WATERMARK_LAG（"YYYY-MM-DD HH:MM:SS"），增量读取只读 updated_at 不晚于它的行"""
+    cursor.execute("SELECT NOW()")
+    now = cursor.fetchone()[0]
+    if isinstance(now, str):
+        now = datetime.fromisoformat(now)
+    return (now - WATERMARK_LAG).strftime("%Y-%m-%d %H:%M:%S")
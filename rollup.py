@@ -0,0 +1,110 @@
+# rollup.py
+# 睡眠日记按患者、按 ISO 周的汇总表 sleep_diary_weekly：
+# 每项指标存 n / sum / sumsq，均值与方差由读取方换算，几个月的趋势只需读几十行。
+# 由 tools/rollup_weekly.py 按 sleep_diary 的 (updated_at, id) 水位增量维护（索引 idx_updated_id，迁移 0008）：
+# 水位之后有改动的行所在的周，从 sleep_diary_latest 整周重算（一周最多 7 行）。
+# 水位只推进到数据库当前时间之前 WATERMARK_LAG，同一秒内或稍晚提交的改动不会被越过。
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+from repository import watermark_cutoff
+
+# 汇总的指标列（sleep_diary_latest 中的列；时间用 *_min 整数列，自中午 12 点起的分钟数）
+ROLLUP_METRICS = ["sleep_latency", "night_awake_count", "night_awake_total", "total_sleep_hours",
+                  "sleep_efficiency", "bed_time_min", "final_wake_time_min"]
+ROLLUP_JOB = "sleep_diary_weekly"
+
+_stat_cols = [f"{m}_{s}" for m in ROLLUP_METRICS for s in ("n", "sum", "sumsq")]
+_stat_exprs = [expr for m in ROLLUP_METRICS for expr in (f"COUNT({m})", f"SUM({m})", f"SUM({m} * {m})")]
+
+# 重算一位患者一周：先删后插，该周已无数据时只删除
+DELETE_WEEK_SQL = "DELETE FROM sleep_diary_weekly WHERE name = %(name)s AND yw = %(yw)s"
+INSERT_WEEK_SQL = f"""
+    INSERT INTO sleep_diary_weekly (name, yw, week_start, nights, {", ".join(_stat_cols)})
+    SELECT name, %(yw)s, %(week_start)s, COUNT(*), {", ".join(_stat_exprs)}
+    FROM sleep_diary_latest
+    WHERE name = %(name)s AND record_date BETWEEN %(week_start)s AND %(week_end)s
+    GROUP BY name
+"""
+
+CHANGED_ROWS_SQL = """
+    SELECT id, name, record_date, updated_at FROM sleep_diary
+    WHERE (updated_at, id) > (%s, %s) AND updated_at <= %s
+    ORDER BY updated_at, id LIMIT %s
+"""
+
+
+def iso_week(d):
+    """日期 → (YEARWEEK(d, 3) 的值, 该周周一)"""
+    if isinstance(d, str):
+        d = date.fromisoformat(d[:10])
+    year, week, weekday = d.isocalendar()
+    return year * 100 + week, d - timedelta(days=weekday - 1)
+
+
+def refresh_weeks(cur, weeks):
+    """weeks 为 {(name, yw): week_start}，逐周重算；须在事务中调用"""
+    for (name, yw), week_start in weeks.items():
+        params = {"name": name, "yw": yw, "week_start": week_start, "week_end": week_start + timedelta(days=6)}
+        cur.execute(DELETE_WEEK_SQL, params)
+        cur.execute(INSERT_WEEK_SQL, params)
+
+
+def get_mark(cur, default="1970-01-01 00:00:00|0"):
+    cur.execute("SELECT mark FROM rollup_state WHERE job = %s", (ROLLUP_JOB,))
+    row = cur.fetchone()
+    return (row[0] if row else default).split("|")
+
+
+def set_mark(cur, mark_at, mark_id):
+    cur.execute(
+        "INSERT INTO rollup_state (job, mark) VALUES (%(job)s, %(mark)s) "
+        "ON DUPLICATE KEY UPDATE mark = VALUES(mark)",
+        {"job": ROLLUP_JOB, "mark": f"{mark_at}|{mark_id}"}
+    )
+
+
+def run_batch(conn, batch_size=500):
+    """
+    处理水位之后的一批改动：重算涉及的周并推进水位（同一事务）。
+    返回本批处理的日记行数，0 表示已追上。
+    """
+    with conn.cursor() as cur:
+        mark_at, mark_id = get_mark(cur)
+        cur.execute(CHANGED_ROWS_SQL, (mark_at, int(mark_id), watermark_cutoff(cur), batch_size))
+        rows = cur.fetchall()
+        if not rows:
+            return 0
+        weeks = {}
+        for _, name, record_date, _ in rows:
+            yw, week_start = iso_week(record_date)
+            weeks[(name, yw)] = week_start
+        conn.begin()
+        try:
+            refresh_weeks(cur, weeks)
+            last = rows[-1]
+            set_mark(cur, last[3], last[0])
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    return len(rows)
+
+
+def weekly_stats(df):
+    """
+    sleep_diary_weekly 的行 → 每项指标的均值 "<指标>_mean" 与标准差 "<指标>_sd"（样本标准差，n < 2 时为空）。
+    多行（如多位患者同一周）可先按组对 n / sum / sumsq 求和再换算。
+    """
+    out = df.drop(columns=[c for c in _stat_cols if c in df])
+    for m in ROLLUP_METRICS:
+        n = pd.to_numeric(df[f"{m}_n"]).astype(float)
+        s = pd.to_numeric(df[f"{m}_sum"]).astype(float)
+        ss = pd.to_numeric(df[f"{m}_sumsq"]).astype(float)
+        mean = s / n.where(n > 0)
+        var = (ss - s * s / n.where(n > 0)) / (n - 1).where(n > 1)
+        out[f"{m}_mean"] = mean
+        out[f"{m}_sd"] = np.sqrt(var.clip(lower=0))
+    return out
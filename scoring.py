@@ -0,0 +1,165 @@
+# scoring.py
+# 六个量表的计分规则表与向量化计分引擎：页面提交时对单份问卷计分，
+# 汇总查询、重新计分等任务对成千上万行一次算完；总分 → 等级同样按整列计算
+import numpy as np
+import pandas as pd
+
+from sleeptime import times_to_min
+
+# 量表 -> (表名, 总分列)
+SCORE_COLUMNS = {
+    "ISI": ("isi_record", "total_score"),
+    "FSS": ("fss_record", "total_score"),
+    "PSQI": ("psqi_record", "total_score"),
+    "SAS": ("sas_record", "std_score"),
+    "SDS": ("sds_record", "std_score"),
+    "HAS": ("has_record", "total_score"),
+}
+
+# 量表 -> (比较方式, 分界点, 等级)
+# "<"  ：分数 < 第 i 个分界点时取第 i 个等级；"<="：分数 <= 分界点时取该等级
+GRADE_RULES = {
+    "ISI": ("<", [8, 15, 22], ["无失眠", "轻度", "中度", "重度"]),
+    "FSS": ("<", [36], ["正常", "疲劳"]),
+    "PSQI": ("<=", [5, 10, 15], ["很好", "尚可", "一般", "很差"]),
+    "SAS": ("<", [50, 60, 70], ["无焦虑", "轻度", "中度", "重度"]),
+    "SDS": ("<", [53, 63, 73], ["无抑郁", "轻度", "中度", "重度"]),
+    "HAS": ("<=", [32], ["正常", "过度觉醒"]),
+}
+
+NO_DATA = "无数据"
+
+
+def grade_scores(scales, scores):
+    """
+    scales 为量表名序列，scores 为对应分数序列（可含空值），返回等级数组；
+    分数为空或量表未知时为"无数据"。
+    """
+    scales = np.asarray(scales, dtype=object)
+    scores = pd.to_numeric(pd.Series(scores), errors="coerce").to_numpy(dtype=float)
+    grades = np.full(len(scores), NO_DATA, dtype=object)
+    valid = ~np.isnan(scores)
+    for scale, (op, cuts, labels) in GRADE_RULES.items():
+        mask = valid & (scales == scale)
+        if not mask.any():
+            continue
+        # "<" 时等于分界点归入下一级（side="right"），"<=" 时归入本级（side="left"）
+        idx = np.searchsorted(cuts, scores[mask], side="right" if op == "<" else "left")
+        grades[mask] = np.asarray(labels, dtype=object)[idx]
+    return grades
+
+
+# ---------- 计分规则 ----------
+def _items(*names):
+    return [f"q{n}" for n in names]
+
+
+# 量表 -> 计分规则
+#   items   各题列名，与 *_record 表一致；值为选项分值
+#   reverse 反向计分题（1 开始），选项分值 v 计为 lo + hi - v，(lo, hi) 为 range
+#   std     原始分 → 标准分的系数，标准分 = int(原始分 × std + 0.5)；None 表示无标准分
+# PSQI 按七个成分计分（_score_psqi），不走逐题求和
+SCALE_RULES = {
+    "ISI": {"items": [f"q{n}_score" for n in ("1a", "1b", "1c", 2, 3, 4, 5)], "range": (0, 4)},
+    "FSS": {"items": _items(*range(1, 10)), "range": (1, 7)},
+    "HAS": {"items": _items(*range(1, 27)), "range": (0, 3)},
+    "SAS": {"items": _items(*range(1, 21)), "range": (1, 4), "reverse": [4, 9, 13, 17, 19], "std": 1.25},
+    "SDS": {"items": _items(*range(1, 21)), "range": (1, 4),
+            "reverse": [2, 5, 6, 11, 12, 14, 16, 17, 18, 20], "std": 1.25},
+    "PSQI": {"items": _items(*(f"5{k}" for k in "abcdefghij"), 6, 7, 8, 9)
+                      + ["sleep_latency_choice", "sleep_duration_choice", "bed_time", "getup_time"]},
+}
+
+# PSQI 成分 B / E / G 的分段：x == 0 → 0，x <= 第 1 个界值 → 1 …… 超过最后一个 → 3
+PSQI_BINS = {"B": [0, 2, 4], "E": [0, 9, 18], "G": [0, 2, 4]}
+# 实际睡眠时长选项 → 小时
+PSQI_DURATION_HOURS = {1: 7.5, 2: 6.5, 3: 5.5, 4: 4.5}
+PSQI_RESULTS = ["A", "B", "C", "D", "E", "F", "G", "total", "sleep_efficiency"]
+
+
+# ---------- 向量化计分 ----------
+def _col(df, name):
+    return pd.to_numeric(df[name], errors="coerce").to_numpy(dtype=float)
+
+
+def _bin(x, cuts):
+    return np.where(np.isnan(x), np.nan, np.searchsorted(cuts, x, side="left"))
+
+
+def psqi_sleep_efficiency(bed, getup, duration_choice):
+    """
+    上床、起床时间（"HH:MM"）与实际睡眠时长选项 → 睡眠效率（%）。
+    起床早于上床视为次日；时间无法解析、两者相同或选项未知时为 0。
+    """
+    b = times_to_min(bed, wrap=False).to_numpy()
+    g = times_to_min(getup, wrap=False).to_numpy()
+    in_bed = np.mod(g - b, 1440) / 60
+    hours = pd.Series(duration_choice).map(PSQI_DURATION_HOURS).fillna(0).to_numpy(dtype=float)
+    ok = (b < 1440) & (g < 1440) & (in_bed > 0)          # NaN 比较为 False
+    return np.where(ok, hours / np.where(ok, in_bed, 1) * 100, 0.0)
+
+
+def _score_psqi(df):
+    q = {c: _col(df, c) - 1 for c in SCALE_RULES["PSQI"]["items"][:-2]}
+    eff = psqi_sleep_efficiency(df["bed_time"], df["getup_time"], _col(df, "sleep_duration_choice"))
+    e_sum = sum(q[c] for c in _items(*(f"5{k}" for k in "abcdefghij")))
+    out = {
+        "A": q["q6"],
+        "B": _bin(q["sleep_latency_choice"] + q["q5a"], PSQI_BINS["B"]),
+        "C": q["sleep_duration_choice"],
+        # 沿用原有分界：效率介于 84~85、74~75 之间时计 3 分
+        "D": np.select([eff > 85, (eff >= 75) & (eff <= 84), (eff >= 65) & (eff <= 74)], [0, 1, 2], 3),
+        "E": _bin(e_sum, PSQI_BINS["E"]),
+        "F": q["q7"],
+        "G": _bin(q["q8"] + q["q9"], PSQI_BINS["G"]),
+    }
+    out["total"] = sum(out[k] for k in "ABCDEFG")
+    out["sleep_efficiency"] = eff
+    return out
+
+
+def score_frame(scale, responses, raw=True):
+    """
+    一批问卷（DataFrame，列为 SCALE_RULES[scale]["items"]）一次计分，返回同索引的 DataFrame：
+      - 有反向题的量表：各题得分 q1..qN（反向题已换算）
+      - "raw" 与 "std"（有标准分的量表）或 "total"；PSQI 为成分 A~G、"total"、"sleep_efficiency"
+      - "grade"：按 GRADE_RULES 分级
+    raw=False 表示各题已是得分（如 *_record 表中存的 SAS / SDS 题目），不再做反向换算。
+    题目缺失或非数值的行，结果为空。
+    """
+    rule = SCALE_RULES[scale]
+    out = {}
+    if scale == "PSQI":
+        out = _score_psqi(responses)
+        score = out["total"]
+    else:
+        items = np.column_stack([_col(responses, c) for c in rule["items"]])
+        reverse = rule.get("reverse")
+        if reverse:
+            if raw:
+                lo, hi = rule["range"]
+                idx = np.asarray(reverse) - 1
+                items[:, idx] = lo + hi - items[:, idx]
+            out.update({c: items[:, i] for i, c in enumerate(rule["items"])})
+        total = items.sum(axis=1)
+        if rule.get("std"):
+            out["raw"] = total
+            out["std"] = np.floor(total * rule["std"] + 0.5)
+            score = out["std"]
+        else:
+            out["total"] = total
+            score = total
+
+    result = pd.DataFrame(out, index=responses.index)
+    for c in result.columns:
+        if c != "sleep_efficiency":
+            result[c] = result[c].round().astype("Int64")
+    result["grade"] = grade_scores(np.full(len(result), scale, dtype=object), score)
+    return result
+
+
+def score_one(scale, responses):
+    """单份问卷（dict）计分，返回 dict，值为 Python 的 int / float / str，可直接写库"""
+    row = score_frame(scale, pd.DataFrame([responses])).iloc[0]
+    return {k: (v if isinstance(v, str) else float(v) if k == "sleep_efficiency" else int(v))
+            for k, v in row.items()}
@@ -0,0 +1,95 @@
+# sleeptime.py
+# 睡眠日记中 "HH:MM" 时间字符串与分钟数的换算（日记填写、日记查询页面共用）
+import numpy as np
+import pandas as pd
+
+
+def _parse_hhmm(t):
+    """ "HH:MM" → (时, 分)；空值、"无"或格式错误返回 None"""
+    try:
+        if pd.isna(t) or t == "无":
+            return None
+        h, m = map(int, t.split(":"))
+        return h, m
+    except (ValueError, AttributeError):
+        return None
+
+
+# 时间 → 分钟（跨天）：中午 12 点之前的时间视为次日，加 24 小时，便于比较上床/起床先后
+def time_to_min(t):
+    hm = _parse_hhmm(t)
+    if hm is None:
+        return None
+    h, m = hm
+    return (h if h >= 12 else h + 24) * 60 + m
+
+
+# 时间 → 自中午 12 点起的分钟数（0~1439），存入 sleep_diary 的 *_min 列；
+# 与 time_to_min 相差固定的 720，跨午夜的夜间时间同样可以直接比较、求平均
+def minutes_since_noon(t):
+    m = time_to_min(t)
+    return None if m is None else (m - 720) % 1440
+
+
+# 分钟 → 时间字符串
+def min_to_time(m):
+    h, mi = divmod(int(m), 60)
+    h = h - 24 if h >= 24 else h
+    return f"{h:02d}:{mi:02d}"
+
+
+def times_to_min(values, wrap=True):
+    """
+    整列 "HH:MM" → 分钟数（float Series，保留原索引），空值、"无"及无法解析的值为 NaN。
+    wrap=True 时与 time_to_min 相同，中午 12 点之前加 24 小时（夜间时间）；日间小睡用 wrap=False。
+
+    定长的 "HH:MM" / "H:MM" 在 NumPy 中按字符码一次算出，不逐个调用 Python 函数；
+    其余非空值（如带空格）逐个回退到 time_to_min 的解析规则。
+    """
+    s = values if isinstance(values, pd.Series) else pd.Series(values)
+    obj = s.to_numpy(dtype=object)
+    out = np.full(len(obj), np.nan)
+    if not len(obj):
+        return pd.Series(out, index=s.index, name=s.name)
+
+    # 每个值取前 6 个字符的 Unicode 码点，短字符串以 0 补齐
+    codes = obj.astype("U6").view(np.uint32).reshape(len(obj), 6).astype(np.int64)
+    digits = codes - ord("0")
+    is_digit = (digits >= 0) & (digits <= 9)
+    colon = ord(":")
+    # "HH:MM"
+    five = (codes[:, 2] == colon) & is_digit[:, [0, 1, 3, 4]].all(axis=1) & (codes[:, 5] == 0)
+    # "H:MM"
+    four = (codes[:, 1] == colon) & is_digit[:, [0, 2, 3]].all(axis=1) & (codes[:, 4] == 0)
+    hours = np.where(five, digits[:, 0] * 10 + digits[:, 1], digits[:, 0])
+    minutes = np.where(five, digits[:, 3] * 10 + digits[:, 4], digits[:, 2] * 10 + digits[:, 3])
+    fast = five | four
+    if wrap:
+        hours = np.where(hours >= 12, hours, hours + 24)
+    out[fast] = (hours * 60 + minutes)[fast]
+
+    # 其余：跳过空值与"无"，逐个按标量规则解析（正常数据中很少）
+    rest = np.flatnonzero(~fast & ~pd.isna(obj))
+    for i in rest:
+        hm = _parse_hhmm(obj[i])
+        if hm is not None:
+            h, m = hm
+            out[i] = ((h if h >= 12 or not wrap else h + 24) * 60) + m
+    return pd.Series(out, index=s.index, name=s.name)
+
+
+def column_minutes(df, col, wrap=True):
+    """
+    日记 DataFrame 中 col 列的分钟数（同 times_to_min）。
+    有 "{col}_min" 列时直接换算其整数值，只有尚未回填（_min 为空而字符串非空）的行才解析字符串。
+    """
+    mcol = f"{col}_min"
+    if mcol not in df:
+        return times_to_min(df[col], wrap)
+    out = pd.to_numeric(df[mcol], errors="coerce").astype(float) + 720
+    missing = out.isna() & df[col].notna()
+    if missing.any():
+        out[missing] = times_to_min(df.loc[missing, col])
+    if not wrap:
+        out = out % 1440
+    return out.rename(col)
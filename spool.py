@@ -0,0 +1,264 @@
+# spool.py
+# 本地持久化写缓冲（write-behind）：
+# 提交时先写入本地 SQLite（WAL 模式）并立即返回，后台 flusher 线程再按批次写入 MySQL。
+# MySQL 变慢或宕机时提交不受影响，数据留在本地，恢复后自动补写，不会丢失。
+# 写入为"至少一次"：每条记录带 spool_id（UUID），量表按它去重，日记按 (name, record_date) upsert，重放无副作用。
+# 非连接类错误累计 max_attempts 次的记录转为 failed，不再重试，在「系统监控」页面查看与重新排队。
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+
+import streamlit as st
+
+import db
+from cache import get_patient_cache
+from repository import WRITERS
+
+SPOOL_PATH = os.getenv("SPOOL_PATH", "spool.sqlite3")
+
+
+class Spool:
+    """
+    待写记录的本地日志。每条记录包含 kind（目标表/写入函数）与 JSON 格式的 payload，
+    写入 MySQL 成功后才从日志中删除。
+    """
+
+    def __init__(self, path=SPOOL_PATH, batch_size=50, base_backoff=1.0, max_backoff=300.0, max_attempts=20):
+        self.path = path
+        self.batch_size = batch_size
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._flushed = threading.Condition()
+        self._stop = threading.Event()
+        self._thread = None
+        self._stats = {"enqueued": 0, "flushed": 0, "batches": 0, "failures": 0, "last_error": None}
+        self._results = {}          # 日志 id -> 写入函数的返回值（如日记的 "保存" / "更新"），由 result() 取走
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=FULL")     # 每次提交落盘，断电也不丢
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS spool (
+                id              INTEGER PRIMARY KEY AUTOINCREMENT,
+                kind            TEXT    NOT NULL,
+                payload         TEXT    NOT NULL,
+                created_at      REAL    NOT NULL,
+                attempts        INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at REAL    NOT NULL DEFAULT 0,
+                last_error      TEXT,
+                failed          INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        # 旧版本建的日志文件没有 failed 列
+        if "failed" not in {r[1] for r in self._conn.execute("PRAGMA table_info(spool)")}:
+            self._conn.execute("ALTER TABLE spool ADD COLUMN failed INTEGER NOT NULL DEFAULT 0")
+
+    # ---------- 写入端 ----------
+    def enqueue(self, kind, record):
+        """写入本地日志并唤醒 flusher，返回日志 id"""
+        if kind not in WRITERS:
+            raise KeyError(f"未知的写入类型：{kind}")
+        # spool_id：写入目标表的幂等键，重放同一条日志不会产生第二行
+        payload = json.dumps({**record, "spool_id": uuid.uuid4().hex}, ensure_ascii=False, default=str)
+        with self._lock:
+            cur = self._conn.execute(
+                "INSERT INTO spool (kind, payload, created_at) VALUES (?, ?, ?)",
+                (kind, payload, time.time())
+            )
+            entry_id = cur.lastrowid
+            self._stats["enqueued"] += 1
+        self._wakeup.set()
+        return entry_id
+
+    def is_flushed(self, entry_id):
+        with self._lock:
+            row = self._conn.execute("SELECT 1 FROM spool WHERE id = ?", (entry_id,)).fetchone()
+        return row is None
+
+    def wait_flushed(self, entry_id, timeout=5.0):
+        """等待指定记录写入 MySQL，超时返回 False（记录仍安全保存在本地）"""
+        deadline = time.monotonic() + timeout
+        with self._flushed:
+            while not self.is_flushed(entry_id):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._flushed.wait(remaining)
+        return True
+
+    def result(self, entry_id):
+        """已写入记录的写入结果（取一次后清除）；未写入或写入函数无返回值时为 None"""
+        with self._lock:
+            return self._results.pop(entry_id, None)
+
+    def stats(self):
+        with self._lock:
+            pending, oldest, max_attempts = self._conn.execute(
+                "SELECT COUNT(*), MIN(created_at), MAX(attempts) FROM spool WHERE failed = 0"
+            ).fetchone()
+            (failed,) = self._conn.execute("SELECT COUNT(*) FROM spool WHERE failed = 1").fetchone()
+            data = dict(self._stats)
+        data.update(
+            pending=pending,
+            failed=failed,
+            oldest_age_s=round(time.time() - oldest, 1) if oldest else 0.0,
+            max_attempts=max_attempts or 0,
+        )
+        return data
+
+    def failed_entries(self, limit=100):
+        """已放弃重试的记录：[(id, kind, payload, created_at, attempts, last_error)]"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT id, kind, payload, created_at, attempts, last_error FROM spool "
+                "WHERE failed = 1 ORDER BY id LIMIT ?",
+                (limit,)
+            ).fetchall()
+
+    def retry_failed(self):
+        """failed 记录重新排队（如修复数据或表结构之后），返回条数"""
+        with self._lock:
+            n = self._conn.execute(
+                "UPDATE spool SET failed = 0, attempts = 0, next_attempt_at = 0 WHERE failed = 1"
+            ).rowcount
+        self._wakeup.set()
+        return n
+
+    # ---------- flusher ----------
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="spool-flusher", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wakeup.set()
+
+    def _due_batch(self):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT id, kind, payload, attempts FROM spool "
+                "WHERE failed = 0 AND next_attempt_at <= ? ORDER BY id LIMIT ?",
+                (time.time(), self.batch_size)
+            ).fetchall()
+
+    def _next_due_in(self):
+        with self._lock:
+            (next_at,) = self._conn.execute("SELECT MIN(next_attempt_at) FROM spool WHERE failed = 0").fetchone()
+        if next_at is None:
+            return None
+        return max(0.0, next_at - time.time())
+
+    def _write(self, entries):
+        """在同一个 MySQL 事务中写入一批记录，提交成功后失效相关患者的历史缓存；返回各条的写入结果"""
+        records = [(kind, json.loads(payload)) for _, kind, payload, _ in entries]
+        with db.transaction() as conn, conn.cursor() as cursor:
+            results = [WRITERS[kind](cursor, record) for kind, record in records]
+        cache = get_patient_cache()
+        for _, record in records:
+            cache.invalidate(record["name"])
+        return results
+
+    def _mark_done(self, entries, results):
+        ids = [e[0] for e in entries]
+        with self._lock:
+            self._conn.executemany("DELETE FROM spool WHERE id = ?", [(i,) for i in ids])
+            self._results.update((i, r) for i, r in zip(ids, results) if r is not None)
+            while len(self._results) > 1000:        # 无人取走的结果只保留最近的
+                del self._results[next(iter(self._results))]
+            self._stats["flushed"] += len(ids)
+            self._stats["batches"] += 1
+        with self._flushed:
+            self._flushed.notify_all()
+
+    def _mark_failed(self, entries, error):
+        now = time.time()
+        # MySQL 不可达不计入放弃条件，宕机再久也会补写；其他错误（坏数据、约束冲突）重试 max_attempts 次后放弃
+        give_up = not _is_connection_error(error)
+        rows = []
+        for entry_id, _, _, attempts in entries:
+            # 指数退避 + 抖动，封顶 max_backoff
+            delay = min(self.max_backoff, self.base_backoff * 2 ** attempts)
+            failed = int(give_up and attempts + 1 >= self.max_attempts)
+            rows.append((now + delay * random.uniform(0.8, 1.2), str(error)[:500], failed, entry_id))
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE spool SET attempts = attempts + 1, next_attempt_at = ?, last_error = ?, failed = ? "
+                "WHERE id = ?",
+                rows
+            )
+            self._stats["failures"] += 1
+            self._stats["last_error"] = str(error)[:500]
+
+    def flush_once(self):
+        """写一批到期记录，返回成功写入的条数"""
+        entries = self._due_batch()
+        if not entries:
+            return 0
+        try:
+            results = self._write(entries)
+        except Exception as e:
+            if len(entries) == 1:
+                self._mark_failed(entries, e)
+                return 0
+            # 连接类错误整批退避；其他错误逐条重试，避免一条坏数据卡住后面所有记录
+            if _is_connection_error(e):
+                self._mark_failed(entries, e)
+                return 0
+            done = 0
+            for entry in entries:
+                try:
+                    results = self._write([entry])
+                except Exception as single_error:
+                    self._mark_failed([entry], single_error)
+                else:
+                    self._mark_done([entry], results)
+                    done += 1
+            return done
+        self._mark_done(entries, results)
+        return len(entries)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wakeup.clear()
+            try:
+                if self.flush_once():
+                    continue
+            except Exception as e:      # 本地 SQLite 异常等，不让线程退出
+                with self._lock:
+                    self._stats["last_error"] = str(e)[:500]
+            wait = self._next_due_in()
+            self._wakeup.wait(timeout=5.0 if wait is None else min(wait, 5.0))
+
+
+def _is_connection_error(e):
+    """MySQL 不可达 / 连接中断 / 连接池等待超时"""
+    if isinstance(e, (TimeoutError, ConnectionError)):
+        return True
+    return bool(e.args) and e.args[0] in (2003, 2006, 2013)
+
+
+@st.cache_resource(show_spinner=False)
+def get_spool():
+    """进程内唯一的 spool，首次获取时启动后台 flusher"""
+    spool = Spool(
+        SPOOL_PATH,
+        batch_size=int(os.getenv("SPOOL_BATCH_SIZE", 50)),
+        max_backoff=float(os.getenv("SPOOL_MAX_BACKOFF", 300)),
+        max_attempts=int(os.getenv("SPOOL_MAX_ATTEMPTS", 20)),
+    )
+    spool.start()
+    return spool
+
+
+def submit(kind, record):
+    """页面调用入口：记录落本地日志后立即返回日志 id"""
+    return get_spool().enqueue(kind, record)
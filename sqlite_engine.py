@@ -0,0 +1,220 @@
+# sqlite_engine.py
+# 本地 SQLite 存储引擎（STORAGE_ENGINE=sqlite）：
+# 提供与 pymysql 连接相同的用法（cursor / begin / commit / rollback / ping），
+# 连接池、repository 与各页面的 SQL 无需改动即可运行在本地磁盘上；
+# 与 SQLpub 的双向同步见 sync.py。
+import os
+import re
+import sqlite3
+import threading
+import time
+from datetime import date, datetime
+
+from metrics import QUERY_LOG
+from repository import CLOCK_MINUTE_COLUMNS, SCALE_INSERT_SQL
+
+SQLITE_PATH = os.getenv("SQLITE_PATH", "local.sqlite3")
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations", "sqlite", "schema.sql")
+
+# 日期 / 时间与 pymysql 返回的类型一致
+sqlite3.register_adapter(date, lambda d: d.isoformat())
+sqlite3.register_adapter(datetime, lambda d: d.isoformat(" "))
+sqlite3.register_converter("DATE", lambda b: date.fromisoformat(b.decode()))
+sqlite3.register_converter("TIMESTAMP", lambda b: datetime.fromisoformat(b.decode()))
+sqlite3.register_converter("DATETIME", lambda b: datetime.fromisoformat(b.decode()))
+
+_PARAM_RE = re.compile(r"%\((\w+)\)s|%s")
+_VALUES_RE = re.compile(r"VALUES\((\w+)\)")
+_UPSERT = "ON DUPLICATE KEY UPDATE"
+_FOR_UPDATE_RE = re.compile(r"\s+FOR UPDATE\s*$")
+
+
+def translate(sql):
+    """
+    MySQL 方言 → SQLite：
+    - 占位符 %s / %(name)s → ? / :name
+    - ON DUPLICATE KEY UPDATE c = VALUES(c) → ON CONFLICT DO UPDATE SET c = excluded.c
+    - 去掉 SELECT ... FOR UPDATE：写事务为 BEGIN IMMEDIATE，本身已串行
+    """
+    sql = _FOR_UPDATE_RE.sub("", sql)
+    sql = _PARAM_RE.sub(lambda m: f":{m.group(1)}" if m.group(1) else "?", sql)
+    head, sep, tail = sql.partition(_UPSERT)
+    if sep:
+        sql = head + "ON CONFLICT DO UPDATE SET " + _VALUES_RE.sub(r"excluded.\1", tail)
+    return sql
+
+
+def _params(params):
+    if params is None:
+        return ()
+    if isinstance(params, (dict, list, tuple)):
+        return params
+    return (params,)
+
+
+class Cursor:
+    """
+    sqlite3 游标的 pymysql 风格包装：execute 返回受影响行数。
+    每条语句按原始（MySQL 方言）模板计入 QUERY_LOG；查询结果是逐行读取的，只计执行耗时。
+    """
+
+    def __init__(self, conn):
+        self._cur = conn.cursor()
+
+    @property
+    def description(self):
+        return self._cur.description
+
+    @property
+    def rowcount(self):
+        return self._cur.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._cur.lastrowid
+
+    def _timed(self, sql, run):
+        start = time.perf_counter()
+        error = None
+        try:
+            run()
+            return max(self._cur.rowcount, 0)
+        except Exception as e:
+            error = type(e).__name__
+            raise
+        finally:
+            QUERY_LOG.record(sql, (time.perf_counter() - start) * 1000,
+                             rows=max(self._cur.rowcount, 0), error=error)
+
+    def execute(self, sql, params=None):
+        return self._timed(sql, lambda: self._cur.execute(translate(sql), _params(params)))
+
+    def executemany(self, sql, seq_of_params):
+        return self._timed(sql, lambda: self._cur.executemany(translate(sql), seq_of_params))
+
+    def fetchone(self):
+        return self._cur.fetchone()
+
+    def fetchmany(self, size=None):
+        return self._cur.fetchmany(size or self._cur.arraysize)
+
+    def fetchall(self):
+        return self._cur.fetchall()
+
+    def __iter__(self):
+        return iter(self._cur)
+
+    def close(self):
+        self._cur.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _yearweek(value, mode=0):
+    """MySQL YEARWEEK(d, 3)：ISO 年 × 100 + ISO 周（周一为一周之始）；只支持 mode 3"""
+    if value is None:
+        return None
+    if mode != 3:
+        raise sqlite3.NotSupportedError("YEARWEEK 只支持 mode 3")
+    year, week, _ = date.fromisoformat(str(value)[:10]).isocalendar()
+    return year * 100 + week
+
+
+def _now():
+    """MySQL NOW()：本地时间，与表中 datetime('now', 'localtime') 的默认值一致"""
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+class Connection:
+    """自动提交模式；begin() 开启写事务（BEGIN IMMEDIATE，避免读锁升级时死锁）"""
+
+    def __init__(self, path=SQLITE_PATH):
+        self._conn = sqlite3.connect(
+            path, timeout=30, isolation_level=None,
+            detect_types=sqlite3.PARSE_DECLTYPES, check_same_thread=False,
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        # 统计页面与增量水位用到的 MySQL 函数
+        self._conn.create_function("YEARWEEK", 2, _yearweek, deterministic=True)
+        self._conn.create_function("NOW", 0, _now)
+        self.open = True
+
+    def cursor(self, cursor_class=None):
+        # cursor_class（如 SSCursor）无需区分：sqlite3 游标本身就是逐行读取
+        return Cursor(self._conn)
+
+    def begin(self):
+        self._conn.execute("BEGIN IMMEDIATE")
+
+    def commit(self):
+        if self._conn.in_transaction:
+            self._conn.execute("COMMIT")
+
+    def rollback(self):
+        if self._conn.in_transaction:
+            self._conn.execute("ROLLBACK")
+
+    def ping(self, reconnect=False):
+        self._conn.execute("SELECT 1")
+
+    def close(self):
+        self.open = False
+        self._conn.close()
+
+
+_schema_lock = threading.Lock()
+_schema_ready = set()
+
+# schema.sql 建表之后新增的列：CREATE TABLE IF NOT EXISTS 不会改动已有库文件，按此补列
+# (表, 列, 类型)，与 migrations/ 中 MySQL 的 ALTER 对应
+ADDED_COLUMNS = [
+    (table, column, decl)
+    for table in ("sleep_diary", "sleep_diary_latest")
+    for column, decl in [(c, "SMALLINT") for c in CLOCK_MINUTE_COLUMNS] + [("edited_at", "DATETIME")]
+]
+
+
+ADDED_COLUMNS += [(table, "spool_id", "CHAR(32)") for table in SCALE_INSERT_SQL]
+# 建立在新增列上的索引，补列之后创建
+ADDED_INDEXES = [
+    f"CREATE UNIQUE INDEX IF NOT EXISTS uq_{table.split('_')[0]}_spool_id ON {table} (spool_id)"
+    for table in SCALE_INSERT_SQL
+]
+
+
+def _add_missing_columns(conn):
+    existing = {}
+    for table, column, decl in ADDED_COLUMNS:
+        if table not in existing:
+            existing[table] = {r[1] for r in conn.execute(f"PRAGMA table_info({table})")}
+        if column not in existing[table]:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+    for sql in ADDED_INDEXES:
+        conn.execute(sql)
+    conn.commit()
+
+
+def ensure_schema(path=SQLITE_PATH):
+    """每个库文件每个进程执行一次建表语句（全部 IF NOT EXISTS）"""
+    with _schema_lock:
+        if path in _schema_ready:
+            return
+        with open(SCHEMA_PATH, encoding="utf-8") as f:
+            schema = f.read()
+        conn = sqlite3.connect(path, timeout=30)
+        try:
+            conn.executescript(schema)
+            _add_missing_columns(conn)
+        finally:
+            conn.close()
+        _schema_ready.add(path)
+
+
+def connect(path=SQLITE_PATH):
+    ensure_schema(path)
+    return Connection(path)
@@ -0,0 +1,298 @@
+# sync.py
+# 本地 SQLite 引擎与 SQLpub 的后台双向同步（STORAGE_ENGINE=sqlite 时由 db.get_pool 启动）：
+# - 睡眠日记：按 (updated_at, id) 水位双向同步，水位只推进到数据库当前时间之前 WATERMARK_LAG；
+#   (name, record_date) 冲突按两端共有的 edited_at（来源端保存时刻，同步原样携带）较新者为准，
+#   不比较两端各自时钟的 updated_at；拉取不写入远端的 updated_at，本地水位只看本地时钟
+# - 量表：只插入不修改。本地新记录推送后记下 remote_id；远端新记录按 id 水位拉取，按 remote_id / spool_id 去重
+# - 报告：只从远端拉取元数据（id 与远端一致），PDF 写入 report_store
+# 水位保存在本地 sync_state 表中，进程重启后从断点继续。
+import os
+import threading
+import time
+
+import streamlit as st
+
+import sqlite_engine
+from cache import get_patient_cache
+from db import connect_mysql
+from report_store import get_report_store, read_blob_chunks
+from diarystats import update_diary_stats
+from repository import (DIARY_COLUMNS, REFRESH_LATEST_SQL, SCALE_INSERT_SQL, save_sleep_diary,
+                        watermark_cutoff)
+
+DIARY_SYNC_COLUMNS = DIARY_COLUMNS + ["created_at", "updated_at"]
+_diary_cols = ", ".join(DIARY_SYNC_COLUMNS)
+
+# (updated_at, id) 水位之后、截止时间之前的一批行
+CHANGED_DIARY_SQL = f"""
+    SELECT id, {_diary_cols} FROM sleep_diary
+    WHERE (updated_at, id) > (%s, %s) AND updated_at <= %s
+    ORDER BY updated_at, id LIMIT %s
+"""
+
+# 远端 edited_at 较新时才覆盖本地（本地较新的修改会在推送阶段写回远端），edited_at 为空视为最旧；
+# updated_at 不写入，插入取默认值、更新由触发器刷新为本地时间
+_pull_cols = [c for c in DIARY_SYNC_COLUMNS if c != "updated_at"]
+PULL_DIARY_SQL = f"""
+    INSERT INTO sleep_diary ({", ".join(_pull_cols)})
+    VALUES ({", ".join(f"%({c})s" for c in _pull_cols)})
+    ON CONFLICT (name, record_date) DO UPDATE SET
+    {", ".join(f"{c} = excluded.{c}" for c in _pull_cols if c not in ("name", "record_date"))}
+    WHERE COALESCE(excluded.edited_at, '') > COALESCE(sleep_diary.edited_at, '')
+"""
+REMOTE_EDITED_SQL = "SELECT edited_at FROM sleep_diary WHERE name = %s AND record_date = %s FOR UPDATE"
+
+REPORT_COLUMNS = ["id", "patient_name", "treat_date", "upload_time", "pdf_sha256", "pdf_size"]
+
+
+class SyncWorker:
+
+    def __init__(self, interval=30.0, batch_size=200):
+        self.interval = interval
+        self.batch_size = batch_size
+        self._stop = threading.Event()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stats = {"rounds": 0, "pushed": 0, "pulled": 0, "failures": 0,
+                       "last_success": None, "last_error": None}
+
+    # ---------- 水位 ----------
+    @staticmethod
+    def _get_mark(local, key, default):
+        with local.cursor() as cur:
+            cur.execute("SELECT value FROM sync_state WHERE key = %s", (key,))
+            row = cur.fetchone()
+        return row[0] if row else default
+
+    @staticmethod
+    def _set_mark(cur, key, value):
+        cur.execute(
+            "INSERT INTO sync_state (key, value) VALUES (%s, %s) "
+            "ON CONFLICT (key) DO UPDATE SET value = excluded.value",
+            (key, str(value))
+        )
+
+    # ---------- 睡眠日记 ----------
+    def _changed_diary(self, local, conn, key, default):
+        """conn 上 sync_state[key] 水位之后、该库时钟 WATERMARK_LAG 之前的一批日记行"""
+        mark_at, mark_id = self._get_mark(local, key, default).split("|")
+        with conn.cursor() as cur:
+            cur.execute(CHANGED_DIARY_SQL, (mark_at, int(mark_id), watermark_cutoff(cur), self.batch_size))
+            return cur.fetchall()
+
+    def push_diary(self, local, remote):
+        """
+        本地水位之后的行按自然键 upsert 到远端（同时刷新远端投影表）；
+        远端同一晚的 edited_at 不旧于本地时跳过（含刚从远端拉取的同一版本）。
+        """
+        rows = self._changed_diary(local, local, "push:sleep_diary", "|0")
+        if not rows:
+            return 0
+        remote.begin()
+        try:
+            with remote.cursor() as rcur:
+                for row in rows:
+                    record = dict(zip(DIARY_SYNC_COLUMNS, row[1:]))
+                    rcur.execute(REMOTE_EDITED_SQL, (record["name"], record["record_date"]))
+                    theirs = rcur.fetchone()
+                    if theirs is None or _newer(record["edited_at"], theirs[0]):
+                        save_sleep_diary(rcur, record)
+            remote.commit()
+        except Exception:
+            remote.rollback()
+            raise
+        last = rows[-1]
+        with local.cursor() as cur:
+            self._set_mark(cur, "push:sleep_diary", f"{last[-1]}|{last[0]}")
+        return len(rows)
+
+    def pull_diary(self, local, remote):
+        """远端水位之后的行写入本地，并刷新本地投影表"""
+        rows = self._changed_diary(local, remote, "pull:sleep_diary", "1970-01-01 00:00:00|0")
+        if not rows:
+            return 0
+        local.begin()
+        try:
+            with local.cursor() as cur:
+                for row in rows:
+                    record = dict(zip(DIARY_SYNC_COLUMNS, row[1:]))
+                    cur.execute(PULL_DIARY_SQL, record)
+                    cur.execute(REFRESH_LATEST_SQL, record)
+                    update_diary_stats(cur, record["name"], record["record_date"])
+                last = rows[-1]
+                self._set_mark(cur, "pull:sleep_diary", f"{last[-1]}|{last[0]}")
+            local.commit()
+        except Exception:
+            local.rollback()
+            raise
+        self._invalidate(r[1] for r in rows)
+        return len(rows)
+
+    # ---------- 量表 ----------
+    @staticmethod
+    def _columns(local, table):
+        with local.cursor() as cur:
+            cur.execute(f"SELECT * FROM {table} LIMIT 0")
+            return [d[0] for d in cur.description if d[0] not in ("id", "remote_id")]
+
+    def push_scale(self, local, remote, table):
+        """本地尚未推送（remote_id 为空）的记录插入远端，记下远端 id"""
+        columns = self._columns(local, table)
+        with local.cursor() as cur:
+            cur.execute(
+                f"SELECT id, {', '.join(columns)} FROM {table} WHERE remote_id IS NULL ORDER BY id LIMIT %s",
+                (self.batch_size,)
+            )
+            rows = cur.fetchall()
+        # 远端已有同一 spool_id 的行（上次推送后未及记下 remote_id）时不重复插入，取回其 id
+        insert_sql = (f"INSERT INTO {table} ({', '.join(columns)}) "
+                      f"VALUES ({', '.join(['%s'] * len(columns))}) "
+                      "ON DUPLICATE KEY UPDATE id = LAST_INSERT_ID(id)")
+        for row in rows:
+            # 逐条提交并立即记下 remote_id；两步之间中断时重推按 spool_id 去重（升级前的记录无 spool_id，仍可能重复）
+            with remote.cursor() as rcur:
+                rcur.execute(insert_sql, row[1:])
+                remote_id = rcur.lastrowid
+            with local.cursor() as cur:
+                cur.execute(f"UPDATE {table} SET remote_id = %s WHERE id = %s", (remote_id, row[0]))
+        return len(rows)
+
+    def pull_scale(self, local, remote, table):
+        """远端 id 水位之后的记录写入本地；本地推送过去的记录按 remote_id 跳过"""
+        columns = self._columns(local, table)
+        mark = int(self._get_mark(local, f"pull:{table}", 0))
+        with remote.cursor() as rcur:
+            rcur.execute(
+                f"SELECT id, {', '.join(columns)} FROM {table} WHERE id > %s ORDER BY id LIMIT %s",
+                (mark, self.batch_size)
+            )
+            rows = rcur.fetchall()
+        if not rows:
+            return 0
+        local.begin()
+        try:
+            with local.cursor() as cur:
+                cur.executemany(
+                    f"INSERT INTO {table} (remote_id, {', '.join(columns)}) "
+                    f"VALUES ({', '.join(['%s'] * (len(columns) + 1))}) "
+                    "ON CONFLICT DO NOTHING",         # remote_id 或 spool_id 已存在（本地推送过去的记录）
+                    rows
+                )
+                self._set_mark(cur, f"pull:{table}", rows[-1][0])
+            local.commit()
+        except Exception:
+            local.rollback()
+            raise
+        name_idx = columns.index("name") + 1
+        self._invalidate(r[name_idx] for r in rows)
+        return len(rows)
+
+    # ---------- 报告 ----------
+    def pull_reports(self, local, remote):
+        """远端新报告的元数据写入本地；PDF 仍在 pdf_blob 中的，分段读出写入 report_store"""
+        mark = int(self._get_mark(local, "pull:sleep_report_pdf", 0))
+        with remote.cursor() as rcur:
+            rcur.execute(
+                f"SELECT {', '.join(REPORT_COLUMNS)} FROM sleep_report_pdf WHERE id > %s ORDER BY id LIMIT %s",
+                (mark, self.batch_size)
+            )
+            rows = [list(r) for r in rcur.fetchall()]
+        if not rows:
+            return 0
+        store = get_report_store()
+        for row in rows:
+            if not row[4] or not store.exists(row[4]):
+                with remote.cursor() as rcur:
+                    row[4], row[5] = store.put_chunks(read_blob_chunks(rcur, row[0]))
+        local.begin()
+        try:
+            with local.cursor() as cur:
+                cur.executemany(
+                    f"INSERT INTO sleep_report_pdf ({', '.join(REPORT_COLUMNS)}) "
+                    f"VALUES ({', '.join(['%s'] * len(REPORT_COLUMNS))}) "
+                    "ON CONFLICT (id) DO NOTHING",
+                    rows
+                )
+                self._set_mark(cur, "pull:sleep_report_pdf", rows[-1][0])
+            local.commit()
+        except Exception:
+            local.rollback()
+            raise
+        return len(rows)
+
+    @staticmethod
+    def _invalidate(names):
+        cache = get_patient_cache()
+        for name in set(names):
+            cache.invalidate(name)
+
+    # ---------- 调度 ----------
+    def sync_once(self):
+        """推送后拉取，每张表分批直到追平；返回 (推送条数, 拉取条数)"""
+        local = sqlite_engine.connect()
+        remote = connect_mysql()
+        pushed = pulled = 0
+        try:
+            while (n := self.push_diary(local, remote)):
+                pushed += n
+            while (n := self.pull_diary(local, remote)):
+                pulled += n
+            for table in SCALE_INSERT_SQL:
+                while (n := self.push_scale(local, remote, table)):
+                    pushed += n
+                while (n := self.pull_scale(local, remote, table)):
+                    pulled += n
+            while (n := self.pull_reports(local, remote)):
+                pulled += n
+        finally:
+            local.close()
+            remote.close()
+        with self._lock:
+            self._stats["rounds"] += 1
+            self._stats["pushed"] += pushed
+            self._stats["pulled"] += pulled
+            self._stats["last_success"] = time.strftime("%Y-%m-%d %H:%M:%S")
+        return pushed, pulled
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="sqlpub-sync", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wakeup.set()
+
+    def wake(self):
+        self._wakeup.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wakeup.clear()
+            try:
+                self.sync_once()
+            except Exception as e:      # SQLpub 不可达等，下一轮重试
+                with self._lock:
+                    self._stats["failures"] += 1
+                    self._stats["last_error"] = str(e)[:500]
+            self._wakeup.wait(timeout=self.interval)
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
+
+
+def _newer(ours, theirs):
+    """edited_at 比较，空值视为最旧"""
+    return ours is not None and (theirs is None or ours > theirs)
+
+
+@st.cache_resource(show_spinner=False)
+def get_sync_worker():
+    worker = SyncWorker(
+        interval=float(os.getenv("SYNC_INTERVAL", 30)),
+        batch_size=int(os.getenv("SYNC_BATCH_SIZE", 200)),
+    )
+    worker.start()
+    return worker
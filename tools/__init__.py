@@ -0,0 +1 @@
+# 运维命令行工具，在仓库根目录以 python -m tools.<name> 运行
@@ -0,0 +1,101 @@
+# tools/backfill_clock_minutes.py
+"""
+回填 sleep_diary / sleep_diary_latest 的 *_min 列（迁移 0005）：由 "HH:MM" 字符串算出自中午 12 点起的分钟数。
+
+按各表主键键集分块（sleep_diary 为 id，sleep_diary_latest 为 (name, record_date)），只取还有时间列未回填的行；每块整列换算后用一条 executemany 批量 UPDATE，一个短事务提交。
+可重复运行，中断后重跑只处理剩余的行。MySQL 上显式保留 updated_at，不触发导出缓存失效与同步。
+
+    python -m tools.backfill_clock_minutes                  # 回填两张表
+    python -m tools.backfill_clock_minutes --dry-run        # 只统计待回填行数
+    python -m tools.backfill_clock_minutes --table sleep_diary --chunk-size 5000
+"""
+import argparse
+import time
+
+import pandas as pd
+
+from db import get_connection
+from repository import CLOCK_COLUMNS
+from sleeptime import times_to_min
+
+TABLES = {
+    # 表 -> 主键：键集分页与更新时定位一行都用它
+    "sleep_diary": ["id"],
+    "sleep_diary_latest": ["name", "record_date"],
+}
+
+# 有时间字符串但对应 _min 列为空的行
+_PENDING = " OR ".join(f"({c}_min IS NULL AND {c} IS NOT NULL AND {c} <> '无')" for c in CLOCK_COLUMNS)
+
+
+def chunk_minutes(df):
+    """一块行 → 每列的分钟数（整数或 None），列名为 <列>_min"""
+    out = pd.DataFrame(index=df.index)
+    for c in CLOCK_COLUMNS:
+        mins = (times_to_min(df[c]) - 720) % 1440
+        out[f"{c}_min"] = mins.astype(object).where(mins.notna(), None)
+    return out
+
+
+def backfill_table(conn, cur, table, chunk_size, pause):
+    keys = TABLES[table]
+    assigns = ", ".join(f"{c}_min = %s" for c in CLOCK_COLUMNS)
+    where = " AND ".join(f"{k} = %s" for k in keys)
+    # updated_at 显式赋为原值，MySQL 的 ON UPDATE CURRENT_TIMESTAMP 不会生效
+    update_sql = f"UPDATE {table} SET {assigns}, updated_at = updated_at WHERE {where}"
+    select_cols = ", ".join(keys + CLOCK_COLUMNS)
+    key_cols = ", ".join(keys)
+    # 主键上的行值比较，按索引范围读取下一块
+    after_sql = f"({key_cols}) > ({', '.join(['%s'] * len(keys))}) AND "
+
+    after, done = None, 0
+    while True:
+        cur.execute(
+            f"SELECT {select_cols} FROM {table} WHERE {after_sql if after else ''}({_PENDING}) "
+            f"ORDER BY {key_cols} LIMIT %s",
+            (*(after or ()), chunk_size)
+        )
+        rows = cur.fetchall()
+        if not rows:
+            break
+        df = pd.DataFrame(rows, columns=[d[0] for d in cur.description])
+        mins = chunk_minutes(df)
+        params = [
+            tuple(int(v) if v is not None else None for v in m) + tuple(k)
+            for m, k in zip(mins.itertuples(index=False), df[keys].itertuples(index=False))
+        ]
+        conn.begin()
+        try:
+            cur.executemany(update_sql, params)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        after = rows[-1][:len(keys)]
+        done += len(rows)
+        print(f"{table}: 已回填 {done} 行（{key_cols} ≤ {', '.join(map(str, after))}）")
+        time.sleep(pause)
+    return done
+
+
+def main():
+    parser = argparse.ArgumentParser(description="回填睡眠日记时间列的整数分钟")
+    parser.add_argument("--table", choices=list(TABLES), help="只回填该表")
+    parser.add_argument("--chunk-size", type=int, default=2000, help="每块行数")
+    parser.add_argument("--pause", type=float, default=0.1, help="块间暂停秒数")
+    parser.add_argument("--dry-run", action="store_true", help="只统计待回填行数，不写入")
+    args = parser.parse_args()
+
+    tables = [args.table] if args.table else list(TABLES)
+    with get_connection() as conn, conn.cursor() as cur:
+        for table in tables:
+            if args.dry_run:
+                cur.execute(f"SELECT COUNT(*) FROM {table} WHERE {_PENDING}")
+                print(f"{table}: 待回填 {cur.fetchone()[0]} 行")
+                continue
+            done = backfill_table(conn, cur, table, args.chunk_size, args.pause)
+            print(f"{table}: 完成，共 {done} 行")
+
+
+if __name__ == "__main__":
+    main()
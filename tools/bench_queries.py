@@ -0,0 +1,300 @@
+# tools/bench_queries.py
+"""
+热点查询基准：在本地 MySQL 中建一个独立的基准库，按真实规模造数，
+分别在执行 migrations 之前（仅基线表结构，尚无 uq_name_record_date）和之后，输出每条热点查询的
+EXPLAIN 执行计划与耗时（中位数 / p95）。
+
+    python -m tools.bench_queries --host 127.0.0.1 --user root --password xxx \
+        --patients 500 --nights 200
+
+注意：会 DROP 并重建 --database 指定的库，切勿指向线上库。
+"""
+import argparse
+import random
+import statistics
+import time
+from datetime import date, timedelta
+
+import pymysql
+
+from tools.dedupe_sleep_diary import UNIQUE_KEY
+from tools.migrate import apply_migrations
+from tools.rebuild_diary_latest import rebuild_names
+
+# 迁移前跳过的查询：表 / 列尚不存在
+ER_NO_SUCH_TABLE, ER_BAD_FIELD = 1146, 1054
+
+# 与页面中的 SQL 保持一致
+HOT_QUERIES = [
+    ("日记历史（最新一条/晚）", """
+        SELECT t1.*
+        FROM sleep_diary t1
+        INNER JOIN (
+            SELECT record_date, MAX(created_at) AS max_created_at
+            FROM sleep_diary
+            WHERE name = %(name)s
+            GROUP BY record_date
+        ) t2
+        ON t1.record_date = t2.record_date AND t1.created_at = t2.max_created_at
+        ORDER BY t1.record_date ASC
+    """),
+    ("日记历史（投影表）", "SELECT * FROM sleep_diary_latest WHERE name = %(name)s ORDER BY record_date ASC"),
+    ("最近7次汇总（投影表）", """
+        SELECT * FROM (
+            SELECT * FROM sleep_diary_latest
+            WHERE name = %(name)s
+            ORDER BY record_date DESC
+            LIMIT 7
+        ) t
+        ORDER BY record_date ASC
+    """),
+    ("最近7次汇总", """
+        SELECT t1.*
+        FROM sleep_diary t1
+        INNER JOIN (
+            SELECT record_date, MAX(created_at) AS max_created_at
+            FROM sleep_diary
+            WHERE name = %(name)s
+            GROUP BY record_date
+            ORDER BY record_date DESC
+            LIMIT 7
+        ) t2
+        ON t1.record_date = t2.record_date AND t1.created_at = t2.max_created_at
+        ORDER BY t1.record_date ASC
+    """),
+    ("单次查询", "SELECT * FROM sleep_diary WHERE name=%(name)s AND entry_date=%(day)s ORDER BY created_at DESC"),
+    ("按日期查询", "SELECT * FROM sleep_diary WHERE entry_date=%(day)s ORDER BY name, created_at DESC"),
+    ("区间查询（指定患者）",
+     "SELECT * FROM sleep_diary WHERE name=%(name)s AND entry_date BETWEEN %(start)s AND %(end)s "
+     "ORDER BY entry_date, created_at DESC"),
+    ("区间查询（所有患者，首页）",
+     "SELECT * FROM sleep_diary WHERE entry_date BETWEEN %(start)s AND %(end)s "
+     "ORDER BY entry_date, name, id LIMIT 200"),
+    ("区间查询（所有患者，后续页）",
+     "SELECT * FROM sleep_diary WHERE entry_date BETWEEN %(start)s AND %(end)s "
+     "AND (entry_date, name, id) > (%(start)s, %(name)s, 0) "
+     "ORDER BY entry_date, name, id LIMIT 200"),
+    *[(f"{tbl} 历史",
+       f"SELECT id, name, ts, created_at, {score} FROM {tbl} WHERE name=%(name)s ORDER BY created_at DESC")
+      for tbl, score in [("isi_record", "total_score"), ("fss_record", "total_score"),
+                         ("psqi_record", "total_score"), ("sas_record", "std_score"),
+                         ("sds_record", "std_score"), ("has_record", "total_score")]],
+    ("报告列表", """
+        SELECT id, treat_date, upload_time, pdf_sha256
+        FROM sleep_report_pdf
+        WHERE patient_name = %(name)s
+        ORDER BY treat_date DESC
+    """),
+]
+
+SCALE_ITEMS = {
+    "isi_record": None,
+    "fss_record": [f"q{i}" for i in range(1, 10)],
+    "has_record": [f"q{i}" for i in range(1, 27)],
+    "sas_record": [f"q{i}" for i in range(1, 21)],
+    "sds_record": [f"q{i}" for i in range(1, 21)],
+}
+
+
+def hhmm(minutes):
+    minutes %= 24 * 60
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def seed(conn, patients, nights, scale_records, reports, blob_kb, batch=2000):
+    rnd = random.Random(42)
+    names = [f"患者{i:05d}" for i in range(patients)]
+    today = date.today()
+    with conn.cursor() as cur:
+        # 睡眠日记：每人连续 nights 晚
+        rows = []
+        for name in names:
+            start = today - timedelta(days=nights + rnd.randint(0, 365))
+            for n in range(nights):
+                record_date = start + timedelta(days=n)
+                bed = 22 * 60 + rnd.randint(-60, 120)
+                wake = 6 * 60 + 30 + rnd.randint(-60, 90)
+                latency = rnd.randint(5, 120)
+                awake = rnd.randint(0, 90)
+                tib = (wake + 24 * 60 - bed) % (24 * 60)
+                tst = max(0, tib - latency - awake)
+                rows.append((
+                    name, record_date, record_date + timedelta(days=1), "无", "无",
+                    rnd.randint(0, 90), rnd.randint(0, 60), "无", "无",
+                    "无;无;无;无", "0mg;0mg;0mg;0mg", "22:00", "中", "无",
+                    hhmm(bed), hhmm(bed + 10), latency, rnd.randint(0, 5), awake,
+                    hhmm(wake), hhmm(wake + 10), tst / 60, tst / tib * 100 if tib else 0, "中", "中",
+                ))
+                if len(rows) >= batch:
+                    _insert_diary(cur, rows)
+                    rows = []
+        if rows:
+            _insert_diary(cur, rows)
+        conn.commit()
+
+        # 量表
+        for name in names:
+            for tbl in ["isi_record", "fss_record", "psqi_record", "sas_record", "sds_record", "has_record"]:
+                for _ in range(scale_records):
+                    _insert_scale(cur, rnd, tbl, name)
+        conn.commit()
+
+        # 报告 PDF
+        blob = rnd.randbytes(blob_kb * 1024)
+        for name in names:
+            for r in range(reports):
+                treat = (today - timedelta(days=30 * r)).strftime("%Y%m%d")
+                cur.execute(
+                    "INSERT INTO sleep_report_pdf (patient_name, treat_date, pdf_blob) VALUES (%s, %s, %s)",
+                    (name, treat, blob)
+                )
+        conn.commit()
+    return names
+
+
+def _insert_diary(cur, rows):
+    cur.executemany("""
+        INSERT INTO sleep_diary
+        (name, record_date, entry_date, nap_start, nap_end, daytime_bed_minutes, nap_duration, caffeine, alcohol,
+         med_name, med_dose, med_time, daytime_mood, sleep_interference,
+         bed_time, try_sleep_time, sleep_latency, night_awake_count,
+         night_awake_total, final_wake_time, get_up_time, total_sleep_hours,
+         sleep_efficiency, sleep_quality, morning_feeling)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s,
+                %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+    """, rows)
+
+
+def _insert_scale(cur, rnd, tbl, name):
+    ts = time.strftime("%Y/%m/%d %H:%M:%S")
+    if tbl == "psqi_record":
+        cur.execute(
+            "INSERT INTO psqi_record (name, ts, bed_time, getup_time, total_score, sleep_efficiency) "
+            "VALUES (%s, %s, '23:30', '07:00', %s, %s)",
+            (name, ts, rnd.randint(0, 21), rnd.uniform(50, 100))
+        )
+    elif tbl == "isi_record":
+        cur.execute("INSERT INTO isi_record (name, ts, total_score) VALUES (%s, %s, %s)",
+                    (name, ts, rnd.randint(0, 28)))
+    else:
+        items = SCALE_ITEMS[tbl]
+        values = [rnd.randint(1, 4) for _ in items]
+        score_cols = ["raw_score", "std_score"] if tbl in ("sas_record", "sds_record") else ["total_score"]
+        scores = [sum(values), int(sum(values) * 1.25 + 0.5)] if len(score_cols) == 2 else [sum(values)]
+        cols = ["name", "ts", *items, *score_cols]
+        cur.execute(
+            f"INSERT INTO {tbl} ({', '.join(cols)}) VALUES ({', '.join(['%s'] * len(cols))})",
+            (name, ts, *values, *scores)
+        )
+
+
+def measure(conn, names, repeat):
+    rnd = random.Random(7)
+    with conn.cursor() as cur:
+        cur.execute("SELECT MIN(entry_date), MAX(entry_date) FROM sleep_diary")
+        lo, hi = cur.fetchone()
+    results = []
+    for label, sql in HOT_QUERIES:
+        timings, plan = [], None
+        try:
+            with conn.cursor() as cur:
+                cur.execute("EXPLAIN " + sql, {"name": names[0], "day": lo, "start": lo, "end": hi})
+        except (pymysql.err.ProgrammingError, pymysql.err.OperationalError) as e:
+            # 迁移前尚不存在的表（1146，如 sleep_diary_latest）或列（1054，如 pdf_sha256）
+            if e.args[0] not in (ER_NO_SUCH_TABLE, ER_BAD_FIELD):
+                raise
+            results.append({"label": label, "p50_ms": float("nan"), "p95_ms": float("nan"), "plan": []})
+            continue
+        for i in range(repeat):
+            day = lo + timedelta(days=rnd.randint(0, max(0, (hi - lo).days)))
+            params = {"name": rnd.choice(names), "day": day,
+                      "start": day - timedelta(days=7), "end": day}
+            with conn.cursor() as cur:
+                if plan is None:
+                    cur.execute("EXPLAIN " + sql, params)
+                    cols = [d[0] for d in cur.description]
+                    plan = [dict(zip(cols, r)) for r in cur.fetchall()]
+                start = time.perf_counter()
+                cur.execute(sql, params)
+                cur.fetchall()
+                timings.append((time.perf_counter() - start) * 1000)
+        timings.sort()
+        results.append({
+            "label": label,
+            "p50_ms": statistics.median(timings),
+            "p95_ms": timings[min(len(timings) - 1, int(len(timings) * 0.95))],
+            "plan": plan,
+        })
+    return results
+
+
+def format_plan(plan):
+    return "; ".join(
+        f"{p.get('table')}:{p.get('type')} key={p.get('key')} rows={p.get('rows')}"
+        + (f" ({p.get('Extra')})" if p.get("Extra") else "")
+        for p in plan
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="热点查询 EXPLAIN 与耗时基准（迁移前后对比）")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=3306)
+    parser.add_argument("--user", default="root")
+    parser.add_argument("--password", default="")
+    parser.add_argument("--database", default="sleep_bench")
+    parser.add_argument("--patients", type=int, default=500)
+    parser.add_argument("--nights", type=int, default=200, help="每位患者的日记晚数")
+    parser.add_argument("--scale-records", type=int, default=8, help="每位患者每个量表的记录数")
+    parser.add_argument("--reports", type=int, default=4, help="每位患者的报告数")
+    parser.add_argument("--blob-kb", type=int, default=64, help="每份报告 PDF 大小（KB）")
+    parser.add_argument("--repeat", type=int, default=30, help="每条查询执行次数")
+    args = parser.parse_args()
+
+    conn = pymysql.connect(host=args.host, port=args.port, user=args.user, password=args.password,
+                           charset="utf8mb4", autocommit=True)
+    with conn.cursor() as cur:
+        cur.execute(f"DROP DATABASE IF EXISTS `{args.database}`")
+        cur.execute(f"CREATE DATABASE `{args.database}` DEFAULT CHARSET utf8mb4")
+    conn.select_db(args.database)
+
+    apply_migrations(conn, target="0000")
+    print("造数中 …")
+    t0 = time.perf_counter()
+    names = seed(conn, args.patients, args.nights, args.scale_records, args.reports, args.blob_kb)
+    print(f"造数完成，用时 {time.perf_counter() - t0:.1f}s")
+
+    def analyze():
+        with conn.cursor() as cur:
+            for tbl in ["sleep_diary", "psqi_record", "isi_record", "has_record",
+                        "fss_record", "sas_record", "sds_record", "sleep_report_pdf"]:
+                cur.execute(f"ANALYZE TABLE {tbl}")
+                cur.fetchall()
+            cur.execute("SHOW TABLES LIKE 'sleep_diary_latest'")
+            if cur.fetchall():
+                cur.execute("ANALYZE TABLE sleep_diary_latest")
+                cur.fetchall()
+
+    analyze()
+    before = measure(conn, names, args.repeat)
+    # 与线上顺序一致：先由 tools/dedupe_sleep_diary.py 建唯一键（造数无重复行，直接建），再执行迁移
+    with conn.cursor() as cur:
+        cur.execute(f"ALTER TABLE sleep_diary ADD UNIQUE KEY {UNIQUE_KEY} (name, record_date), "
+                    "ALGORITHM=INPLACE, LOCK=NONE")
+    apply_migrations(conn)
+    for i in range(0, len(names), 200):
+        rebuild_names(conn.cursor(), names[i:i + 200])
+    analyze()
+    after = measure(conn, names, args.repeat)
+
+    print(f"\n{'查询':<24}{'迁移前 p50/p95 (ms)':>24}{'迁移后 p50/p95 (ms)':>24}")
+    for b, a in zip(before, after):
+        print(f"{b['label']:<24}{b['p50_ms']:>12.2f}/{b['p95_ms']:<11.2f}{a['p50_ms']:>12.2f}/{a['p95_ms']:<11.2f}")
+    print("\nEXPLAIN：")
+    for b, a in zip(before, after):
+        print(f"- {b['label']}\n    前：{format_plan(b['plan'])}\n    后：{format_plan(a['plan'])}")
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+# tools/dedupe_sleep_diary.py
+"""
+sleep_diary 历史数据去重 + 创建 (name, record_date) 唯一键。
+
+每个 (name, record_date) 只保留 created_at 最新（相同时取 id 最大）的一行，
+其余行先归档到 sleep_diary_dedup_archive 再删除。
+全程按 (name, record_date) 键集分块，每块一个短事务，块间可暂停，
+不会长时间锁表；索引变更使用 ALGORITHM=INPLACE, LOCK=NONE 在线完成。
+
+必须在部署 repository.save_sleep_diary 的 upsert 之前运行一次（迁移 0000 基线不含该唯一键，
+从零新建的库执行 tools.migrate 之后也要运行）：
+    python -m tools.dedupe_sleep_diary --dry-run
+    python -m tools.dedupe_sleep_diary
+"""
+import argparse
+import time
+
+from db import get_connection
+
+HELPER_INDEX = "idx_dedupe_name_record_date"
+UNIQUE_KEY = "uq_name_record_date"
+ARCHIVE_TABLE = "sleep_diary_dedup_archive"
+
+
+def index_exists(cur, name):
+    cur.execute(
+        "SELECT 1 FROM information_schema.statistics "
+        "WHERE table_schema = DATABASE() AND table_name = 'sleep_diary' AND index_name = %s LIMIT 1",
+        (name,)
+    )
+    return cur.fetchone() is not None
+
+
+def scan_groups(cur, after, chunk_size):
+    """按键集顺序取下一块 (name, record_date) 分组及行数"""
+    if after is None:
+        cur.execute(
+            "SELECT name, record_date, COUNT(*) FROM sleep_diary "
+            "GROUP BY name, record_date ORDER BY name, record_date LIMIT %s",
+            (chunk_size,)
+        )
+    else:
+        cur.execute(
+            "SELECT name, record_date, COUNT(*) FROM sleep_diary "
+            "WHERE (name, record_date) > (%s, %s) "
+            "GROUP BY name, record_date ORDER BY name, record_date LIMIT %s",
+            (*after, chunk_size)
+        )
+    return cur.fetchall()
+
+
+def count_duplicates(cur):
+    """一次聚合统计 (分组数, 重复分组数, 多余行数)；只读，不需要辅助索引（一次全表扫描）"""
+    cur.execute(
+        "SELECT COUNT(*), COALESCE(SUM(n > 1), 0), COALESCE(SUM(n - 1), 0) "
+        "FROM (SELECT COUNT(*) AS n FROM sleep_diary GROUP BY name, record_date) t"
+    )
+    return cur.fetchone()
+
+
+def dedupe_group(cur, name, record_date, archive):
+    """删除该分组中除最新一行之外的所有行，返回删除行数"""
+    cur.execute(
+        "SELECT id FROM sleep_diary WHERE name = %s AND record_date = %s "
+        "ORDER BY created_at DESC, id DESC LIMIT 1 FOR UPDATE",
+        (name, record_date)
+    )
+    row = cur.fetchone()
+    if row is None:
+        return 0
+    keep_id = row[0]
+    if archive:
+        cur.execute(
+            f"INSERT INTO {ARCHIVE_TABLE} SELECT * FROM sleep_diary "
+            "WHERE name = %s AND record_date = %s AND id <> %s",
+            (name, record_date, keep_id)
+        )
+    return cur.execute(
+        "DELETE FROM sleep_diary WHERE name = %s AND record_date = %s AND id <> %s",
+        (name, record_date, keep_id)
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="sleep_diary 去重并创建 (name, record_date) 唯一键")
+    parser.add_argument("--chunk-size", type=int, default=500, help="每块扫描的分组数")
+    parser.add_argument("--pause", type=float, default=0.2, help="块间暂停秒数，给线上写入让路")
+    parser.add_argument("--dry-run", action="store_true", help="只统计重复分组，不做修改（不建辅助索引）")
+    parser.add_argument("--no-archive", action="store_true", help="不归档被删除的行")
+    args = parser.parse_args()
+    archive = not args.no_archive
+
+    with get_connection() as conn, conn.cursor() as cur:
+        if index_exists(cur, UNIQUE_KEY):
+            print(f"唯一键 {UNIQUE_KEY} 已存在，无需处理")
+            return
+
+        # dry-run 不改表结构：不建辅助索引，用一条只读聚合统计
+        if args.dry_run:
+            groups, dup_groups, extra = count_duplicates(cur)
+            print(f"共 {groups} 组，重复 {dup_groups} 组，待删除 {extra} 行")
+            print("dry-run 结束，未做任何修改")
+            return
+
+        # 1. 在线添加辅助索引，使后续分组扫描走索引而非全表
+        if not index_exists(cur, HELPER_INDEX):
+            print(f"添加辅助索引 {HELPER_INDEX} …")
+            cur.execute(
+                f"ALTER TABLE sleep_diary ADD INDEX {HELPER_INDEX} (name, record_date), "
+                "ALGORITHM=INPLACE, LOCK=NONE"
+            )
+        if archive:
+            cur.execute(f"CREATE TABLE IF NOT EXISTS {ARCHIVE_TABLE} LIKE sleep_diary")
+
+        # 2. 分块扫描并去重
+        after, groups, dup_groups, deleted = None, 0, 0, 0
+        while True:
+            rows = scan_groups(cur, after, args.chunk_size)
+            if not rows:
+                break
+            after = (rows[-1][0], rows[-1][1])
+            groups += len(rows)
+            dups = [(n, d) for n, d, c in rows if c > 1]
+            dup_groups += len(dups)
+            if dups:
+                conn.begin()
+                try:
+                    for name, record_date in dups:
+                        deleted += dedupe_group(cur, name, record_date, archive)
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+            print(f"已扫描 {groups} 组，重复 {dup_groups} 组，已删除 {deleted} 行")
+            time.sleep(args.pause)
+
+        # 3. 用唯一键替换辅助索引；若期间又产生重复行会报 1062，重跑本工具即可
+        print(f"创建唯一键 {UNIQUE_KEY} …")
+        cur.execute(
+            f"ALTER TABLE sleep_diary ADD UNIQUE KEY {UNIQUE_KEY} (name, record_date), "
+            f"DROP INDEX {HELPER_INDEX}, ALGORITHM=INPLACE, LOCK=NONE"
+        )
+        print("完成")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,303 @@
+# tools/loadtest.py
+"""
+并发压测：用 streamlit.testing.v1.AppTest 模拟 N 个并发用户，
+患者填写睡眠日记与六个量表，医生在「睡眠日记查询」各标签页查询。
+每次页面重跑（打开、提交、点查询）计为一次请求，按并发级别逐级加压，输出
+吞吐量、各页面 p50 / p99 延迟，以及延迟开始明显恶化的并发数（拐点）。
+
+    python -m tools.loadtest                                  # 默认：本地 SQLite 替身，1..16 并发
+    python -m tools.loadtest --users 1,4,8,16,32 --duration 60 --ai-latency 3
+    python -m tools.loadtest --mysql --json result.json       # 使用 SQLPUB_* 指向的 MySQL（切勿指向线上库）
+
+默认在临时目录中运行：STORAGE_ENGINE=sqlite、独立的 spool / 缓存目录，SQLpub 同步线程不会连上远端；
+通义千问调用替换为固定延迟的桩（--ai-latency 秒）。
+AppTest 不能在同一进程的多个线程中并发运行（控件 id 等全局状态会串），因此每个虚拟用户是一个独立进程，
+各有自己的 spool 文件，共享同一个数据库。与真实部署（单进程、会话共享连接池）相比，
+连接池与进程内缓存不共享、也没有 GIL 竞争，结果主要用于比较不同并发级别下数据库与 AI 调用的排队情况、
+定位拐点，以及改动前后的对比。
+"""
+import argparse
+import json
+import os
+import random
+import multiprocessing
+import sys
+import tempfile
+import time
+import warnings
+from types import SimpleNamespace
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PAGES = os.path.join(REPO_ROOT, "pages")
+
+SCALE_PAGES = [
+    ("量表① PSQI.py", "提交问卷"),
+    ("量表② ISI.py", "提交 ISI"),
+    ("量表③ HAS.py", "提交 HAS"),
+    ("量表④ FSS.py", "提交 FSS"),
+    ("量表⑤ SAS.py", "提交 SAS"),
+    ("量表⑥ SDS.py", "提交 SDS"),
+]
+
+
+def prepare_env(workdir, use_mysql, spool_name="spool.sqlite3"):
+    """在导入 db 等模块之前设置环境变量，并切换到临时工作目录（量表页会在当前目录写 CSV）"""
+    if not use_mysql:
+        os.environ["STORAGE_ENGINE"] = "sqlite"
+        os.environ["SQLITE_PATH"] = os.path.join(workdir, "loadtest.sqlite3")
+        os.environ["SQLPUB_HOST"] = "127.0.0.1"
+        os.environ["SQLPUB_PORT"] = "1"           # 同步线程连不上远端，只计失败次数
+        os.environ["SYNC_INTERVAL"] = "3600"
+    os.environ["SPOOL_PATH"] = os.path.join(workdir, spool_name)
+    os.environ["EXPORT_DIR"] = os.path.join(workdir, "exports")
+    os.environ["BLOB_CACHE_DIR"] = os.path.join(workdir, "blobs")
+    os.environ["REPORT_STORE_DIR"] = os.path.join(workdir, "report_store")
+    os.environ["DASHSCOPE_API_KEY"] = "loadtest-stub"
+    logo = os.path.join(workdir, "jsszyylogo.png")
+    if not os.path.exists(logo):
+        os.symlink(os.path.join(REPO_ROOT, "jsszyylogo.png"), logo)
+    os.chdir(workdir)
+    sys.path.insert(0, REPO_ROOT)
+    # 压测输出只保留汇总：屏蔽页面中 pandas / Streamlit 的弃用提示
+    os.environ["STREAMLIT_LOGGER_LEVEL"] = "error"
+    warnings.filterwarnings("ignore", category=UserWarning)
+
+
+def stub_dashscope(latency):
+    """通义千问调用替换为固定延迟、固定文本的桩"""
+    from dashscope import Generation
+
+    def call(*args, **kwargs):
+        time.sleep(latency)
+        return SimpleNamespace(status_code=200, message="",
+                               output=SimpleNamespace(text="（压测桩）睡眠情况总体稳定，仅供参考。"))
+
+    Generation.call = staticmethod(call)
+
+
+def seed(patients, nights):
+    """预置医生查询用的历史日记：patients 位患者 × nights 晚"""
+    from datetime import date, timedelta
+
+    from db import transaction
+    from repository import save_sleep_diary
+
+    today = date.today()
+    for p in range(patients):
+        with transaction() as conn, conn.cursor() as cur:
+            for n in range(nights):
+                d = today - timedelta(days=n + 1)
+                save_sleep_diary(cur, {
+                    "name": f"历史患者{p}", "record_date": d.isoformat(), "entry_date": (d + timedelta(days=1)).isoformat(),
+                    "nap_start": "无", "nap_end": "无", "daytime_bed_minutes": 0, "nap_duration": random.choice([0, 20, 40]),
+                    "caffeine": "无", "alcohol": "无", "med_name": "无;无;无;无", "med_dose": "0mg;0mg;0mg;0mg",
+                    "med_time": "22:00", "daytime_mood": "中", "sleep_interference": "无",
+                    "bed_time": "23:00", "try_sleep_time": "23:10", "sleep_latency": random.randint(5, 90),
+                    "night_awake_count": random.randint(0, 4), "night_awake_total": random.randint(0, 90),
+                    "final_wake_time": "06:30", "get_up_time": "06:40",
+                    "total_sleep_hours": round(random.uniform(4, 8), 1), "sleep_efficiency": round(random.uniform(55, 95), 1),
+                    "sleep_quality": "中", "morning_feeling": "中",
+                })
+
+
+# ---------- 场景：每步一次页面重跑，记录 (页面, 步骤, 耗时ms, 是否出错) ----------
+class Session:
+
+    def __init__(self, results):
+        self.results = results
+
+    def step(self, page, name, at_run, expect_success=False):
+        """expect_success：提交类步骤须出现 st.success，否则（如表单校验未通过）计为错误"""
+        start = time.perf_counter()
+        error = False
+        try:
+            at = at_run()
+            error = bool(at.exception) or (expect_success and not at.success)
+        except Exception:
+            error = True
+        self.results.append((page, name, (time.perf_counter() - start) * 1000, error))
+
+
+def _app(file_name):
+    from streamlit.testing.v1 import AppTest
+    return AppTest.from_file(os.path.join(PAGES, file_name), default_timeout=120)
+
+
+def _by_label(widgets, label):
+    return next(w for w in widgets if w.label == label)
+
+
+def patient_diary(session, user):
+    at = _app("睡眠日记.py")
+    session.step("睡眠日记", "open", at.run)
+    at.text_input[0].set_value(f"压测患者{user}")
+    _by_label(at.selectbox, "昨晚上床时间").set_value("23:00")
+    _by_label(at.selectbox, "闭眼准备入睡时间").set_value("23:10")
+    _by_label(at.selectbox, "早晨最终醒来时间").set_value("06:30")
+    _by_label(at.selectbox, "起床时间").set_value("06:40")
+    session.step("睡眠日记", "submit", at.button[0].click().run, expect_success=True)
+
+
+def patient_scale(session, user):
+    file_name, button = random.choice(SCALE_PAGES)
+    page = file_name[:-3]
+    at = _app(file_name)
+    session.step(page, "open", at.run)
+    _by_label(at.text_input, "姓名").set_value(f"压测患者{user}")
+    session.step(page, "submit", _by_label(at.button, button).click().run, expect_success=True)
+
+
+def doctor_query(session, user, seed_patients):
+    page = "睡眠日记查询"
+    at = _app("睡眠日记查询.py")
+    session.step(page, "open", at.run)
+    at.text_input[0].set_value("10338")
+    session.step(page, "login", at.run)
+    patient = f"历史患者{random.randrange(seed_patients)}" if seed_patients else f"压测患者{user}"
+    _by_label(at.text_input, "患者姓名（汇总）").set_value(patient)
+    session.step(page, "recent7", _by_label(at.button, "查询最近7次").click().run)
+    session.step(page, "by_date", _by_label(at.button, "查询该日期所有记录").click().run)
+    session.step(page, "range", _by_label(at.button, "查询日期区间").click().run)
+
+
+def user_process(user, opts, barrier, out):
+    """子进程入口：准备环境后等所有用户就绪，再循环执行场景 duration 秒"""
+    prepare_env(opts["workdir"], opts["mysql"], spool_name=f"spool_{user}.sqlite3")
+    stub_dashscope(opts["ai_latency"])
+    from streamlit.testing.v1 import AppTest  # noqa: F401  导入耗时不计入压测
+    results = []
+    session = Session(results)
+    rng = random.Random(user)
+    barrier.wait()
+    start = time.monotonic()
+    deadline = start + opts["duration"]
+    while time.monotonic() < deadline:
+        if rng.random() < opts["doctor_ratio"]:
+            doctor_query(session, user, opts["seed_patients"])
+        else:
+            patient_diary(session, user)
+            patient_scale(session, user)
+    out.put((results, time.monotonic() - start))     # 含最后一轮超出 deadline 的部分
+
+
+# ---------- 加压与汇总 ----------
+def _pct(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def run_level(users, opts):
+    ctx = multiprocessing.get_context("spawn")
+    barrier = ctx.Barrier(users)
+    out = ctx.Queue()
+    procs = [ctx.Process(target=user_process, args=(u, opts, barrier, out)) for u in range(users)]
+    for p in procs:
+        p.start()
+    results, elapsed = [], 0.0
+    for _ in procs:
+        user_results, active = out.get()
+        results.extend(user_results)
+        elapsed = max(elapsed, active)
+    for p in procs:
+        p.join()
+
+    ms = [r[2] for r in results]
+    level = {
+        "users": users,
+        "requests": len(results),
+        "errors": sum(r[3] for r in results),
+        "throughput": len(results) / elapsed if elapsed else 0.0,
+        "p50_ms": _pct(ms, 0.50) if ms else None,
+        "p99_ms": _pct(ms, 0.99) if ms else None,
+        "pages": {},
+    }
+    for key in sorted({(r[0], r[1]) for r in results}):
+        rows = [r for r in results if (r[0], r[1]) == key]
+        page_ms = [r[2] for r in rows]
+        level["pages"][f"{key[0]}:{key[1]}"] = {
+            "n": len(rows), "errors": sum(r[3] for r in rows),
+            "p50_ms": _pct(page_ms, 0.50), "p99_ms": _pct(page_ms, 0.99),
+        }
+    return level
+
+
+def find_knee(levels, factor):
+    """
+    拐点：p99 超过最低并发级别 p99 的 factor 倍，或吞吐量比上一级增长不足 10% 的第一个并发数。
+    返回 (并发数, 原因)；未出现拐点时返回 (None, "")。
+    """
+    base = levels[0]
+    for prev, cur in zip(levels, levels[1:]):
+        if base["p99_ms"] and cur["p99_ms"] > factor * base["p99_ms"]:
+            return cur["users"], f"p99 {cur['p99_ms']:.0f}ms > {factor}× 基线 {base['p99_ms']:.0f}ms"
+        if cur["throughput"] < prev["throughput"] * 1.1:
+            return cur["users"], f"吞吐量 {cur['throughput']:.1f}/s 较上一级 {prev['throughput']:.1f}/s 增长不足 10%"
+    return None, ""
+
+
+def print_report(levels, knee):
+    print(f"\n{'并发':>4} {'请求':>6} {'错误':>4} {'吞吐(次/s)':>10} {'p50(ms)':>9} {'p99(ms)':>9}")
+    for lv in levels:
+        print(f"{lv['users']:>4} {lv['requests']:>6} {lv['errors']:>4} {lv['throughput']:>10.2f} "
+              f"{lv['p50_ms'] or 0:>9.0f} {lv['p99_ms'] or 0:>9.0f}")
+    print("\n各页面（p50 / p99 ms，括号内为错误次数）：")
+    keys = sorted({k for lv in levels for k in lv["pages"]})
+    header = "".join(f"{str(lv['users']) + '并发':>16}" for lv in levels)
+    print(f"{'页面:步骤':<24}{header}")
+    for key in keys:
+        cells = []
+        for lv in levels:
+            s = lv["pages"].get(key)
+            if not s:
+                cells.append("-")
+            else:
+                errors = f"({s['errors']})" if s["errors"] else ""
+                cells.append(f"{s['p50_ms']:.0f}/{s['p99_ms']:.0f}{errors}")
+        print(f"{key:<24}" + "".join(f"{c:>16}" for c in cells))
+    users, reason = knee
+    print(f"\n拐点：{users} 并发（{reason}）" if users else "\n在测试范围内未出现拐点")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="患者提交与医生查询的并发压测")
+    parser.add_argument("--users", default="1,2,4,8,16", help="逐级并发数，逗号分隔")
+    parser.add_argument("--duration", type=float, default=30, help="每个并发级别持续秒数")
+    parser.add_argument("--doctor-ratio", type=float, default=0.2, help="每轮扮演医生的概率")
+    parser.add_argument("--ai-latency", type=float, default=2.0, help="AI 分析桩的固定延迟（秒）")
+    parser.add_argument("--seed-patients", type=int, default=50, help="预置历史患者数（0 为不预置）")
+    parser.add_argument("--seed-nights", type=int, default=60, help="每位历史患者预置的晚数")
+    parser.add_argument("--knee-factor", type=float, default=2.0, help="p99 超过基线多少倍视为拐点")
+    parser.add_argument("--mysql", action="store_true", help="使用 SQLPUB_* 指向的 MySQL，而不是本地 SQLite 替身")
+    parser.add_argument("--workdir", default=None, help="工作目录（默认新建临时目录）")
+    parser.add_argument("--json", default=None, help="结果另存为 JSON")
+    args = parser.parse_args()
+
+    json_path = os.path.abspath(args.json) if args.json else None
+    workdir = args.workdir or tempfile.mkdtemp(prefix="sleep_loadtest_")
+    os.makedirs(workdir, exist_ok=True)
+    prepare_env(workdir, args.mysql)
+    stub_dashscope(args.ai_latency)
+    print(f"工作目录：{workdir}（{'MySQL' if args.mysql else 'SQLite 替身'}）")
+    if args.seed_patients:
+        seed(args.seed_patients, args.seed_nights)
+        print(f"已预置 {args.seed_patients} 位患者 × {args.seed_nights} 晚")
+
+    opts = {"workdir": workdir, "mysql": args.mysql, "duration": args.duration,
+            "doctor_ratio": args.doctor_ratio, "seed_patients": args.seed_patients, "ai_latency": args.ai_latency}
+    levels = []
+    for users in (int(u) for u in args.users.split(",")):
+        level = run_level(users, opts)
+        levels.append(level)
+        print(f"{users} 并发：{level['requests']} 次请求，{level['throughput']:.2f} 次/s，"
+              f"p50 {level['p50_ms'] or 0:.0f}ms，p99 {level['p99_ms'] or 0:.0f}ms，错误 {level['errors']}")
+
+    knee = find_knee(levels, args.knee_factor) if len(levels) > 1 else (None, "")
+    print_report(levels, knee)
+    if json_path:
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump({"levels": levels, "knee_users": knee[0], "knee_reason": knee[1]}, f,
+                      ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
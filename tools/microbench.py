@@ -0,0 +1,209 @@
+# tools/microbench.py
+"""
+热点纯函数的微基准：时间换算（逐个 / 整列）、日记图表构建、量表计分（整批 / 单份）、Excel 导出。
+在合成数据上（10 ~ 5000 晚的日记历史、1 万份问卷）用 timeit 计时，
+结果可保存为基线，之后的运行与基线对比，耗时增加超过阈值的用例标记为回退。
+
+    python -m tools.microbench                      # 运行全部用例
+    python -m tools.microbench -k psqi              # 只运行名称包含 psqi 的用例
+    python -m tools.microbench --save               # 保存为基线（默认 .benchmarks/microbench.json）
+    python -m tools.microbench --compare            # 与基线对比，回退时退出码为 1
+
+基线与机器相关，只在同一台机器上比较。
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import timeit
+from datetime import date, timedelta
+
+import pandas as pd
+
+from charts import diary_figures
+from scoring import score_frame, score_one
+from sleeptime import min_to_time, time_to_min, times_to_min
+
+DEFAULT_BASELINE = os.path.join(".benchmarks", "microbench.json")
+NIGHTS = [10, 100, 1000, 5000]
+RESPONSES = 10_000
+
+
+# ---------- 合成数据 ----------
+def _hhmm(rng, start_min, end_min):
+    m = rng.randrange(start_min, end_min, 5) % (24 * 60)
+    return f"{m // 60:02d}:{m % 60:02d}"
+
+
+def synthetic_diary(nights, seed=0):
+    """一位患者 nights 晚的日记（列与 sleep_diary_latest 一致，record_date 升序）"""
+    rng = random.Random(seed)
+    start = date(2024, 1, 1)
+    rows = []
+    for i in range(nights):
+        d = start + timedelta(days=i)
+        nap = rng.random() < 0.3
+        rows.append({
+            "id": i + 1, "name": "基准患者", "record_date": d, "entry_date": d + timedelta(days=1),
+            "nap_start": _hhmm(rng, 12 * 60, 15 * 60) if nap else "无",
+            "nap_end": _hhmm(rng, 15 * 60, 17 * 60) if nap else "无",
+            "daytime_bed_minutes": rng.choice([0, 30, 60]), "nap_duration": rng.choice([0, 20, 40]),
+            "caffeine": "无", "alcohol": "无", "med_name": "无;无;无;无", "med_dose": "0mg;0mg;0mg;0mg",
+            "med_time": "22:00", "daytime_mood": "中", "sleep_interference": "无",
+            "bed_time": _hhmm(rng, 21 * 60, 25 * 60), "try_sleep_time": _hhmm(rng, 22 * 60, 26 * 60),
+            "sleep_latency": rng.randint(5, 120), "night_awake_count": rng.randint(0, 5),
+            "night_awake_total": rng.randint(0, 120),
+            "final_wake_time": _hhmm(rng, 5 * 60, 8 * 60), "get_up_time": _hhmm(rng, 6 * 60, 9 * 60),
+            "total_sleep_hours": round(rng.uniform(3, 9), 1), "sleep_efficiency": round(rng.uniform(50, 98), 1),
+            "sleep_quality": rng.choice(["好", "中", "差"]), "morning_feeling": rng.choice(["好", "中", "差"]),
+        })
+    return pd.DataFrame(rows)
+
+
+def synthetic_psqi(n, seed=0):
+    rng = random.Random(seed)
+    items = ["q5a", "q5b", "q5c", "q5d", "q5e", "q5f", "q5g", "q5h", "q5i", "q5j", "q6", "q7", "q8", "q9"]
+    return [
+        {**{k: rng.randint(1, 4) for k in items},
+         "sleep_latency_choice": rng.randint(1, 4), "sleep_duration_choice": rng.randint(1, 4),
+         "bed_time": _hhmm(rng, 21 * 60, 25 * 60), "getup_time": _hhmm(rng, 5 * 60, 9 * 60)}
+        for _ in range(n)
+    ]
+
+
+def synthetic_answers(n, seed=0):
+    rng = random.Random(seed)
+    return [[rng.randint(1, 4) for _ in range(20)] for _ in range(n)]
+
+
+# ---------- 用例：名称 -> (准备数据, 被测函数) ----------
+def build_cases():
+    cases = {}
+    for n in NIGHTS:
+        cases[f"time_to_min[{n}]"] = (
+            lambda n=n: synthetic_diary(n)["bed_time"],
+            lambda s: s.apply(time_to_min),
+        )
+        cases[f"times_to_min[{n}]"] = (
+            lambda n=n: synthetic_diary(n)["bed_time"],
+            times_to_min,
+        )
+        cases[f"min_to_time[{n}]"] = (
+            lambda n=n: synthetic_diary(n)["bed_time"].apply(time_to_min).tolist(),
+            lambda mins: [min_to_time(m) for m in mins],
+        )
+        cases[f"diary_figures[{n}]"] = (
+            lambda n=n: synthetic_diary(n),
+            diary_figures,
+        )
+        cases[f"write_xlsx[{n}]"] = (
+            lambda n=n: synthetic_diary(n),
+            _write_xlsx,
+        )
+    responses = {
+        "PSQI": lambda: synthetic_psqi(RESPONSES),
+        "SAS": lambda: _answer_rows(synthetic_answers(RESPONSES)),
+        "SDS": lambda: _answer_rows(synthetic_answers(RESPONSES, seed=1)),
+    }
+    for scale, setup in responses.items():
+        cases[f"score_frame[{scale},{RESPONSES}]"] = (
+            lambda setup=setup: pd.DataFrame(setup()),
+            lambda df, scale=scale: score_frame(scale, df),
+        )
+    cases["score_one[PSQI]"] = (
+        lambda: synthetic_psqi(1)[0],
+        lambda row: score_one("PSQI", row),
+    )
+    return cases
+
+
+def _answer_rows(answers):
+    return [{f"q{i}": v for i, v in enumerate(row, 1)} for row in answers]
+
+
+def _write_xlsx(df):
+    from export import write_xlsx
+    path = write_xlsx([df], path=os.path.join(tempfile.gettempdir(), "microbench.xlsx"))
+    os.remove(path)
+
+
+# ---------- 计时与对比 ----------
+def measure(func, data, repeat, min_time):
+    """自动确定每轮调用次数（单轮至少 min_time 秒），返回每次调用耗时（毫秒）的中位数与最小值"""
+    timer = timeit.Timer(lambda: func(data))
+    number, _ = timer.autorange()
+    number = max(1, int(number * min_time / 0.2))
+    times = [t / number * 1000 for t in timer.repeat(repeat=repeat, number=number)]
+    return {"median_ms": statistics.median(times), "min_ms": min(times), "number": number, "repeat": repeat}
+
+
+def compare(results, baseline, threshold):
+    """返回回退用例列表 [(名称, 基线ms, 本次ms, 倍数)]，并打印对比表"""
+    regressions = []
+    print(f"\n{'用例':<40} {'基线(ms)':>12} {'本次(ms)':>12} {'倍数':>8}")
+    for name, res in results.items():
+        base = baseline["results"].get(name)
+        if base is None:
+            print(f"{name:<40} {'-':>12} {res['median_ms']:>12.3f} {'新增':>8}")
+            continue
+        ratio = res["median_ms"] / base["median_ms"] if base["median_ms"] else float("inf")
+        flag = ""
+        if ratio > 1 + threshold:
+            flag = "  ← 回退"
+            regressions.append((name, base["median_ms"], res["median_ms"], ratio))
+        elif ratio < 1 - threshold:
+            flag = "  ← 提升"
+        print(f"{name:<40} {base['median_ms']:>12.3f} {res['median_ms']:>12.3f} {ratio:>7.2f}×{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="热点纯函数微基准")
+    parser.add_argument("-k", "--filter", default="", help="只运行名称包含该字符串的用例")
+    parser.add_argument("--repeat", type=int, default=5, help="每个用例重复轮数")
+    parser.add_argument("--min-time", type=float, default=0.2, help="每轮最少耗时（秒）")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="基线文件路径")
+    parser.add_argument("--save", action="store_true", help="将本次结果保存为基线")
+    parser.add_argument("--compare", action="store_true", help="与基线对比")
+    parser.add_argument("--threshold", type=float, default=0.2, help="耗时增加超过该比例视为回退")
+    args = parser.parse_args()
+
+    results = {}
+    for name, (setup, func) in build_cases().items():
+        if args.filter and args.filter not in name:
+            continue
+        res = measure(func, setup(), args.repeat, args.min_time)
+        results[name] = res
+        print(f"{name:<40} 中位数 {res['median_ms']:>10.3f} ms   最小 {res['min_ms']:>10.3f} ms   ({res['number']} 次 × {res['repeat']} 轮)")
+
+    regressions = []
+    if args.compare:
+        if not os.path.exists(args.baseline):
+            sys.exit(f"基线文件不存在：{args.baseline}（先用 --save 生成）")
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.threshold)
+
+    if args.save:
+        baseline = {"results": {}}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, encoding="utf-8") as f:
+                baseline = json.load(f)
+        baseline["results"].update(results)          # -k 只跑部分用例时保留其余用例的基线
+        baseline["machine"] = {"python": platform.python_version(), "platform": platform.platform(),
+                               "processor": platform.processor()}
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(baseline, f, ensure_ascii=False, indent=2)
+        print(f"\n基线已保存：{args.baseline}")
+
+    if regressions:
+        print(f"\n{len(regressions)} 个用例回退（阈值 {args.threshold:.0%}）")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
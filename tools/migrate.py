@@ -0,0 +1,92 @@
+# tools/migrate.py
+"""
+按版本号顺序执行 migrations/NNNN_*.sql，已执行的版本记录在 schema_migrations 表中。
+
+    python -m tools.migrate --list       # 查看各版本状态
+    python -m tools.migrate              # 执行所有未执行的版本
+    python -m tools.migrate --to 0001    # 只执行到指定版本
+"""
+import argparse
+import hashlib
+import os
+import re
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "migrations")
+
+
+def load_migrations():
+    """返回 [(version, name, sql)]，按版本号排序"""
+    items = []
+    for file_name in sorted(os.listdir(MIGRATIONS_DIR)):
+        m = re.match(r"^(\d{4})_(.+)\.sql$", file_name)
+        if m:
+            with open(os.path.join(MIGRATIONS_DIR, file_name), encoding="utf-8") as f:
+                items.append((m.group(1), m.group(2), f.read()))
+    return items
+
+
+def split_statements(sql):
+    """去掉 -- 注释后按行尾分号切分语句"""
+    lines = [line for line in sql.splitlines() if not line.lstrip().startswith("--")]
+    return [s.strip() for s in re.split(r";\s*$", "\n".join(lines), flags=re.M) if s.strip()]
+
+
+def applied_versions(cur):
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version    CHAR(4)      NOT NULL PRIMARY KEY,
+            name       VARCHAR(128) NOT NULL,
+            checksum   CHAR(64)     NOT NULL,
+            applied_at TIMESTAMP    NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    cur.execute("SELECT version, checksum FROM schema_migrations")
+    return dict(cur.fetchall())
+
+
+def apply_migrations(conn, target=None, log=print):
+    """在给定连接上执行未执行的版本（DDL 自动提交，逐个版本记录），返回执行的版本列表"""
+    done = []
+    with conn.cursor() as cur:
+        applied = applied_versions(cur)
+        for version, name, sql in load_migrations():
+            if target is not None and version > target:
+                break
+            checksum = hashlib.sha256(sql.encode("utf-8")).hexdigest()
+            if version in applied:
+                if applied[version] != checksum:
+                    log(f"警告：{version}_{name} 已执行，但文件内容已改变")
+                continue
+            log(f"执行 {version}_{name} …")
+            for statement in split_statements(sql):
+                cur.execute(statement)
+            cur.execute(
+                "INSERT INTO schema_migrations (version, name, checksum) VALUES (%s, %s, %s)",
+                (version, name, checksum)
+            )
+            conn.commit()
+            done.append(version)
+    return done
+
+
+def main():
+    parser = argparse.ArgumentParser(description="执行数据库版本迁移")
+    parser.add_argument("--to", help="只执行到该版本（含）")
+    parser.add_argument("--list", action="store_true", help="列出各版本状态")
+    args = parser.parse_args()
+
+    from db import get_connection
+
+    with get_connection() as conn:
+        if args.list:
+            with conn.cursor() as cur:
+                applied = applied_versions(cur)
+            for version, name, _ in load_migrations():
+                print(f"{version}_{name}: {'已执行' if version in applied else '未执行'}")
+            return
+        done = apply_migrations(conn, target=args.to)
+        print(f"完成，本次执行 {len(done)} 个版本" if done else "已是最新版本")
+
+
+if __name__ == "__main__":
+    main()
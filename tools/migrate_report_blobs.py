@@ -0,0 +1,91 @@
+# tools/migrate_report_blobs.py
+"""
+把 sleep_report_pdf.pdf_blob 迁入 report_store（按 SHA-256 内容寻址的文件目录）。
+
+按 id 键集逐行处理：分段读取 BLOB 写入文件 → 重新校验文件哈希 →
+写回 pdf_sha256 / pdf_size 并将 pdf_blob 置空。每行一个短事务，
+中断后重新运行即可从未完成的行继续；重复运行是幂等的。
+新上传的报告若仍写入 pdf_blob，可定期运行本工具迁出。
+
+    python -m tools.migrate_report_blobs               # 迁移并清空 BLOB
+    python -m tools.migrate_report_blobs --keep-blob   # 只写文件与哈希，保留 BLOB（灰度阶段）
+    python -m tools.migrate_report_blobs --dry-run     # 只统计待迁移行数
+
+迁完后执行 OPTIMIZE TABLE sleep_report_pdf 回收表空间。
+"""
+import argparse
+import time
+
+from db import get_connection
+from report_store import REPORT_STORE_DIR, ReportStore, read_blob_chunks
+
+
+def pending_sql(keep_blob):
+    # 保留 BLOB 时只处理尚无哈希的行；清空模式下还要处理之前 --keep-blob 迁过、BLOB 未清的行
+    if keep_blob:
+        return "pdf_blob IS NOT NULL AND pdf_sha256 IS NULL"
+    return "pdf_blob IS NOT NULL"
+
+
+def migrate_row(conn, cur, store, report_id, keep_blob):
+    """迁移一行，返回写入文件的字节数"""
+    digest, size = store.put_chunks(read_blob_chunks(cur, report_id))
+    if not store.verify(digest):
+        raise IOError(f"报告 {report_id} 写入后校验失败：{store.path_for(digest)}")
+    conn.begin()
+    try:
+        if keep_blob:
+            cur.execute(
+                "UPDATE sleep_report_pdf SET pdf_sha256 = %s, pdf_size = %s WHERE id = %s",
+                (digest, size, report_id)
+            )
+        else:
+            cur.execute(
+                "UPDATE sleep_report_pdf SET pdf_sha256 = %s, pdf_size = %s, pdf_blob = NULL WHERE id = %s",
+                (digest, size, report_id)
+            )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return size
+
+
+def main():
+    parser = argparse.ArgumentParser(description="报告 PDF 从 MySQL 迁入文件存储")
+    parser.add_argument("--store", default=REPORT_STORE_DIR, help="文件存储目录")
+    parser.add_argument("--keep-blob", action="store_true", help="保留 pdf_blob，不置空")
+    parser.add_argument("--dry-run", action="store_true", help="只统计待迁移行数")
+    parser.add_argument("--pause", type=float, default=0.05, help="每行之间暂停秒数")
+    args = parser.parse_args()
+
+    store = ReportStore(args.store)
+    where = pending_sql(args.keep_blob)
+    with get_connection() as conn, conn.cursor() as cur:
+        cur.execute(f"SELECT COUNT(*), COALESCE(SUM(LENGTH(pdf_blob)), 0) FROM sleep_report_pdf WHERE {where}")
+        count, total_bytes = cur.fetchone()
+        print(f"待迁移 {count} 份报告，共 {total_bytes / 1024 / 1024:.1f} MB")
+        if args.dry_run:
+            return
+
+        after, done, moved = 0, 0, 0
+        while True:
+            cur.execute(
+                f"SELECT id FROM sleep_report_pdf WHERE id > %s AND {where} ORDER BY id LIMIT 1",
+                (after,)
+            )
+            row = cur.fetchone()
+            if row is None:
+                break
+            (report_id,) = row
+            moved += migrate_row(conn, cur, store, report_id, args.keep_blob)
+            after = report_id
+            done += 1
+            if done % 20 == 0:
+                print(f"已迁移 {done}/{count} 份，{moved / 1024 / 1024:.1f} MB")
+            time.sleep(args.pause)
+        print(f"完成：迁移 {done} 份，{moved / 1024 / 1024:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+# tools/rebuild_diary_latest.py
+"""
+从 sleep_diary 重建 sleep_diary_latest（每位患者每晚最新一条），并重建这些患者的滚动统计 sleep_diary_stats。
+
+按患者姓名键集分块，每块一个短事务：先删除该批患者的投影行，
+再写入每晚 created_at 最新（相同时 id 最大）的一行。线上可直接运行。
+
+    python -m tools.rebuild_diary_latest              # 全量重建
+    python -m tools.rebuild_diary_latest --name 张三   # 只重建一位患者
+"""
+import argparse
+import time
+
+from db import get_connection
+from diarystats import rebuild_diary_stats
+from repository import LATEST_COLUMNS
+
+_cols = ", ".join(LATEST_COLUMNS)
+_t1_cols = ", ".join(f"t1.{c}" for c in LATEST_COLUMNS)
+
+
+def rebuild_names(cur, names):
+    placeholders = ", ".join(["%s"] * len(names))
+    cur.execute(f"DELETE FROM sleep_diary_latest WHERE name IN ({placeholders})", names)
+    # 每晚取 created_at 最新、id 最大的一行
+    rows = cur.execute(f"""
+        INSERT INTO sleep_diary_latest ({_cols})
+        SELECT {_t1_cols}
+        FROM sleep_diary t1
+        LEFT JOIN sleep_diary t2
+          ON t2.name = t1.name AND t2.record_date = t1.record_date
+         AND (t2.created_at > t1.created_at OR (t2.created_at = t1.created_at AND t2.id > t1.id))
+        WHERE t1.name IN ({placeholders}) AND t2.id IS NULL
+    """, names)
+    for name in names:
+        rebuild_diary_stats(cur, name)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="重建 sleep_diary_latest 投影表")
+    parser.add_argument("--name", help="只重建该患者")
+    parser.add_argument("--chunk-size", type=int, default=200, help="每块处理的患者数")
+    parser.add_argument("--pause", type=float, default=0.1, help="块间暂停秒数")
+    args = parser.parse_args()
+
+    with get_connection() as conn, conn.cursor() as cur:
+        after, patients, rows = "", 0, 0
+        while True:
+            if args.name:
+                names = [args.name] if patients == 0 else []
+            else:
+                cur.execute(
+                    "SELECT DISTINCT name FROM sleep_diary WHERE name > %s ORDER BY name LIMIT %s",
+                    (after, args.chunk_size)
+                )
+                names = [r[0] for r in cur.fetchall()]
+            if not names:
+                break
+            conn.begin()
+            try:
+                rows += rebuild_names(cur, names)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            after = names[-1]
+            patients += len(names)
+            print(f"已重建 {patients} 位患者，共 {rows} 晚")
+            time.sleep(args.pause)
+        print("完成")
+
+
+if __name__ == "__main__":
+    main()
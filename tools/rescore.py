@@ -0,0 +1,196 @@
+# tools/rescore.py
+"""
+计分规则（scoring.SCALE_RULES / GRADE_RULES 等）修改后，按新规则重算 *_record 表中已存的分数。
+
+每张表按 id 键集分块读取，各块交给进程池用 scoring.score_frame 整块计分，
+主进程按块顺序比对已存分数，只把有差异的行用一条 executemany 批量 UPDATE，每块一个短事务。
+每写完一块把该表的 id 水位记入检查点文件，中断后重新运行从水位继续；表处理完后清除其水位。
+
+    python -m tools.rescore --dry-run                 # 只输出差异，不写库、不记检查点
+    python -m tools.rescore --scale PSQI --scale SAS  # 只重算指定量表
+    python -m tools.rescore --restart                 # 忽略检查点，从头开始
+
+SAS / SDS 表中各题存的是反向换算后的得分，按 raw=False 重算。
+本地 SQLite 引擎（STORAGE_ENGINE=sqlite）只改本地库，量表同步只插入不修改，远端需另行运行。
+运行中的页面进程按 RECORD_CACHE_MAX_AGE / PATIENT_CACHE_MAX_AGE（默认 600 秒）过期缓存后显示新分数，
+需要立即生效时在「系统监控」页面点击「清空查询缓存」。
+"""
+import argparse
+import json
+import multiprocessing as mp
+import os
+import time
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from scoring import SCALE_RULES, SCORE_COLUMNS, score_frame
+
+DEFAULT_CHECKPOINT = ".rescore_checkpoint.json"
+
+# score_frame 输出列 → 表中的列
+STORED_COLUMNS = {"total": "total_score", "raw": "raw_score", "std": "std_score"}
+# 浮点列（睡眠效率）的比较容差
+FLOAT_TOLERANCE = 1e-6
+
+
+def output_columns(scale):
+    """量表 → [(score_frame 输出列, 表中的列)]"""
+    if scale == "PSQI":
+        outputs = list("ABCDEFG") + ["total", "sleep_efficiency"]
+    elif SCALE_RULES[scale].get("std"):
+        outputs = ["raw", "std"]
+    else:
+        outputs = ["total"]
+    return [(o, STORED_COLUMNS.get(o, o)) for o in outputs]
+
+
+def rescore_chunk(scale, frame):
+    """
+    在工作进程中运行：一块已存记录 → (有差异的行, 各列差异次数)。
+    返回的 DataFrame 含 id、表中各分数列的新值及 "<列>_old" 旧值；题目不完整（新分数为空）的行跳过。
+    """
+    scored = score_frame(scale, frame, raw=False)
+    changed = pd.Series(False, index=frame.index)
+    counts = Counter()
+    complete = pd.Series(True, index=frame.index)
+    out = pd.DataFrame({"id": frame["id"]})
+    for o, col in output_columns(scale):
+        new = scored[o]
+        complete &= new.notna()
+        old = pd.to_numeric(frame[col], errors="coerce")
+        if col == "sleep_efficiency":
+            same = (new.astype(float) - old).abs() <= FLOAT_TOLERANCE
+        else:
+            same = new.astype(float) == old
+        diff = ~same.fillna(False).astype(bool)
+        counts.update({col: int((diff & complete).sum())})
+        changed |= diff
+        out[col] = new
+        out[f"{col}_old"] = frame[col]
+    mask = changed & complete
+    return out[mask], counts
+
+
+def _value(v):
+    if pd.isna(v):
+        return None
+    return float(v) if isinstance(v, float) else int(v)
+
+
+def update_chunk(conn, cur, table, scale, changes):
+    cols = [col for _, col in output_columns(scale)]
+    sql = f"UPDATE {table} SET {', '.join(f'{c} = %s' for c in cols)} WHERE id = %s"
+    params = [tuple(_value(row[c]) for c in cols) + (int(row["id"]),) for _, row in changes.iterrows()]
+    conn.begin()
+    try:
+        cur.executemany(sql, params)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def print_diff(table, changes, limit):
+    for _, row in changes.head(limit).iterrows():
+        parts = [f"{c}: {row[f'{c}_old']} → {row[c]}" for c in changes.columns
+                 if c != "id" and not c.endswith("_old") and _value(row[c]) != _value(row[f"{c}_old"])]
+        print(f"  {table} id={row['id']}  " + "，".join(parts))
+
+
+# ---------- 检查点 ----------
+def load_checkpoint(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_checkpoint(path, marks):
+    if not marks:
+        if os.path.exists(path):
+            os.remove(path)
+        return
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(marks, f)
+    os.replace(tmp, path)
+
+
+def rescore_table(conn, cur, pool, scale, args, marks):
+    table = SCORE_COLUMNS[scale][0]
+    columns = ["id"] + SCALE_RULES[scale]["items"] + [col for _, col in output_columns(scale)]
+    select_sql = f"SELECT {', '.join(columns)} FROM {table} WHERE id > %s ORDER BY id LIMIT %s"
+    after = 0 if args.dry_run else int(marks.get(table, 0))
+    if after:
+        print(f"{table}: 从检查点 id > {after} 继续")
+
+    scanned, changed, counts, shown = 0, 0, Counter(), 0
+    pending = deque()          # (块内最大 id, future)，按提交顺序取结果，水位单调推进
+    exhausted = False
+    while pending or not exhausted:
+        # 读取与计分重叠：在途块数不超过进程数的两倍
+        while not exhausted and len(pending) < args.workers * 2:
+            cur.execute(select_sql, (after, args.chunk_size))
+            rows = cur.fetchall()
+            if not rows:
+                exhausted = True
+                break
+            frame = pd.DataFrame(list(rows), columns=columns)
+            after = int(frame["id"].iloc[-1])
+            scanned += len(frame)
+            pending.append((after, pool.submit(rescore_chunk, scale, frame)))
+        if not pending:
+            break
+        last_id, future = pending.popleft()
+        changes, chunk_counts = future.result()
+        counts.update(chunk_counts)
+        changed += len(changes)
+        if args.dry_run:
+            if shown < args.show:
+                print_diff(table, changes, args.show - shown)
+                shown += min(len(changes), args.show - shown)
+        else:
+            if len(changes):
+                update_chunk(conn, cur, table, scale, changes)
+            marks[table] = last_id
+            save_checkpoint(args.checkpoint, marks)
+            time.sleep(args.pause)
+        print(f"{table}: 已处理至 id {last_id}，{'待更新' if args.dry_run else '已更新'} {changed} 行")
+
+    if not args.dry_run:
+        marks.pop(table, None)
+        save_checkpoint(args.checkpoint, marks)
+    detail = "，".join(f"{c} {n}" for c, n in counts.items() if n) or "无差异"
+    print(f"{table}: 完成，扫描 {scanned} 行，{'待更新' if args.dry_run else '已更新'} {changed} 行（{detail}）")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="按当前计分规则重算量表记录的分数")
+    parser.add_argument("--scale", action="append", choices=list(SCORE_COLUMNS), help="只重算该量表，可重复")
+    parser.add_argument("--chunk-size", type=int, default=5000, help="每块行数")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2, help="计分进程数")
+    parser.add_argument("--pause", type=float, default=0.05, help="写入块间暂停秒数")
+    parser.add_argument("--dry-run", action="store_true", help="只输出差异，不写库")
+    parser.add_argument("--show", type=int, default=20, help="--dry-run 时每表最多列出的差异行数")
+    parser.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT, help="检查点文件路径")
+    parser.add_argument("--restart", action="store_true", help="忽略检查点，从头开始")
+    args = parser.parse_args()
+
+    # 工作进程以 spawn 方式导入本模块，db（及 streamlit）只在主进程中导入
+    from db import get_connection
+
+    marks = {} if args.restart else load_checkpoint(args.checkpoint)
+    scales = args.scale or list(SCORE_COLUMNS)
+    with ProcessPoolExecutor(max_workers=args.workers, mp_context=mp.get_context("spawn")) as pool, \
+            get_connection() as conn, conn.cursor() as cur:
+        for scale in scales:
+            rescore_table(conn, cur, pool, scale, args, marks)
+    if not args.dry_run:
+        print(f"页面进程的缓存 {os.getenv('RECORD_CACHE_MAX_AGE', 600)} 秒内过期；"
+              "需立即显示新分数时在「系统监控」页面点击「清空查询缓存」")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+# tools/rollup_weekly.py
+"""
+增量维护睡眠日记周汇总表 sleep_diary_weekly（rollup.py）。
+
+从 rollup_state 中的 (updated_at, id) 水位起，分批读取 sleep_diary 中有改动的行，
+重算这些行所在的患者周，并在同一事务中推进水位；中断后重新运行从水位继续。
+首次运行（无水位）即为全量构建。适合由 cron / 计划任务定时执行，或用 --interval 常驻。
+最近 10 秒（repository.WATERMARK_LAG）内的改动留到下一次运行，保证水位不越过尚未提交的行。
+
+    python -m tools.rollup_weekly                  # 追到最新后退出
+    python -m tools.rollup_weekly --interval 300   # 常驻，每 5 分钟追一次
+    python -m tools.rollup_weekly --rebuild        # 清空汇总表与水位后全量重建
+"""
+import argparse
+import time
+
+from db import get_connection
+from rollup import ROLLUP_JOB, run_batch
+
+
+def catch_up(conn, batch_size, pause):
+    total = 0
+    while True:
+        n = run_batch(conn, batch_size)
+        if not n:
+            return total
+        total += n
+        print(f"已处理 {total} 行改动")
+        time.sleep(pause)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="增量维护睡眠日记周汇总表")
+    parser.add_argument("--batch-size", type=int, default=500, help="每批读取的改动行数")
+    parser.add_argument("--pause", type=float, default=0.05, help="批间暂停秒数")
+    parser.add_argument("--interval", type=float, help="常驻模式：每隔该秒数追一次")
+    parser.add_argument("--rebuild", action="store_true", help="清空汇总表与水位后全量重建")
+    args = parser.parse_args()
+
+    with get_connection() as conn:
+        if args.rebuild:
+            conn.begin()
+            with conn.cursor() as cur:
+                cur.execute("DELETE FROM sleep_diary_weekly")
+                cur.execute("DELETE FROM rollup_state WHERE job = %s", (ROLLUP_JOB,))
+            conn.commit()
+            print("已清空汇总表，开始全量重建")
+        while True:
+            total = catch_up(conn, args.batch_size, args.pause)
+            print(f"已追上水位（本轮 {total} 行）")
+            if not args.interval:
+                break
+            time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    main()